@@ -1,4 +1,4 @@
-from xoadmin.cli.cli import cli
+from xoadmin.cli.client import main
 
 if __name__ == "__main__":
-    cli()
+    main()
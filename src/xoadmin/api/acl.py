@@ -0,0 +1,226 @@
+import asyncio
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from xoadmin.api.api import XOAPI
+from xoadmin.api.error import XOSocketError
+from xoadmin.api.websocket import XOSocket
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Roles an ACL can grant, from least to most privileged
+ACTIONS = ("viewer", "operator", "admin")
+
+# (subjects, objects, action): every subject gets the action on every object
+Grant = Tuple[Iterable[str], Iterable[str], str]
+# (subject id, object id, action), as acl.getAll returns them
+ACL = Tuple[str, str, str]
+
+
+class ACLManagement:
+    """
+    Manage access control lists, which give users or groups (subjects) a
+    role (action) on XO objects such as VMs or pools.
+
+    Grants and revocations are applied in bulk over one websocket session:
+    the existing ACLs are listed once, and only the missing ones are added
+    (or only the existing ones removed), concurrently.
+    """
+
+    def __init__(self, api: XOAPI) -> None:
+        self.api = api
+
+    async def list_acls(self) -> List[Dict[str, str]]:
+        """List every ACL as a dict with subject, object and action."""
+        socket = self.api.get_socket()
+        await socket.open()
+        try:
+            return await self._list(socket)
+        finally:
+            await socket.close()
+
+    async def resolve_subjects(
+        self, subjects: Iterable[str], strict: bool = True
+    ) -> Dict[str, str]:
+        """
+        Map subjects given as user emails, group names or ids to their ids.
+
+        :param strict: Raise on unresolved subjects rather than leaving them
+                       out of the result.
+        :raises ValueError: If a subject matches no user or group, or is both
+                            a user's email and a group's name.
+        """
+        socket = self.api.get_socket()
+        await socket.open()
+        try:
+            return await self._resolve(socket, subjects, strict)
+        finally:
+            await socket.close()
+
+    async def add(self, subject: str, obj: str, action: str = "viewer") -> None:
+        """Add one ACL; subject is a user or group id."""
+        await self._call("acl.add", subject, obj, action)
+
+    async def remove(self, subject: str, obj: str, action: str = "viewer") -> None:
+        """Remove one ACL; subject is a user or group id."""
+        await self._call("acl.remove", subject, obj, action)
+
+    async def _call(self, method: str, subject: str, obj: str, action: str) -> None:
+        socket = self.api.get_socket()
+        await socket.open()
+        try:
+            await socket.call(
+                method, {"subject": subject, "object": obj, "action": action}
+            )
+        finally:
+            await socket.close()
+
+    @staticmethod
+    async def _list(socket: XOSocket) -> List[Dict[str, str]]:
+        return (await socket.call("acl.getAll")).get("result") or []
+
+    @staticmethod
+    async def _resolve(
+        socket: XOSocket, subjects: Iterable[str], strict: bool = True
+    ) -> Dict[str, str]:
+        users, groups = await asyncio.gather(
+            socket.call("user.getAll"), socket.call("group.getAll")
+        )
+        users = users.get("result") or []
+        groups = groups.get("result") or []
+        ids = {obj["id"] for obj in users + groups}
+        emails = {user["email"]: user["id"] for user in users}
+        names = {group["name"]: group["id"] for group in groups}
+        resolved: Dict[str, str] = {}
+        unknown, ambiguous = [], []
+        for subject in subjects:
+            if subject in ids:
+                resolved[subject] = subject
+            elif subject in emails and subject in names:
+                ambiguous.append(subject)
+            elif subject in emails or subject in names:
+                resolved[subject] = emails.get(subject) or names[subject]
+            else:
+                unknown.append(subject)
+        errors = []
+        if unknown:
+            errors.append(f"No user or group matches {', '.join(sorted(unknown))}.")
+        if ambiguous:
+            errors.append(
+                f"Both a user and a group match {', '.join(sorted(ambiguous))}, "
+                "give their id instead."
+            )
+        if errors and strict:
+            raise ValueError(" ".join(errors))
+        for error in errors:
+            logger.warning(error)
+        return resolved
+
+    async def grant(
+        self,
+        subjects: Iterable[str],
+        objects: Iterable[str],
+        action: str = "viewer",
+        concurrency: int = 32,
+    ) -> Dict[str, Any]:
+        """
+        Give every subject the action on every object.
+
+        :param subjects: User emails, group names or ids.
+        :param objects: XO object ids, e.g. of VMs or pools.
+        :param action: viewer, operator or admin.
+        :param concurrency: Maximum number of acl.add calls at once.
+        :return: See grant_many().
+        """
+        return await self.grant_many([(subjects, objects, action)], concurrency)
+
+    async def revoke(
+        self,
+        subjects: Iterable[str],
+        objects: Iterable[str],
+        action: str = "viewer",
+        concurrency: int = 32,
+    ) -> Dict[str, Any]:
+        """Remove the action of every subject on every object, see grant()."""
+        return await self.revoke_many([(subjects, objects, action)], concurrency)
+
+    async def grant_many(
+        self, grants: Iterable[Grant], concurrency: int = 32
+    ) -> Dict[str, Any]:
+        """
+        Apply several grants at once, sending acl.add only for missing ACLs.
+
+        :return: The number of ACLs requested, added and already present,
+                 and the ACLs that failed with their error.
+        """
+        return await self._apply("acl.add", grants, concurrency)
+
+    async def revoke_many(
+        self, grants: Iterable[Grant], concurrency: int = 32
+    ) -> Dict[str, Any]:
+        """Revoke several grants at once, sending acl.remove only for existing ACLs."""
+        return await self._apply("acl.remove", grants, concurrency)
+
+    async def _apply(
+        self, method: str, grants: Iterable[Grant], concurrency: int
+    ) -> Dict[str, Any]:
+        grants = [
+            (list(subjects), list(objects), action)
+            for subjects, objects, action in grants
+        ]
+        for _, _, action in grants:
+            if action not in ACTIONS:
+                raise ValueError(f"Invalid action '{action}', use one of {ACTIONS}.")
+
+        # One connection for the whole batch, every call multiplexed on it
+        socket = self.api.get_socket()
+        await socket.open()
+        try:
+            ids = await self._resolve(
+                socket, {subject for subjects, _, _ in grants for subject in subjects}
+            )
+            wanted: Set[ACL] = {
+                (ids[subject], obj, action)
+                for subjects, objects, action in grants
+                for subject in subjects
+                for obj in objects
+            }
+            existing = {
+                (acl["subject"], acl["object"], acl["action"])
+                for acl in await self._list(socket)
+            }
+            pending = sorted(
+                wanted - existing if method == "acl.add" else wanted & existing
+            )
+            semaphore = asyncio.Semaphore(concurrency)
+            failed: List[Dict[str, str]] = []
+
+            async def send(acl: ACL) -> None:
+                subject, obj, action = acl
+                async with semaphore:
+                    try:
+                        await socket.call(
+                            method,
+                            {"subject": subject, "object": obj, "action": action},
+                        )
+                    except XOSocketError as e:
+                        failed.append(
+                            {
+                                "subject": subject,
+                                "object": obj,
+                                "action": action,
+                                "error": str(e),
+                            }
+                        )
+
+            await asyncio.gather(*(send(acl) for acl in pending))
+        finally:
+            await socket.close()
+        if failed:
+            logger.error(f"{method} failed for {len(failed)} of {len(pending)} ACLs")
+        return {
+            "requested": len(wanted),
+            "changed": len(pending) - len(failed),
+            "unchanged": len(wanted) - len(pending),
+            "failed": failed,
+        }
@@ -1,8 +1,18 @@
-from typing import Any, Dict, Optional
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple
 
 import httpx
 
-from xoadmin.api.websocket import XOSocket
+from xoadmin.api.capture import TrafficRecorder
+from xoadmin.api.error import TaskError
+from xoadmin.api.filter import compile_filter, split_fields
+from xoadmin.api.governor import Governor
+from xoadmin.api.jsonstream import ItemParser
+from xoadmin.api.limits import AdaptiveLimiter
+from xoadmin.api.websocket import XOSocket, is_read_method
 
 # Assuming you've set up get_logger in .utils
 from xoadmin.utils import get_logger
@@ -14,6 +24,12 @@ class AuthenticationError(Exception):
     """Custom exception for authentication errors."""
 
 
+def _collection(endpoint: str) -> str:
+    """The collection an endpoint belongs to, e.g. rest/v0/vms/1/stats -> vms."""
+    parts = endpoint.strip("/").split("/")
+    return parts[2] if len(parts) > 2 and parts[:2] == ["rest", "v0"] else endpoint
+
+
 class XOAPI:
     """An asynchronous client for interacting with Xen Orchestra's REST API."""
 
@@ -23,7 +39,18 @@ class XOAPI:
         ws_url: str = None,
         credentials: Dict[str, str] = None,
         verify_ssl: bool = True,
+        cache_ttl: float = 0,
+        governor: Optional[Governor] = None,
+        adaptive: bool = False,
     ) -> None:
+        """
+        :param cache_ttl: Seconds for which GET responses are reused. Any write
+                          through REST or JSON-RPC clears the cache. Disabled by default.
+        :param governor: Rate and concurrency limits applied to every REST
+                         request and JSON-RPC call.
+        :param adaptive: Adapt the number of concurrent REST requests and
+                         JSON-RPC calls to the server's latency and errors.
+        """
         self.verify_ssl = verify_ssl
         self.rest_base_url = rest_base_url
         self.session = httpx.AsyncClient(verify=verify_ssl, follow_redirects=True)
@@ -34,15 +61,37 @@ class XOAPI:
             "email": "admin@admin.net",
             "password": "admin",
         }
+        self.governor = governor
         self.ws = XOSocket(url=self.ws_url, verify_ssl=verify_ssl)
+        self.ws.on_call = self._on_rpc_call
+        self.ws.governor = governor
+        self.limiter = AdaptiveLimiter(name="REST") if adaptive else None
+        if adaptive:
+            self.ws.limiter = AdaptiveLimiter(name="JSON-RPC")
+        # Optional xoadmin.api.capture.TrafficRecorder, see set_recorder()
+        self.recorder = None
+        self.cache_ttl = cache_ttl
+        self._cache: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        # Whether the server honours the REST `filter` parameter, None until known
+        self.supports_filter: Optional[bool] = None
 
     def get_socket(self) -> XOSocket:
         return self.ws
 
     def set_verify_ssl(self, enabled: bool):
+        previous = self.ws
         self.ws = XOSocket(url=self.ws_url, verify_ssl=enabled)
+        self.ws.on_call = self._on_rpc_call
+        self.ws.governor = self.governor
+        self.ws.limiter = previous.limiter
+        self.ws.recorder = previous.recorder
         self.verify_ssl = self.ws.verify_ssl
 
+    def set_recorder(self, recorder: Optional[TrafficRecorder]) -> None:
+        """Record the REST requests and JSON-RPC calls made from now on, or stop with None."""
+        self.recorder = recorder
+        self.ws.recorder = recorder
+
     def set_credentials(self, username: str, password: str):
         self.credentials = {"email": str(username), "password": str(password)}
         self.ws.set_credentials(username=username, password=password)
@@ -70,6 +119,14 @@ class XOAPI:
         """Close the session."""
         await self.session.aclose()
 
+    def clear_cache(self) -> None:
+        """Drop all cached GET responses."""
+        self._cache.clear()
+
+    def _on_rpc_call(self, method: str) -> None:
+        if not is_read_method(method):
+            self.clear_cache()
+
     async def _refresh_token(self) -> None:
         """Refreshes the authentication token using stored credentials."""
         if not self.credentials:
@@ -82,15 +139,82 @@ class XOAPI:
         )
         logger.debug("Authentication token refreshed.")
 
-    async def _request(self, method: str, endpoint: str, **kwargs: Any) -> Any:
-        # Prepare the URL
-        url = f"{self.rest_base_url}/{endpoint}"
+    def _prepare(self, endpoint: str) -> str:
+        """Return the URL for an endpoint after setting the auth cookie."""
         # Ensure cookies are correctly set for the session
         if self.auth_token:
             self.session.cookies.set("authenticationToken", self.auth_token)
         else:
             logger.error("No authentication token available.")
             raise AuthenticationError("Authentication required.")
+        return f"{self.rest_base_url}/{endpoint}"
+
+    @asynccontextmanager
+    async def _govern(self, method: str, endpoint: str) -> AsyncIterator[None]:
+        """Hold the governor's permission for one request, if a governor is set."""
+        if self.governor is None:
+            yield
+            return
+        async with self.governor.for_request(method, endpoint):
+            yield
+
+    def concurrency_limits(self) -> Dict[str, Dict[str, Any]]:
+        """State of the adaptive limiters, empty unless adaptive is enabled."""
+        limiters = {"rest": self.limiter, "rpc": self.ws.limiter}
+        return {
+            name: limiter.stats()
+            for name, limiter in limiters.items()
+            if limiter is not None
+        }
+
+    async def _request(
+        self, method: str, endpoint: str, adapt: bool = True, **kwargs: Any
+    ) -> Any:
+        """
+        :param adapt: Subject the request to the adaptive limiter; off for
+                      requests whose latency says nothing about load, such as
+                      waiting on a task.
+        """
+        async with self._govern(method, endpoint):
+            if self.limiter is None or not adapt:
+                return await self._send(method, endpoint, **kwargs)
+            async with self.limiter.track(f"{method} {_collection(endpoint)}"):
+                return await self._send(method, endpoint, **kwargs)
+
+    async def _send(self, method: str, endpoint: str, **kwargs: Any) -> Any:
+        if self.recorder is None:
+            return (await self._exchange(method, endpoint, **kwargs)).json()
+        started, clock = time.time(), time.monotonic()
+        response, error = None, None
+        try:
+            response = await self._exchange(method, endpoint, **kwargs)
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            response, error = e.response, str(e.response.status_code)
+            raise
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.recorder.record_rest(
+                method,
+                endpoint,
+                started,
+                time.monotonic() - clock,
+                params=kwargs.get("params"),
+                body=kwargs.get("json"),
+                status=None if response is None else response.status_code,
+                error=error,
+                request_bytes=0 if response is None else len(response.request.content),
+                response_bytes=0 if response is None else len(response.content),
+            )
+
+    async def _exchange(
+        self, method: str, endpoint: str, **kwargs: Any
+    ) -> httpx.Response:
+        url = self._prepare(endpoint)
+        if method != "GET":
+            self.clear_cache()
         # Make the request
         response = await self.session.request(method, url, **kwargs)
         # Check for 401 Unauthorized response and attempt to refresh the token
@@ -104,10 +228,107 @@ class XOAPI:
 
         # Check for successful response
         response.raise_for_status()
-        return response.json()
+        return response
+
+    @asynccontextmanager
+    async def stream(
+        self, method: str, endpoint: str, **kwargs: Any
+    ) -> AsyncIterator[httpx.Response]:
+        """
+        Send a request and yield the response without reading its body, for
+        transfers that must not be buffered in memory.
+
+        A 401 is retried after refreshing the token, unless the request body
+        is a stream that has already been consumed. With a recorder, the
+        transfer is recorded once the block exits, its latency covering the
+        whole body.
+        """
+        async with self._govern(method, endpoint):
+            if self.recorder is None:
+                async with self._stream(method, endpoint, **kwargs) as response:
+                    yield response
+                return
+            started, clock = time.time(), time.monotonic()
+            response, error = None, None
+            try:
+                async with self._stream(method, endpoint, **kwargs) as response:
+                    yield response
+            except httpx.HTTPStatusError as e:
+                response, error = e.response, str(e.response.status_code)
+                raise
+            except BaseException as e:
+                error = type(e).__name__
+                raise
+            finally:
+                content = kwargs.get("content")
+                self.recorder.record_rest(
+                    method,
+                    endpoint,
+                    started,
+                    time.monotonic() - clock,
+                    params=kwargs.get("params"),
+                    body=kwargs.get("json"),
+                    status=None if response is None else response.status_code,
+                    error=error,
+                    request_bytes=len(content) if isinstance(content, bytes) else 0,
+                    response_bytes=(
+                        0 if response is None else response.num_bytes_downloaded
+                    ),
+                    stream=True,
+                )
+
+    @asynccontextmanager
+    async def _stream(
+        self, method: str, endpoint: str, **kwargs: Any
+    ) -> AsyncIterator[httpx.Response]:
+        url = self._prepare(endpoint)
+        if method != "GET":
+            self.clear_cache()
+        replayable = not hasattr(kwargs.get("content"), "__aiter__")
+        async with self.session.stream(method, url, **kwargs) as response:
+            if response.status_code != 401 or not replayable:
+                response.raise_for_status()
+                yield response
+                return
+        logger.warning(
+            f"Received 401 Unauthorized for {endpoint}, attempting token refresh."
+        )
+        await self._refresh_token()
+        async with self.session.stream(
+            method, self._prepare(endpoint), **kwargs
+        ) as response:
+            response.raise_for_status()
+            yield response
+
+    async def stream_items(
+        self, endpoint: str, params: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Any]:
+        """
+        GET an endpoint returning a JSON array and yield its elements as the
+        body arrives, without holding the whole body or array in memory.
+        Responses are not cached.
+        """
+        parser = ItemParser()
+        async with self.stream("GET", endpoint, params=params) as response:
+            async for chunk in response.aiter_text():
+                parser.feed(chunk)
+                for item in parser.items():
+                    yield item
+        parser.end()
+        for item in parser.items():
+            yield item
 
     async def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Any:
-        return await self._request("GET", endpoint, params=params)
+        if self.cache_ttl <= 0:
+            return await self._request("GET", endpoint, params=params)
+        key = (endpoint, json.dumps(params, sort_keys=True, default=str))
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached is not None and now - cached[0] < self.cache_ttl:
+            return cached[1]
+        result = await self._request("GET", endpoint, params=params)
+        self._cache[key] = (now, result)
+        return result
 
     async def post(
         self, endpoint: str, json_data: Dict[str, Any], **kwargs: Any
@@ -122,3 +343,114 @@ class XOAPI:
         self, endpoint: str, json_data: Dict[str, Any], **kwargs: Any
     ) -> Any:
         return await self._request("PATCH", endpoint, json=json_data, **kwargs)
+
+    async def wait_task(
+        self, task: str, poll_interval: float = 1.0, timeout: Optional[float] = None
+    ) -> Any:
+        """
+        Wait for an XO task to finish and return its result.
+
+        :param task: Task id or href, as returned by asynchronous REST actions.
+        :param poll_interval: Seconds between polls for servers that don't
+                              support waiting on a task.
+        :param timeout: Maximum seconds to wait, unlimited if None.
+        :raises TaskError: If the task fails.
+        """
+        endpoint = f"rest/v0/tasks/{task.rstrip('/').split('/')[-1]}"
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # wait=result makes the server answer once the task has settled
+            state = await self._request(
+                "GET", endpoint, adapt=False, params={"wait": "result"}, timeout=timeout
+            )
+            status = state.get("status")
+            if status == "success":
+                return state.get("result")
+            if status == "failure":
+                error = state.get("result")
+                if isinstance(error, dict):
+                    error = error.get("message", error)
+                raise TaskError(f"Task {state.get('id', task)} failed: {error}")
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Task {task} still {status} after {timeout}s.")
+            await asyncio.sleep(poll_interval)
+
+    async def iter_collection(
+        self,
+        collection: str,
+        fields: Optional[Iterable[str]] = None,
+        filter: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        stream: bool = False,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Iterate over the objects of a REST collection, e.g. "vms".
+
+        The filter is pushed down to the server's `filter` query parameter,
+        and the compiled filter is applied to what comes back, so a server
+        ignoring the parameter still gives matching objects only. If the
+        server rejects it, the whole collection is filtered locally.
+
+        :param collection: Collection name under rest/v0.
+        :param fields: Fields to return for each object.
+        :param filter: A complex-matcher expression, e.g. "tags:prod-db".
+        :param params: Extra query parameters.
+        :param stream: Decode objects one at a time as the response arrives,
+                       bypassing the cache, so that memory stays flat
+                       whatever the size of the collection.
+        """
+        fields = split_fields(fields)
+        query = dict(params or {})
+        if fields:
+            query["fields"] = ",".join(fields)
+        endpoint = f"rest/v0/{collection}"
+
+        if not filter:
+            async for item in self._fetch(endpoint, query, stream):
+                yield item
+            return
+
+        compiled = compile_filter(filter)
+        # Fetch what the filter needs, then project it away: the filter is
+        # checked locally even when pushed down, in case the server ignores it
+        extra = compiled.properties - set(fields) if fields else set()
+        if extra:
+            query["fields"] = ",".join(fields + tuple(sorted(extra)))
+
+        def project(item: Dict[str, Any]) -> Dict[str, Any]:
+            return {k: item[k] for k in fields if k in item} if extra else item
+
+        if self.supports_filter is not False:
+            received = False
+            try:
+                async for item in self._fetch(
+                    endpoint, {**query, "filter": filter}, stream
+                ):
+                    received = self.supports_filter = True
+                    if compiled(item):
+                        yield project(item)
+            except httpx.HTTPStatusError as e:
+                # A rejected filter fails before any object is received
+                if received or e.response.status_code not in (400, 404, 422):
+                    raise
+                logger.debug(
+                    f"Server rejected filter on {endpoint}, filtering locally."
+                )
+                self.supports_filter = False
+            else:
+                self.supports_filter = True
+                return
+
+        async for item in self._fetch(endpoint, query, stream):
+            if compiled(item):
+                yield project(item)
+
+    async def _fetch(
+        self, endpoint: str, params: Dict[str, Any], stream: bool
+    ) -> AsyncIterator[Any]:
+        if stream:
+            async for item in self.stream_items(endpoint, params=params):
+                yield item
+            return
+        for item in await self.get(endpoint, params=params):
+            yield item
@@ -0,0 +1,176 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Iterable, List
+
+import httpx
+
+from xoadmin.api.api import XOAPI
+from xoadmin.api.error import XOSocketError
+from xoadmin.api.probe import probe
+from xoadmin.api.replay import latency_summary
+from xoadmin.api.websocket import XOSocket
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Scenarios in the order they run, and the phases each one times
+SCENARIOS = {
+    "tcp": ("tcp",),
+    "connect": ("connect", "sign_in"),
+    "token": ("token",),
+    "rest": ("rest",),
+    "rpc": ("rpc",),
+}
+DEFAULT_ENDPOINT = "rest/v0/hosts?fields=id"
+DEFAULT_RPC_METHOD = "system.getServerVersion"
+
+
+class Benchmark:
+    """
+    Measures latency and throughput against an XO server through the
+    regular XOAPI and XOSocket code paths, one scenario at a time:
+
+    - tcp: a TCP connection and TLS handshake to the REST endpoint (network)
+    - connect: a new websocket connection, then session.signIn on it
+    - token: token.create on the shared signed-in websocket
+    - rest: a read-only REST GET
+    - rpc: a read-only JSON-RPC call on the shared websocket
+
+    Comparing them separates network and TLS cost from server processing.
+    """
+
+    def __init__(
+        self,
+        api: XOAPI,
+        endpoint: str = DEFAULT_ENDPOINT,
+        rpc_method: str = DEFAULT_RPC_METHOD,
+    ) -> None:
+        """
+        :param api: An authenticated XOAPI.
+        :param endpoint: REST endpoint read by the rest scenario.
+        :param rpc_method: Read-only JSON-RPC method called by the rpc scenario.
+        """
+        self.api = api
+        self.endpoint = endpoint
+        self.rpc_method = rpc_method
+
+    async def tcp(self) -> Dict[str, float]:
+        result = await probe(self.api.rest_base_url)
+        if not result["reachable"]:
+            raise OSError(result["error"])
+        return {"tcp": result["latency_ms"] / 1000}
+
+    async def connect(self) -> Dict[str, float]:
+        socket = XOSocket(url=self.api.ws_url, verify_ssl=self.api.verify_ssl)
+        started = time.perf_counter()
+        await socket.open()
+        connected = time.perf_counter()
+        try:
+            await socket.sign_in(self.api.credentials)
+            return {
+                "connect": connected - started,
+                "sign_in": time.perf_counter() - connected,
+            }
+        finally:
+            await socket.close()
+
+    async def token(self) -> Dict[str, float]:
+        started = time.perf_counter()
+        token = await self.api.ws.create_token(description="xoadmin bench")
+        elapsed = time.perf_counter() - started
+        # Don't leave the benchmark's tokens behind; not part of the timing
+        try:
+            await self.api.ws.call("token.delete", {"token": token})
+        except XOSocketError as e:
+            logger.warning(f"Could not delete benchmark token: {e}")
+        return {"token": elapsed}
+
+    async def rest(self) -> Dict[str, float]:
+        started = time.perf_counter()
+        # Bypass the GET cache so every iteration reaches the server
+        await self.api._request("GET", self.endpoint)
+        return {"rest": time.perf_counter() - started}
+
+    async def rpc(self) -> Dict[str, float]:
+        started = time.perf_counter()
+        await self.api.ws.call(self.rpc_method)
+        return {"rpc": time.perf_counter() - started}
+
+    async def run_scenario(
+        self, name: str, concurrency: int, duration: float
+    ) -> List[Dict[str, Any]]:
+        """
+        Run one scenario from concurrency workers for duration seconds.
+
+        :return: One row per phase of the scenario, with throughput and
+                 latency percentiles in milliseconds.
+        """
+        scenario: Callable[[], Awaitable[Dict[str, float]]] = getattr(self, name)
+        latencies: Dict[str, List[float]] = {phase: [] for phase in SCENARIOS[name]}
+        errors: Dict[str, int] = Counter()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + duration
+
+        async def worker() -> None:
+            while loop.time() < deadline:
+                try:
+                    timings = await scenario()
+                except (
+                    XOSocketError,
+                    httpx.HTTPError,
+                    OSError,
+                    asyncio.TimeoutError,
+                ) as e:
+                    errors[type(e).__name__] += 1
+                    continue
+                for phase, seconds in timings.items():
+                    latencies[phase].append(seconds * 1000)
+
+        started = loop.time()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = loop.time() - started
+
+        rows = []
+        for index, (phase, values) in enumerate(latencies.items()):
+            stats = latency_summary(values)
+            rows.append(
+                {
+                    "phase": phase,
+                    "count": stats["count"],
+                    # Failures count against the scenario's first phase
+                    "errors": sum(errors.values()) if index == 0 else 0,
+                    "rate": round(stats["count"] / elapsed, 1),
+                    "mean_ms": stats["mean"],
+                    "p50_ms": stats["p50"],
+                    "p95_ms": stats["p95"],
+                    "p99_ms": stats["p99"],
+                    "max_ms": stats["max"],
+                }
+            )
+        if errors:
+            logger.warning(f"{name}: {dict(errors)}")
+        return rows
+
+    async def run(
+        self,
+        scenarios: Iterable[str] = tuple(SCENARIOS),
+        concurrency: int = 4,
+        duration: float = 5.0,
+    ) -> List[Dict[str, Any]]:
+        """Run scenarios one after another, returning the rows of all their phases."""
+        scenarios = list(scenarios)
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise ValueError(
+                f"Unknown scenarios {sorted(unknown)}, use {list(SCENARIOS)}."
+            )
+        rows = []
+        socket = self.api.get_socket()
+        await socket.open()
+        try:
+            for name in (name for name in SCENARIOS if name in scenarios):
+                rows.extend(await self.run_scenario(name, concurrency, duration))
+        finally:
+            await socket.close()
+        return rows
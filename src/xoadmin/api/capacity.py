@@ -0,0 +1,178 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from xoadmin.api.api import XOAPI
+from xoadmin.api.stats import require_numpy
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+CAPACITY_FIELDS = [
+    "id",
+    "name_label",
+    "SR_type",
+    "shared",
+    "size",
+    "physical_usage",
+    "usage",
+    "$pool",
+]
+
+SECONDS_PER_DAY = 86400
+
+# (sr_id, taken_at, size, physical_usage, usage), as stored by InventoryStore
+Sample = Tuple[str, float, int, int, int]
+
+
+def capacity_row(
+    size: int, physical_usage: int, usage: int, **extra: Any
+) -> Dict[str, Any]:
+    """
+    Capacity figures for one SR or a group of SRs.
+
+    :param size: Total size in bytes.
+    :param physical_usage: Bytes actually written on the SR.
+    :param usage: Bytes allocated to VDIs (virtual allocation).
+    """
+    return {
+        **extra,
+        "size": size,
+        "physical_usage": physical_usage,
+        "virtual_allocation": usage,
+        "free": size - physical_usage,
+        "used_percent": round(100 * physical_usage / size, 1) if size else None,
+        "overcommit": round(usage / size, 2) if size else None,
+    }
+
+
+def summarize(
+    srs: Sequence[Dict[str, Any]], pools: Optional[Dict[str, str]] = None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Build capacity rows per SR, per pool and in total from SR objects.
+
+    :param srs: SR objects with at least the CAPACITY_FIELDS.
+    :param pools: Pool names keyed by id, used to label pool rows.
+    """
+    pools = pools or {}
+    sr_rows = []
+    # Per pool: size, physical usage, virtual allocation and SR count
+    totals: Dict[str, List[int]] = {}
+    for sr in srs:
+        figures = [int(sr.get(key) or 0) for key in ("size", "physical_usage", "usage")]
+        sr_rows.append(
+            capacity_row(
+                *figures,
+                id=sr["id"],
+                name_label=sr.get("name_label", ""),
+                type=sr.get("SR_type", ""),
+                pool=pools.get(sr.get("$pool"), sr.get("$pool")),
+            )
+        )
+        pool_totals = totals.setdefault(sr.get("$pool"), [0, 0, 0, 0])
+        for i, value in enumerate(figures + [1]):
+            pool_totals[i] += value
+
+    pool_rows = [
+        capacity_row(*figures[:3], pool=pools.get(pool_id, pool_id), srs=figures[3])
+        for pool_id, figures in sorted(totals.items(), key=lambda item: str(item[0]))
+    ]
+    total = [sum(figures[i] for figures in totals.values()) for i in range(3)]
+    return {
+        "srs": sorted(sr_rows, key=lambda row: -(row["used_percent"] or 0)),
+        "pools": pool_rows,
+        "total": [capacity_row(*total, srs=len(srs))],
+    }
+
+
+def forecast(
+    samples: Sequence[Sample], now: Optional[float] = None
+) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    Fit a linear trend of physical usage over time for every SR at once and
+    estimate the days left until each one is full.
+
+    The per-SR least-squares slopes are computed with grouped sums
+    (np.bincount) over all samples, so the cost doesn't depend on the
+    number of SRs. SRs with fewer than two samples or no growth get
+    days_to_full None.
+
+    :param samples: (sr_id, taken_at, size, physical_usage, usage) tuples.
+    :param now: Reference time for the estimate, defaults to the current time.
+    :return: growth_per_day (bytes) and days_to_full, keyed by SR id.
+    """
+    np = require_numpy()
+    if not samples:
+        return {}
+    now = time.time() if now is None else now
+    ids, index = np.unique([sample[0] for sample in samples], return_inverse=True)
+    taken_at = np.array([sample[1] for sample in samples], dtype=float)
+    size = np.array([sample[2] for sample in samples], dtype=float)
+    used = np.array([sample[3] for sample in samples], dtype=float)
+
+    # Days since the first sample, which keeps the sums well conditioned
+    x = (taken_at - taken_at.min()) / SECONDS_PER_DAY
+    count = np.bincount(index)
+    sum_x = np.bincount(index, x)
+    sum_y = np.bincount(index, used)
+    sum_xx = np.bincount(index, x * x)
+    sum_xy = np.bincount(index, x * used)
+    denominator = count * sum_xx - sum_x**2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(
+            denominator > 0, (count * sum_xy - sum_x * sum_y) / denominator, np.nan
+        )
+        intercept = (sum_y - slope * sum_x) / count
+
+    # Latest size per SR, in case it was resized between samples
+    order = np.lexsort((taken_at, index))
+    last = order[np.r_[np.flatnonzero(np.diff(index[order])), len(order) - 1]]
+    days_now = (now - taken_at.min()) / SECONDS_PER_DAY
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days = (size[last] - (intercept + slope * days_now)) / slope
+    days = np.where((slope > 0) & np.isfinite(days), np.maximum(days, 0), np.nan)
+
+    return {
+        sr_id: {
+            "growth_per_day": None if np.isnan(slope[i]) else float(slope[i]),
+            "days_to_full": None if np.isnan(days[i]) else round(float(days[i]), 1),
+        }
+        for i, sr_id in enumerate(ids.tolist())
+    }
+
+
+class CapacityManagement:
+    """Storage capacity reporting across all pools."""
+
+    def __init__(self, api: XOAPI) -> None:
+        self.api = api
+
+    async def fetch(
+        self, filter: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        """
+        Fetch every SR with its capacity fields, and the pool names, in two
+        concurrent collection requests.
+        """
+
+        async def collect(collection: str, fields: List[str], filter=None):
+            return [
+                item
+                async for item in self.api.iter_collection(
+                    collection, fields=fields, filter=filter
+                )
+            ]
+
+        srs, pools = await asyncio.gather(
+            collect("srs", CAPACITY_FIELDS, filter),
+            collect("pools", ["id", "name_label"]),
+        )
+        return srs, {pool["id"]: pool.get("name_label", "") for pool in pools}
+
+    async def report(self, filter: Optional[str] = None) -> Dict[str, Any]:
+        """Capacity rows per SR, per pool and in total, plus the raw SRs."""
+        srs, pools = await self.fetch(filter)
+        report = summarize(srs, pools)
+        report["objects"] = srs
+        return report
@@ -0,0 +1,136 @@
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Keys whose values never reach a capture file, compared case-insensitively
+SENSITIVE_KEYS = {
+    "password",
+    "token",
+    "authenticationtoken",
+    "cookie",
+    "secret",
+    "apikey",
+}
+REDACTED = "***"
+
+
+def sanitize(data: Any) -> Any:
+    """A copy of a request body or params with credentials redacted."""
+    if isinstance(data, dict):
+        return {
+            key: (
+                REDACTED
+                if str(key).lower() in SENSITIVE_KEYS and value is not None
+                else sanitize(value)
+            )
+            for key, value in data.items()
+        }
+    if isinstance(data, (list, tuple)):
+        return [sanitize(item) for item in data]
+    return data
+
+
+class TrafficRecorder:
+    """
+    Appends the REST requests and JSON-RPC calls made by an XOAPI and its
+    XOSocket to a file, one JSON object per line.
+
+    Each record holds the start time, the endpoint or method, the sanitized
+    params and body, the outcome, the latency and the payload sizes. Response
+    bodies aren't kept, only their size. A recorder may be shared by several
+    clients, in any thread.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=str)
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + "\n")
+
+    def record_rest(
+        self,
+        method: str,
+        endpoint: str,
+        started: float,
+        latency: float,
+        params: Optional[Dict[str, Any]] = None,
+        body: Any = None,
+        status: Optional[int] = None,
+        error: Optional[str] = None,
+        request_bytes: int = 0,
+        response_bytes: int = 0,
+        stream: bool = False,
+    ) -> None:
+        """
+        :param started: Wall clock time at which the request was sent.
+        :param latency: Seconds until the response was received.
+        :param stream: The request was sent with XOAPI.stream(), e.g. a disk
+                       transfer; its streamed request body isn't kept.
+        """
+        record = {
+            "ts": round(started, 6),
+            "kind": "rest",
+            "method": method,
+            "endpoint": endpoint,
+            "params": sanitize(params),
+            "body": sanitize(body),
+            "status": status,
+            "error": error,
+            "latency_ms": round(latency * 1000, 3),
+            "request_bytes": request_bytes,
+            "response_bytes": response_bytes,
+        }
+        if stream:
+            record["stream"] = True
+        self._write(record)
+
+    def record_rpc(
+        self,
+        method: str,
+        params: Dict[str, Any],
+        started: float,
+        latency: float,
+        error: Optional[str] = None,
+        request_bytes: int = 0,
+        response_bytes: int = 0,
+    ) -> None:
+        self._write(
+            {
+                "ts": round(started, 6),
+                "kind": "rpc",
+                "method": method,
+                "params": sanitize(params),
+                "error": error,
+                "latency_ms": round(latency * 1000, 3),
+                "request_bytes": request_bytes,
+                "response_bytes": response_bytes,
+            }
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def load_capture(path: str) -> List[Dict[str, Any]]:
+    """Read a capture file, returning its records ordered by start time."""
+    records = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                raise ValueError(f"Invalid record on line {number} of {path}: {e}")
+    records.sort(key=lambda record: record["ts"])
+    return records
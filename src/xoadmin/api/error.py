@@ -12,3 +12,7 @@ class ServerError(Exception):
 
 class HostAlreadyExistsError(ServerError):
     """Exception when trying to add a host that already exists."""
+
+
+class TaskError(ServerError):
+    """Exception when an XO task finishes with a failure."""
@@ -0,0 +1,357 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from xoadmin.api.api import XOAPI
+from xoadmin.api.error import XOSocketError
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+# XO object types followed through the event feed
+EXPORTED_TYPES = ("pool", "host", "SR", "VM")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: Any) -> str:
+    return (
+        str("" if value is None else value)
+        .replace("\\", r"\\")
+        .replace('"', r"\"")
+        .replace("\n", r"\n")
+    )
+
+
+def _labels(**labels: Any) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+class MetricsModel:
+    """
+    The state exported as Prometheus metrics, kept current from XO object
+    events rather than by polling.
+
+    Only the fields exported are kept for each object. VMs, which are by far
+    the most numerous, are only counted per pool and power state, and those
+    counts are adjusted on each event. The rendered text is cached until the
+    next change, so a scrape costs a string copy.
+    """
+
+    def __init__(self) -> None:
+        self.pools: Dict[str, str] = {}
+        self.hosts: Dict[str, Dict[str, Any]] = {}
+        self.srs: Dict[str, Dict[str, Any]] = {}
+        # Pool and power state of each VM, and the number of VMs per pair
+        self.vms: Dict[str, Tuple[str, str]] = {}
+        self.vm_counts: Dict[Tuple[str, str], int] = Counter()
+        self.users: Dict[str, int] = {}
+        self.connected = False
+        self.events = 0
+        self.resyncs = 0
+        self.last_event: Optional[float] = None
+        self._version = 0
+        self._rendered: Tuple[int, str] = (-1, "")
+
+    def clear(self) -> None:
+        """Forget every object, before a full resync."""
+        self.pools.clear()
+        self.hosts.clear()
+        self.srs.clear()
+        self.vms.clear()
+        self.vm_counts.clear()
+        self._version += 1
+
+    def apply(self, event_type: str, items: Dict[str, Any]) -> None:
+        """Apply one "all" notification: enter, update or exit of objects."""
+        for obj_id, obj in items.items():
+            if event_type == "exit":
+                self.remove(obj_id)
+            else:
+                self.update(obj)
+        self.events += 1
+        self.last_event = time.time()
+
+    def update(self, obj: Dict[str, Any]) -> None:
+        obj_type, obj_id = obj.get("type"), obj.get("id")
+        if obj_type == "VM":
+            key = (obj.get("$pool"), obj.get("power_state"))
+            previous = self.vms.get(obj_id)
+            if previous == key:
+                return  # the frequent case: a VM changed but not its state
+            if previous is not None:
+                self._uncount(previous)
+            self.vms[obj_id] = key
+            self.vm_counts[key] += 1
+        elif obj_type == "host":
+            self.hosts[obj_id] = {
+                "name": obj.get("name_label"),
+                "pool": obj.get("$pool"),
+                "up": obj.get("power_state") == "Running",
+                "enabled": bool(obj.get("enabled")),
+            }
+        elif obj_type == "SR":
+            self.srs[obj_id] = {
+                "name": obj.get("name_label"),
+                "pool": obj.get("$pool"),
+                "size": obj.get("size") or 0,
+                "physical_usage": obj.get("physical_usage") or 0,
+                "usage": obj.get("usage") or 0,
+            }
+        elif obj_type == "pool":
+            self.pools[obj_id] = obj.get("name_label")
+        else:
+            return
+        self._version += 1
+
+    def remove(self, obj_id: str) -> None:
+        if obj_id in self.vms:
+            self._uncount(self.vms.pop(obj_id))
+        else:
+            for objects in (self.hosts, self.srs, self.pools):
+                if obj_id in objects:
+                    del objects[obj_id]
+                    break
+            else:
+                return
+        self._version += 1
+
+    def _uncount(self, key: Tuple[str, str]) -> None:
+        self.vm_counts[key] -= 1
+        if self.vm_counts[key] <= 0:
+            del self.vm_counts[key]
+
+    def set_users(self, users: List[Dict[str, Any]]) -> None:
+        counts = Counter(user.get("permission") or "none" for user in users)
+        if counts != self.users:
+            self.users = dict(counts)
+            self._version += 1
+
+    def set_connected(self, connected: bool) -> None:
+        if connected != self.connected:
+            self.connected = connected
+            self._version += 1
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text format, rendered once per change."""
+        version = self._version
+        if self._rendered[0] != version:
+            self._rendered = (version, self._render())
+        # Feed health changes with every event but is cheap to append
+        return self._rendered[1] + self._render_feed()
+
+    def _pool(self, pool_id: Optional[str]) -> Dict[str, Any]:
+        return {"pool_id": pool_id, "pool": self.pools.get(pool_id, pool_id)}
+
+    def _render(self) -> str:
+        lines = [
+            "# HELP xo_vms Number of VMs per pool and power state.",
+            "# TYPE xo_vms gauge",
+        ]
+        for (pool_id, state), count in sorted(
+            self.vm_counts.items(), key=lambda item: tuple(map(str, item[0]))
+        ):
+            labels = _labels(**self._pool(pool_id), power_state=state)
+            lines.append(f"xo_vms{{{labels}}} {count}")
+
+        # Samples of a metric must be contiguous, hence one pass per metric
+        for metric, description in (
+            ("up", "Whether the host is running"),
+            ("enabled", "Whether the host is enabled"),
+        ):
+            lines += [
+                f"# HELP xo_host_{metric} {description}.",
+                f"# TYPE xo_host_{metric} gauge",
+            ]
+            for host_id, host in sorted(self.hosts.items()):
+                labels = _labels(
+                    host_id=host_id, host=host["name"], **self._pool(host["pool"])
+                )
+                lines.append(f"xo_host_{metric}{{{labels}}} {int(host[metric])}")
+
+        for metric, description in (
+            ("size", "Size of the SR"),
+            ("physical_usage", "Space used on the SR's storage"),
+            ("usage", "Space allocated to the SR's virtual disks"),
+        ):
+            lines += [
+                f"# HELP xo_sr_{metric}_bytes {description}.",
+                f"# TYPE xo_sr_{metric}_bytes gauge",
+            ]
+            for sr_id, sr in sorted(self.srs.items()):
+                labels = _labels(sr_id=sr_id, sr=sr["name"], **self._pool(sr["pool"]))
+                lines.append(f"xo_sr_{metric}_bytes{{{labels}}} {sr[metric]}")
+
+        lines += [
+            "# HELP xo_users Number of XO users per permission.",
+            "# TYPE xo_users gauge",
+        ]
+        for permission, count in sorted(self.users.items()):
+            lines.append(f"xo_users{{{_labels(permission=permission)}}} {count}")
+        lines += [
+            "# HELP xo_exporter_connected Whether the XO event feed is connected.",
+            "# TYPE xo_exporter_connected gauge",
+            f"xo_exporter_connected {int(self.connected)}",
+            "# HELP xo_exporter_resyncs_total Full reloads of the XO objects.",
+            "# TYPE xo_exporter_resyncs_total counter",
+            f"xo_exporter_resyncs_total {self.resyncs}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def _render_feed(self) -> str:
+        lines = [
+            "# HELP xo_exporter_events_total XO object events applied.",
+            "# TYPE xo_exporter_events_total counter",
+            f"xo_exporter_events_total {self.events}",
+        ]
+        if self.last_event is not None:
+            lines += [
+                "# HELP xo_exporter_last_event_timestamp_seconds Time of the last event.",
+                "# TYPE xo_exporter_last_event_timestamp_seconds gauge",
+                f"xo_exporter_last_event_timestamp_seconds {self.last_event:.3f}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+class Exporter:
+    """
+    Serves /metrics over HTTP from a MetricsModel, which is loaded once with
+    xo.getAllObjects and then follows the "all" event feed on one websocket.
+    Scrapes never reach XO. If the feed drops, the model is reloaded after
+    reconnecting.
+    """
+
+    def __init__(
+        self,
+        api: XOAPI,
+        host: str = "0.0.0.0",
+        port: int = 9477,
+        users_interval: float = 300.0,
+        retry_interval: float = 5.0,
+    ) -> None:
+        """
+        :param api: An authenticated XOAPI.
+        :param users_interval: Seconds between user counts, which have no
+                               event feed.
+        :param retry_interval: Seconds before reconnecting a dropped feed.
+        """
+        self.api = api
+        self.host = host
+        self.port = port
+        self.users_interval = users_interval
+        self.retry_interval = retry_interval
+        self.model = MetricsModel()
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def run(self, stop: Optional[asyncio.Event] = None) -> None:
+        """Serve metrics and follow XO until stop is set."""
+        stop = stop or asyncio.Event()
+        await self.start()
+        tasks = [
+            asyncio.ensure_future(self.follow(stop)),
+            asyncio.ensure_future(self.count_users(stop)),
+        ]
+        try:
+            await stop.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.stop()
+
+    async def follow(self, stop: asyncio.Event) -> None:
+        """Keep the model in sync with XO, reconnecting when the feed drops."""
+        while not stop.is_set():
+            try:
+                await self._follow_once()
+            except (XOSocketError, OSError, asyncio.TimeoutError) as e:
+                logger.warning(f"XO event feed failed: {e}")
+            except Exception as e:
+                # e.g. a failed handshake or a malformed event; keep following
+                logger.exception(f"XO event feed failed unexpectedly: {e}")
+            finally:
+                self.model.set_connected(False)
+            try:
+                await asyncio.wait_for(stop.wait(), self.retry_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _follow_once(self) -> None:
+        socket = self.api.get_socket()
+        await socket.open()
+        # Subscribe before loading so that no event is missed in between
+        queue = socket.subscribe()
+        try:
+            self.model.clear()
+            for object_type in EXPORTED_TYPES:
+                async for obj in socket.call_stream(
+                    "xo.getAllObjects", {"filter": {"type": object_type}}
+                ):
+                    self.model.update(obj)
+            self.model.resyncs += 1
+            self.model.set_connected(True)
+            logger.info(
+                f"Loaded {len(self.model.vms)} VMs, {len(self.model.hosts)} hosts "
+                f"and {len(self.model.srs)} SRs, following events."
+            )
+            while True:
+                message = await queue.get()
+                if message is None:
+                    logger.warning("Event feed closed by the server.")
+                    return
+                if message.get("method") != "all":
+                    continue
+                params = message.get("params") or {}
+                self.model.apply(params.get("type", "enter"), params.get("items") or {})
+        finally:
+            socket.unsubscribe(queue)
+            await socket.close()
+
+    async def count_users(self, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            try:
+                self.model.set_users(
+                    await self.api.get("rest/v0/users", params={"fields": "permission"})
+                )
+            except Exception as e:
+                logger.warning(f"Could not count users: {e}")
+            try:
+                await asyncio.wait_for(stop.wait(), self.users_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request = await reader.readline()
+            # Headers are not needed, but must be read before answering
+            while (await reader.readline()).strip():
+                pass
+            method, path, *_ = request.decode("latin-1").split() + ["", ""]
+            if method != "GET":
+                status, body = "405 Method Not Allowed", "Only GET is supported.\n"
+            elif path.split("?")[0] == "/metrics":
+                status, body = "200 OK", self.model.render()
+            else:
+                status, body = "404 Not Found", "Metrics are served on /metrics.\n"
+            payload = body.encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode()
+                + payload
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logger.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
@@ -0,0 +1,278 @@
+"""
+A compiler for the subset of XO's complex-matcher syntax used by the REST
+`filter` parameter, for evaluating filters locally when the server can't.
+
+Supported syntax:
+    foo                 string anywhere in the object (case-insensitive)
+    prop:foo            property contains "foo"; arrays match if any item does
+    prop:"foo bar"      quoted string
+    prop:web-*          glob pattern
+    prop:/^web-\\d+$/    regular expression
+    prop:>=4            numeric comparison (>, >=, <, <=)
+    prop?               property is truthy
+    prop:(a b)          nested matcher on the property value
+    a b                 both match
+    |(a b)              either matches
+    !a                  negation
+"""
+
+import fnmatch
+import re
+from functools import lru_cache
+from typing import Any, Callable, List, Set, Tuple
+
+Predicate = Callable[[Any], bool]
+
+
+class FilterSyntaxError(ValueError):
+    """Raised when a filter expression can't be parsed."""
+
+
+class CompiledFilter:
+    """A parsed filter: a predicate plus the top-level properties it reads."""
+
+    def __init__(self, expression: str, predicate: Predicate, properties: Set[str]):
+        self.expression = expression
+        self.predicate = predicate
+        self.properties = properties
+
+    def __call__(self, obj: Any) -> bool:
+        return self.predicate(obj)
+
+    def __repr__(self) -> str:
+        return f"CompiledFilter({self.expression!r})"
+
+
+def _values(value: Any):
+    """Yield scalar leaves, recursing into lists and dicts like complex-matcher."""
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from _values(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _values(item)
+    else:
+        yield value
+
+
+def _string_matcher(text: str) -> Predicate:
+    needle = text.lower()
+
+    def match(value: Any) -> bool:
+        return any(
+            leaf is not None and needle in str(leaf).lower() for leaf in _values(value)
+        )
+
+    return match
+
+
+def _glob_matcher(pattern: str) -> Predicate:
+    regex = re.compile(fnmatch.translate(pattern), re.IGNORECASE)
+
+    def match(value: Any) -> bool:
+        return any(
+            isinstance(leaf, str) and regex.match(leaf) is not None
+            for leaf in _values(value)
+        )
+
+    return match
+
+
+def _regex_matcher(pattern: str, flags: str) -> Predicate:
+    regex = re.compile(pattern, re.IGNORECASE if "i" in flags else 0)
+
+    def match(value: Any) -> bool:
+        return any(
+            isinstance(leaf, str) and regex.search(leaf) is not None
+            for leaf in _values(value)
+        )
+
+    return match
+
+
+_COMPARATORS = {
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+def _number_matcher(op: str, number: float) -> Predicate:
+    compare = _COMPARATORS[op]
+
+    def match(value: Any) -> bool:
+        return any(
+            isinstance(leaf, (int, float))
+            and not isinstance(leaf, bool)
+            and compare(leaf, number)
+            for leaf in _values(value)
+        )
+
+    return match
+
+
+class _Parser:
+    _WORD = re.compile(r"[^\s()|!:?\"]+")
+
+    def __init__(self, expression: str) -> None:
+        self.text = expression
+        self.pos = 0
+        self.properties: Set[str] = set()
+
+    def error(self, message: str) -> FilterSyntaxError:
+        return FilterSyntaxError(f"{message} at position {self.pos} in {self.text!r}")
+
+    def skip_ws(self) -> None:
+        while self.pos < len(self.text) and self.text[self.pos].isspace():
+            self.pos += 1
+
+    def peek(self, token: str) -> bool:
+        return self.text.startswith(token, self.pos)
+
+    def parse(self) -> Predicate:
+        predicate = self.parse_and(top=True)
+        self.skip_ws()
+        if self.pos != len(self.text):
+            raise self.error("Unexpected input")
+        return predicate
+
+    def parse_and(self, top: bool = False, depth: int = 0) -> Predicate:
+        terms = self.parse_terms(top, depth)
+        if len(terms) == 1:
+            return terms[0]
+        return lambda obj: all(term(obj) for term in terms)
+
+    def parse_terms(self, top: bool, depth: int) -> List[Predicate]:
+        terms = []
+        while True:
+            self.skip_ws()
+            if self.pos >= len(self.text) or (not top and self.peek(")")):
+                break
+            terms.append(self.parse_term(depth))
+        if not terms:
+            raise self.error("Empty expression")
+        return terms
+
+    def parse_group(self, depth: int) -> List[Predicate]:
+        # Caller consumed "(", parse terms until the matching ")"
+        terms = self.parse_terms(top=False, depth=depth + 1)
+        if not self.peek(")"):
+            raise self.error("Missing ')'")
+        self.pos += 1
+        return terms
+
+    def parse_term(self, depth: int) -> Predicate:
+        if self.peek("!"):
+            self.pos += 1
+            inner = self.parse_term(depth)
+            return lambda obj: not inner(obj)
+        if self.peek("|("):
+            self.pos += 2
+            terms = self.parse_group(depth)
+            return lambda obj: any(term(obj) for term in terms)
+        if self.peek("&("):
+            self.pos += 2
+            terms = self.parse_group(depth)
+            return lambda obj: all(term(obj) for term in terms)
+        if self.peek("("):
+            self.pos += 1
+            terms = self.parse_group(depth)
+            return lambda obj: all(term(obj) for term in terms)
+
+        start = self.pos
+        name = self.parse_string()
+        if self.peek("?"):
+            self.pos += 1
+            self._record(name, depth)
+            return lambda obj: isinstance(obj, dict) and bool(obj.get(name))
+        if self.peek(":"):
+            self.pos += 1
+            self._record(name, depth)
+            inner = self.parse_value(depth)
+            return (
+                lambda obj: isinstance(obj, dict) and name in obj and inner(obj[name])
+            )
+        # A bare value matches anywhere in the object
+        self.pos = start
+        return self.parse_value(depth)
+
+    def _record(self, name: str, depth: int) -> None:
+        if depth == 0:
+            self.properties.add(name)
+
+    def parse_value(self, depth: int) -> Predicate:
+        if self.peek("("):
+            self.pos += 1
+            terms = self.parse_group(depth)
+            return lambda value: all(term(value) for term in terms)
+        if self.peek("/"):
+            end = self.pos + 1
+            while end < len(self.text) and self.text[end] != "/":
+                end += 2 if self.text[end] == "\\" else 1
+            if end >= len(self.text):
+                raise self.error("Unterminated regular expression")
+            pattern = self.text[self.pos + 1 : end]
+            self.pos = end + 1
+            flags = self.parse_flags()
+            return _regex_matcher(pattern, flags)
+        for op in (">=", "<=", ">", "<"):
+            if self.peek(op):
+                self.pos += len(op)
+                raw = self.parse_string()
+                try:
+                    return _number_matcher(op, float(raw))
+                except ValueError:
+                    raise self.error(f"Expected a number after '{op}'")
+        quoted = self.peek('"')
+        text = self.parse_string()
+        if not quoted and "*" in text:
+            return _glob_matcher(text)
+        return _string_matcher(text)
+
+    def parse_flags(self) -> str:
+        match = re.compile(r"[a-z]*").match(self.text, self.pos)
+        self.pos = match.end()
+        return match.group()
+
+    def parse_string(self) -> str:
+        if self.peek('"'):
+            end = self.pos + 1
+            chars = []
+            while end < len(self.text) and self.text[end] != '"':
+                if self.text[end] == "\\" and end + 1 < len(self.text):
+                    end += 1
+                chars.append(self.text[end])
+                end += 1
+            if end >= len(self.text):
+                raise self.error("Unterminated string")
+            self.pos = end + 1
+            return "".join(chars)
+        match = self._WORD.match(self.text, self.pos)
+        if not match:
+            raise self.error("Expected a value")
+        self.pos = match.end()
+        return match.group()
+
+
+@lru_cache(maxsize=128)
+def compile_filter(expression: str) -> CompiledFilter:
+    """
+    Compile a filter expression once into a predicate over XO objects.
+
+    :param expression: A complex-matcher expression, e.g. 'tags:prod-db power_state:Running'.
+    :return: A callable CompiledFilter exposing the properties it reads.
+    :raises FilterSyntaxError: If the expression is invalid.
+    """
+    parser = _Parser(expression)
+    predicate = parser.parse()
+    return CompiledFilter(expression, predicate, parser.properties)
+
+
+def split_fields(fields) -> Tuple[str, ...]:
+    """Normalise a fields argument given as a comma-separated string or list."""
+    if fields is None:
+        return ()
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    return tuple(field.strip() for field in fields if field.strip())
@@ -0,0 +1,113 @@
+import asyncio
+import re
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from xoadmin.api.limits import TokenBucket
+from xoadmin.api.websocket import is_read_method
+
+OPERATION_CLASSES = ("read", "write", "server_add", "vm_lifecycle")
+
+_VM_ENDPOINT = re.compile(r"^/?rest/v0/vms(/|$)")
+
+# Authentication runs while a governed request holds its slot (token refresh
+# on a 401), so it must never wait on the governor itself
+UNGOVERNED_METHODS = {"session.signIn", "token.create"}
+
+
+def classify_rest(method: str, endpoint: str) -> str:
+    """The operation class of a REST request, e.g. ("POST", "rest/v0/vms/1/start")."""
+    if method.upper() in ("GET", "HEAD"):
+        return "read"
+    if _VM_ENDPOINT.match(endpoint):
+        return "vm_lifecycle"
+    return "write"
+
+
+def classify_rpc(method: str) -> str:
+    """The operation class of a JSON-RPC method, e.g. "server.add"."""
+    if method == "server.add":
+        return "server_add"
+    if is_read_method(method):
+        return "read"
+    if method.startswith("vm."):
+        return "vm_lifecycle"
+    return "write"
+
+
+class Governor:
+    """
+    Caps the load put on xo-server, per operation class.
+
+    Each class (read, write, server_add, vm_lifecycle) can have a rate limit,
+    enforced with a token bucket, and a concurrency limit. One governor is
+    shared by an XOAPI and its XOSocket, so every REST request and JSON-RPC
+    call made through them counts against the same budget.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None) -> None:
+        """
+        :param limits: Per operation class, a mapping with `rate` (operations
+                       per second), `burst` (defaults to one second of rate)
+                       and `concurrency`. Missing or 0 values mean unlimited.
+        """
+        limits = limits or {}
+        unknown = set(limits) - set(OPERATION_CLASSES)
+        if unknown:
+            raise ValueError(
+                f"Unknown operation classes {sorted(unknown)}, "
+                f"use {OPERATION_CLASSES}."
+            )
+        self.limits = {name: dict(limits.get(name) or {}) for name in OPERATION_CLASSES}
+        self._buckets = {
+            name: TokenBucket(limit.get("rate"), limit.get("burst") or None)
+            for name, limit in self.limits.items()
+        }
+        # Created on first use, so they belong to the loop running the calls
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def active(self) -> bool:
+        """Whether any limit is set."""
+        return any(
+            limit.get("rate") or limit.get("concurrency")
+            for limit in self.limits.values()
+        )
+
+    def _semaphore(self, operation: str) -> Optional[asyncio.Semaphore]:
+        concurrency = self.limits[operation].get("concurrency")
+        if not concurrency:
+            return None
+        semaphore = self._semaphores.get(operation)
+        if semaphore is None:
+            semaphore = self._semaphores[operation] = asyncio.Semaphore(
+                int(concurrency)
+            )
+        return semaphore
+
+    @asynccontextmanager
+    async def acquire(self, operation: str) -> AsyncIterator[None]:
+        """Wait for a concurrency slot and a rate token for one operation."""
+        semaphore = self._semaphore(operation)
+        if semaphore is None:
+            await self._buckets[operation].acquire()
+            yield
+            return
+        async with semaphore:
+            await self._buckets[operation].acquire()
+            yield
+
+    def for_request(self, method: str, endpoint: str):
+        """acquire() for a REST request."""
+        return self.acquire(classify_rest(method, endpoint))
+
+    def for_call(self, method: str):
+        """acquire() for a JSON-RPC call."""
+        if method in UNGOVERNED_METHODS:
+            return _unlimited()
+        return self.acquire(classify_rpc(method))
+
+
+@asynccontextmanager
+async def _unlimited() -> AsyncIterator[None]:
+    yield
@@ -1,6 +1,50 @@
 # src/xoadmin/host.py
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from xoadmin.api.api import XOAPI
+from xoadmin.api.error import XOSocketError
+from xoadmin.api.filter import compile_filter
+from xoadmin.api.probe import DEFAULT_PROBE_TIMEOUT, probe, probe_all
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Health of a server, worst first
+HEALTH_ORDER = ("unreachable", "disconnected", "disabled", "ok")
+
+
+def server_health(server: Dict[str, Any], probed: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Combine a server as listed by server.getAll with the probe of its host.
+
+    A server is ok when XO is connected to it and its XAPI endpoint answers.
+    """
+    status = server.get("status")
+    error = probed.get("error")
+    if not probed["reachable"]:
+        health = "unreachable"
+    elif server.get("enabled") is False:
+        health = "disabled"
+    elif status != "connected":
+        health = "disconnected"
+        xo_error = server.get("error")
+        if isinstance(xo_error, dict):
+            xo_error = xo_error.get("message") or xo_error.get("code")
+        error = xo_error or None
+    else:
+        health = "ok"
+    return {
+        "id": server.get("id"),
+        "label": server.get("label"),
+        "host": server.get("host"),
+        "status": status,
+        "reachable": probed["reachable"],
+        "latency_ms": probed.get("latency_ms"),
+        "health": health,
+        "error": error,
+    }
 
 
 class HostManagement:
@@ -39,10 +83,95 @@ class HostManagement:
         await socket.close()
         return result
 
-    async def list_hosts(self):
+    async def add_hosts(
+        self,
+        hosts: List[Dict[str, Any]],
+        probe: bool = True,
+        probe_timeout: float = DEFAULT_PROBE_TIMEOUT,
+        concurrency: int = 16,
+        timeout: Optional[float] = 60.0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Registers many Xen servers concurrently.
+
+        All hosts are first probed concurrently for TCP/TLS reachability, so
+        dead hosts fail fast instead of waiting for XO to time out. The
+        reachable ones are then added with concurrent server.add calls over
+        one shared WebSocket connection.
+
+        :param hosts: add_host keyword arguments (host, username, password,
+                      autoConnect, allowUnauthorized) for each server.
+        :param probe: Whether to probe hosts before adding them.
+        :param probe_timeout: Seconds allowed per probe.
+        :param concurrency: Maximum number of server.add calls at once.
+        :param timeout: Seconds allowed per server.add call, unlimited if None.
+        :return: One result per host with a status of added, exists,
+                 unreachable or failed.
+        """
+        results = [{"host": spec["host"], "status": None} for spec in hosts]
+        if probe:
+            probes = await probe_all(
+                [spec["host"] for spec in hosts], timeout=probe_timeout
+            )
+            for result, probed in zip(results, probes):
+                result["latency_ms"] = probed.get("latency_ms")
+                if not probed["reachable"]:
+                    result.update(status="unreachable", error=probed["error"])
+
+        socket = self.xo_api.get_socket()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def add(spec: Dict[str, Any], result: Dict[str, Any]) -> None:
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    response = await asyncio.wait_for(
+                        socket.call(
+                            "server.add",
+                            {
+                                "host": spec["host"],
+                                "username": spec["username"],
+                                "password": spec["password"],
+                                "autoConnect": spec.get("autoConnect", True),
+                                "allowUnauthorized": spec.get(
+                                    "allowUnauthorized", False
+                                ),
+                            },
+                        ),
+                        timeout,
+                    )
+                    result.update(status="added", id=response.get("result"))
+                except XOSocketError as e:
+                    exists = "server already exists" in str(e)
+                    result.update(status="exists" if exists else "failed", error=str(e))
+                except asyncio.TimeoutError:
+                    result.update(status="failed", error=f"timed out after {timeout}s")
+                result["seconds"] = round(time.monotonic() - started, 2)
+
+        pending = [
+            (spec, result)
+            for spec, result in zip(hosts, results)
+            if result["status"] is None
+        ]
+        if pending:
+            # One reference for the whole batch keeps the calls multiplexed
+            await socket.open()
+            try:
+                await asyncio.gather(*(add(spec, result) for spec, result in pending))
+            finally:
+                await socket.close()
+        for result in results:
+            if result["status"] != "added":
+                logger.debug(f"Host {result['host']}: {result['status']}")
+        return results
+
+    async def list_hosts(self, filter: Optional[str] = None):
         """
         Retrieves a list of all registered Xen servers.
 
+        :param filter: Complex-matcher expression applied to each server. The
+                       JSON-RPC API has no server-side filter, so it is
+                       evaluated locally.
         :return: A list of dictionaries containing host information.
         """
         # Ensure you're opening and closing the WebSocket connection appropriately.
@@ -50,8 +179,83 @@ class HostManagement:
         await socket.open()
         result = await socket.call("server.getAll", {})  # Empty params for all hosts
         await socket.close()
+        if filter:
+            compiled = compile_filter(filter)
+            result["result"] = [
+                server for server in result.get("result") or [] if compiled(server)
+            ]
         return result
 
+    async def iter_health(
+        self,
+        timeout: float = DEFAULT_PROBE_TIMEOUT,
+        concurrency: int = 64,
+        filter: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Check the health of every registered Xen server, yielding results as
+        they complete.
+
+        The servers are listed once with server.getAll, which also gives XO's
+        connection status for each. All of them are then probed concurrently
+        for XAPI reachability (TCP and TLS handshake on the XAPI endpoint)
+        and latency, each within its own timeout, so hanging hosts only cost
+        the timeout.
+
+        :param timeout: Seconds allowed per server.
+        :param concurrency: Maximum number of servers probed at once.
+        :param filter: Complex-matcher expression selecting the servers.
+        :return: For each server its id, label, host, XO connection status,
+                 reachability, latency, an overall health (ok, disabled,
+                 unreachable or disconnected) and any error.
+        """
+        servers = (await self.list_hosts(filter=filter)).get("result") or []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def check(server: Dict[str, Any]) -> Dict[str, Any]:
+            if not server.get("host"):
+                return server_health(
+                    server, {"reachable": False, "error": "no host address"}
+                )
+            async with semaphore:
+                try:
+                    # The probe bounds its connect and its close by timeout
+                    # each; this bounds the whole check even if one hangs
+                    probed = await asyncio.wait_for(
+                        probe(server["host"], timeout), 2 * timeout
+                    )
+                except asyncio.TimeoutError:
+                    probed = {
+                        "reachable": False,
+                        "error": f"timed out after {timeout}s",
+                    }
+            return server_health(server, probed)
+
+        for result in asyncio.as_completed([check(server) for server in servers]):
+            yield await result
+
+    async def check_health(self, **kwargs: Any) -> List[Dict[str, Any]]:
+        """The results of iter_health(), sorted with unhealthy servers first."""
+        results = [result async for result in self.iter_health(**kwargs)]
+        return sorted(
+            results, key=lambda r: (HEALTH_ORDER.index(r["health"]), r["host"] or "")
+        )
+
+    async def update_host(self, host_id: str, **fields: Any) -> None:
+        """
+        Change a Xen server's settings with server.set.
+
+        :param host_id: The ID of the server.
+        :param fields: Settings to change, e.g. host, username, password or
+                       allowUnauthorized.
+        """
+        socket = self.xo_api.get_socket()
+        await socket.open()
+        try:
+            await socket.call("server.set", {"id": host_id, **fields})
+        finally:
+            await socket.close()
+
     async def delete_host(self, host_id: str):
         """
         Deletes a Xen server by its ID.
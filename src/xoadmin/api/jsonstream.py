@@ -0,0 +1,194 @@
+import json
+import re
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_CHARS = frozenset("0123456789.eE+-")
+
+
+class _Incomplete(Exception):
+    """More input is needed to decode the next value."""
+
+
+class ItemParser:
+    """
+    Incremental parser yielding the elements of one JSON array, or the
+    values of one JSON object, as its text arrives.
+
+    Only the text of the element being decoded is buffered, so memory
+    stays proportional to the largest element rather than to the document.
+    Each element is decoded by the json module's C scanner.
+
+    >>> parser = ItemParser(path=("result",))
+    >>> parser.feed('{"id": "1", "result": [{"a": 1}, {"a"')
+    >>> list(parser.items())
+    [{'a': 1}]
+    >>> parser.feed(': 2}]}')
+    >>> parser.end()
+    >>> list(parser.items())
+    [{'a': 2}]
+    """
+
+    def __init__(self, path: Sequence[str] = ()) -> None:
+        """
+        :param path: Members leading from the top-level object to the
+                     container whose items are yielded, e.g. ("result",)
+                     for a JSON-RPC response; empty for a top-level array.
+        """
+        self.path = tuple(path)
+        # Members passed over on the way to the container, e.g. {"id": ...}
+        self.members: Dict[str, Any] = {}
+        self._depth = 0
+        self._buffer = ""
+        self._pos = 0
+        # Chunks fed since the buffer was last extended, and their length
+        self._chunks: List[str] = []
+        self._fed = 0
+        self._ended = False
+        # Pending text needed before retrying an incomplete element, doubled
+        # on every miss so that large elements are rescanned O(log n) times
+        self._wanted = 0
+        self._state = "container"
+        self._close = "]"
+        self._first = True
+
+    def feed(self, text: str) -> None:
+        """Append the next chunk of the document."""
+        self._chunks.append(text)
+        self._fed += len(text)
+
+    def end(self) -> None:
+        """Mark the end of the document; items() then decodes what is left."""
+        self._ended = True
+
+    def items(self) -> Iterator[Any]:
+        """
+        Yield the items decodable from the text fed so far.
+
+        :raises ValueError: If the document is invalid, or ends early, or the
+                            path doesn't lead to an array or object.
+        """
+        if not self._ended and len(self._buffer) - self._pos + self._fed < self._wanted:
+            return
+        if self._chunks:
+            self._buffer = self._buffer[self._pos :] + "".join(self._chunks)
+            self._pos = 0
+            self._chunks, self._fed = [], 0
+        while self._state != "done":
+            try:
+                if self._state == "container":
+                    self._pos = self._open(self._pos)
+                    continue
+                if self._state == "member":
+                    self._pos = self._member(self._pos)
+                    continue
+                item, self._pos = self._item(self._pos)
+            except _Incomplete:
+                if self._ended:
+                    raise ValueError("Unexpected end of JSON document.")
+                self._wanted = 2 * (len(self._buffer) - self._pos)
+                return
+            self._wanted = 0
+            if self._state == "items":
+                yield item
+
+    def _skip(self, pos: int) -> int:
+        """Position of the next significant character."""
+        pos = _WHITESPACE.match(self._buffer, pos).end()
+        if pos >= len(self._buffer):
+            raise _Incomplete()
+        return pos
+
+    def _value(self, pos: int) -> Tuple[Any, int]:
+        """Decode the value at pos, unless it may still be cut short."""
+        try:
+            value, end = _DECODER.raw_decode(self._buffer, pos)
+        except json.JSONDecodeError as e:
+            if self._ended:
+                raise ValueError(f"Invalid JSON: {e}") from None
+            raise _Incomplete() from None
+        # A number cut by the end of a chunk, e.g. "1" of "1.5", may continue
+        if not self._ended and (
+            end >= len(self._buffer) or self._buffer[end] in _NUMBER_CHARS
+        ):
+            raise _Incomplete()
+        return value, end
+
+    def _expect(self, pos: int, char: str) -> int:
+        pos = self._skip(pos)
+        if self._buffer[pos] != char:
+            raise ValueError(
+                f"Expected '{char}' at offset {pos}, found '{self._buffer[pos]}'."
+            )
+        return pos + 1
+
+    def _open(self, pos: int) -> int:
+        pos = self._skip(pos)
+        char = self._buffer[pos]
+        if self._depth < len(self.path):
+            if char != "{":
+                raise ValueError(f"Expected an object holding '{self._next}'.")
+            self._state = "member"
+        elif char in "[{":
+            self._close = "]" if char == "[" else "}"
+            self._state = "items"
+        else:
+            raise ValueError(f"Expected an array or object at {self._location}.")
+        self._first = True
+        return pos + 1
+
+    def _separator(self, pos: int, close: str) -> int:
+        """Skip the comma before the next entry; -1 when the container closes."""
+        pos = self._skip(pos)
+        if self._buffer[pos] == close:
+            return -1
+        if self._first:
+            return pos
+        return self._skip(self._expect(pos, ","))
+
+    def _member(self, pos: int) -> int:
+        """Pass over one member of an object on the path."""
+        pos = self._separator(pos, "}")
+        if pos < 0:
+            raise ValueError(f"No member '{self._next}' at {self._location}.")
+        key, pos = self._value(pos)
+        pos = self._expect(pos, ":")
+        if key == self._next:
+            self._depth += 1
+            self._state = "container"
+            return pos
+        value, pos = self._value(self._skip(pos))
+        if self._depth == 0:
+            self.members[key] = value
+        self._first = False
+        return pos
+
+    def _item(self, pos: int) -> Tuple[Any, int]:
+        pos = self._separator(pos, self._close)
+        if pos < 0:
+            # Whatever follows the container is not read
+            self._state = "done"
+            return None, len(self._buffer)
+        if self._close == "}":
+            _, pos = self._value(pos)
+            pos = self._skip(self._expect(pos, ":"))
+        item, pos = self._value(pos)
+        self._first = False
+        return item, pos
+
+    @property
+    def _next(self) -> str:
+        return self.path[self._depth]
+
+    @property
+    def _location(self) -> str:
+        return ".".join(("$",) + self.path[: self._depth])
+
+
+def iter_items(text: str, path: Sequence[str] = ()) -> Iterator[Any]:
+    """Yield the items of the container at path in a complete JSON document."""
+    parser = ItemParser(path)
+    parser.feed(text)
+    parser.end()
+    return parser.items()
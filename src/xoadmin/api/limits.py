@@ -0,0 +1,177 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+import httpx
+
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Responses meaning the server is overloaded rather than the request is wrong
+OVERLOAD_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    A token bucket refilled at `rate` tokens per second, holding at most
+    `capacity` tokens.
+
+    Acquiring more tokens than are available puts the bucket in debt and
+    sleeps until the debt is repaid, so large requests (e.g. a 4 MiB chunk
+    against a byte rate) are paced rather than rejected, and concurrent
+    callers are served in turn.
+    """
+
+    def __init__(self, rate: Optional[float], capacity: Optional[float] = None):
+        """
+        :param rate: Tokens per second; None or 0 disables limiting.
+        :param capacity: Burst size, defaults to one second worth of tokens.
+        """
+        self.rate = rate or 0
+        self.capacity = capacity if capacity is not None else self.rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        """Take amount tokens, waiting as long as needed to stay within the rate."""
+        if not self.rate:
+            return
+        self._refill()
+        self._tokens -= amount
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+
+def is_overload(error: BaseException) -> bool:
+    """Whether an error signals an overloaded server: 429, 5xx or a timeout."""
+    response = getattr(error, "response", None)
+    if isinstance(response, httpx.Response):
+        return response.status_code in OVERLOAD_STATUSES
+    return isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException))
+
+
+class AdaptiveLimiter:
+    """
+    A concurrency limit that adapts to the server's response (AIMD).
+
+    Latency is compared per kind of operation (e.g. "GET vms") with the
+    lowest latency seen for it, so slow operations don't look like
+    congestion. While the smoothed latency ratio stays under `tolerance`
+    and the limit is in use, the limit grows by about one per round trip.
+    When latency rises or the server answers 429/5xx or times out, it is
+    multiplied by `backoff`, at most once per cooldown so one burst of slow
+    responses counts as a single congestion signal.
+    """
+
+    def __init__(
+        self,
+        initial: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        tolerance: float = 2.0,
+        backoff: float = 0.7,
+        name: str = "requests",
+    ) -> None:
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.name = name
+        self.in_flight = 0
+        self.latency_ratio = 1.0
+        self.decreases = 0
+        self._baselines: Dict[str, float] = {}
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._cooldown_until = 0.0
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def stats(self) -> Dict[str, Any]:
+        """The current limit and what it is based on."""
+        return {
+            "limit": self.current_limit,
+            "in_flight": self.in_flight,
+            "latency_ratio": round(self.latency_ratio, 2),
+            "decreases": self.decreases,
+        }
+
+    async def _acquire(self) -> None:
+        while self.in_flight >= self.current_limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif waiter.done() and not waiter.cancelled():
+                    self._wake()  # pass on the slot we were given
+                raise
+        self.in_flight += 1
+
+    def _wake(self) -> None:
+        free = self.current_limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _observe(self, key: str, latency: float, overloaded: bool) -> None:
+        now = time.monotonic()
+        if not overloaded:
+            baseline = self._baselines.get(key, latency)
+            # Follow improvements at once and slowdowns slowly, so a
+            # permanently slower server eventually becomes the new normal
+            baseline = min(latency, baseline + (latency - baseline) * 0.01)
+            self._baselines[key] = baseline
+            ratio = latency / baseline if baseline > 0 else 1.0
+            self.latency_ratio += (ratio - self.latency_ratio) * 0.2
+        if overloaded or self.latency_ratio > self.tolerance:
+            if now >= self._cooldown_until:
+                previous = self.current_limit
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self.decreases += 1
+                self._cooldown_until = now + max(latency, 0.05)
+                logger.debug(
+                    f"Adaptive {self.name} limit {previous} -> {self.current_limit} "
+                    f"({'overload' if overloaded else 'latency'})"
+                )
+        elif self.in_flight >= self.current_limit - 1:
+            # Only grow while the limit is the bottleneck
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    @asynccontextmanager
+    async def track(self, key: str = "") -> AsyncIterator[None]:
+        """
+        Hold a slot for one operation and feed its latency and outcome back
+        into the limit.
+
+        :param key: The kind of operation, whose latencies are compared
+                    with each other, e.g. a JSON-RPC method name.
+        """
+        await self._acquire()
+        started = time.monotonic()
+        overloaded = False
+        try:
+            yield
+        except BaseException as e:
+            overloaded = is_overload(e)
+            raise
+        finally:
+            self._observe(key, time.monotonic() - started, overloaded)
+            self.in_flight -= 1
+            self._wake()
@@ -1,8 +1,10 @@
 import asyncio
-from typing import Any
+from typing import Any, Dict, List, Optional
 
+from xoadmin.api.acl import ACLManagement
 from xoadmin.api.api import XOAPI
 from xoadmin.api.error import AuthenticationError, ServerError, XOSocketError
+from xoadmin.api.governor import Governor
 from xoadmin.api.host import HostManagement
 from xoadmin.api.storage import StorageManagement
 from xoadmin.api.user import UserManagement
@@ -24,13 +26,19 @@ class XOAManager:
         rest_base_url: str = None,
         ws_url: str = None,
         verify_ssl: bool = True,
+        governor: Optional[Governor] = None,
+        adaptive: bool = False,
     ):
         self.host = host
         self.verify_ssl = verify_ssl
         self.rest_base_url = self._sanitize_rest_base_url(rest_base_url, host)
         self.ws_url = self._sanitize_ws(ws_url)
         self.api = XOAPI(
-            self.rest_base_url, ws_url=self.ws_url, verify_ssl=self.verify_ssl
+            self.rest_base_url,
+            ws_url=self.ws_url,
+            verify_ssl=self.verify_ssl,
+            governor=governor,
+            adaptive=adaptive,
         )
         # The management classes will be initialized after authentication
         self.user_management = None
@@ -105,6 +113,7 @@ class XOAManager:
         self.vm_management = VMManagement(self.api)
         self.storage_management = StorageManagement(self.api)
         self.host_management = HostManagement(self.api)
+        self.acl_management = ACLManagement(self.api)
         logger.debug("Authenticated and ready to manage Xen Orchestra.")
 
     async def create_user(
@@ -155,6 +164,46 @@ class XOAManager:
         except Exception as e:
             logger.error(f"An unexpected error occurred while adding host {host}: {e}")
 
+    async def add_hosts(self, hosts: List[Dict[str, Any]], **kwargs: Any):
+        """
+        Adds many hosts concurrently after probing them, logging each outcome.
+        See HostManagement.add_hosts for the options.
+        """
+        results = await self.host_management.add_hosts(hosts, **kwargs)
+        for result in results:
+            if result["status"] == "added":
+                logger.info(f"Host {result['host']} added successfully.")
+            elif result["status"] == "exists":
+                logger.error(
+                    f"Cannot add host {result['host']}: The server already exists."
+                )
+            else:
+                logger.error(f"Failed to add host {result['host']}: {result['error']}")
+        return results
+
+    async def grant_acls(self, acls: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Grants ACLs given as {"subjects", "objects", "action"} in one batch,
+        skipping those already present. See ACLManagement.grant_many.
+
+        :raises XOSocketError: If any grant failed.
+        """
+        result = await self.acl_management.grant_many(
+            (acl["subjects"], acl["objects"], acl.get("action") or "viewer")
+            for acl in acls
+        )
+        logger.info(
+            f"ACLs: {result['changed']} granted, {result['unchanged']} already present."
+        )
+        for failure in result["failed"]:
+            logger.error(
+                f"Cannot grant {failure['action']} on {failure['object']} to "
+                f"{failure['subject']}: {failure['error']}"
+            )
+        if result["failed"]:
+            raise XOSocketError(f"{len(result['failed'])} ACL grants failed.")
+        return result
+
     async def list_all_vms(self) -> Any:
         """
         Lists all VMs.
@@ -0,0 +1,76 @@
+import asyncio
+import ssl
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_PROBE_TIMEOUT = 3.0
+
+
+def parse_target(target: str) -> Tuple[str, int, bool]:
+    """
+    Split a host as given to server.add (address, address:port or URL) into
+    the address, port and whether it speaks TLS. XAPI defaults to HTTPS.
+    """
+    parts = urlsplit(target if "//" in target else f"//{target}")
+    tls = parts.scheme != "http"
+    return parts.hostname or target, parts.port or (443 if tls else 80), tls
+
+
+async def probe(
+    target: str, timeout: float = DEFAULT_PROBE_TIMEOUT, tls: Optional[bool] = None
+) -> Dict[str, Any]:
+    """
+    Check that a host accepts TCP connections, and completes a TLS handshake
+    when it serves HTTPS. Certificates aren't verified: this only checks
+    reachability, server.add decides whether to trust the host.
+
+    :param target: Address, address:port or URL of the host.
+    :param timeout: Seconds allowed for connecting and the handshake.
+    :param tls: Force or skip the TLS handshake, inferred from the target if None.
+    :return: The target, whether it is reachable, the latency and any error.
+    """
+    host, port, default_tls = parse_target(target)
+    context = None
+    if default_tls if tls is None else tls:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    started = time.monotonic()
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=context), timeout
+        )
+    except asyncio.TimeoutError:
+        error = f"timed out after {timeout}s"
+    except (OSError, ssl.SSLError) as e:
+        error = str(e) or type(e).__name__
+    else:
+        latency = (time.monotonic() - started) * 1000
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), timeout)
+        except (asyncio.TimeoutError, OSError, ssl.SSLError):
+            pass
+        return {"host": target, "reachable": True, "latency_ms": round(latency, 1)}
+    logger.debug(f"Probe of {target} failed: {error}")
+    return {"host": target, "reachable": False, "error": error}
+
+
+async def probe_all(
+    targets: Iterable[str],
+    timeout: float = DEFAULT_PROBE_TIMEOUT,
+    concurrency: int = 64,
+) -> List[Dict[str, Any]]:
+    """Probe many hosts concurrently, returning one result per target in order."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def probe_one(target: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await probe(target, timeout)
+
+    return await asyncio.gather(*(probe_one(target) for target in targets))
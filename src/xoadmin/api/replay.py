@@ -0,0 +1,213 @@
+import asyncio
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+
+from xoadmin.api.api import XOAPI
+from xoadmin.api.capture import REDACTED, SENSITIVE_KEYS
+from xoadmin.api.error import XOSocketError
+from xoadmin.api.governor import UNGOVERNED_METHODS, classify_rest, classify_rpc
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Path segments that are object ids, folded together when grouping requests
+_ID_SEGMENT = re.compile(r"^([0-9a-f]{8}-[0-9a-f-]{27}|[0-9a-f]{16,}|\d+)$", re.I)
+
+
+def operation(record: Dict[str, Any]) -> str:
+    """The operation a captured call is reported under, e.g. "GET vms/{id}" or "vm.start"."""
+    if record["kind"] == "rpc":
+        return record["method"]
+    path = record["endpoint"].strip("/")
+    if path.startswith("rest/v0/"):
+        path = path[len("rest/v0/") :]
+    segments = ["{id}" if _ID_SEGMENT.match(part) else part for part in path.split("/")]
+    return f"{record['method']} {'/'.join(segments)}"
+
+
+def is_read(record: Dict[str, Any]) -> bool:
+    if record["kind"] == "rpc":
+        return classify_rpc(record["method"]) == "read"
+    return classify_rest(record["method"], record["endpoint"]) == "read"
+
+
+def is_redacted(data: Any) -> bool:
+    """Whether a captured body or params had credentials replaced by sanitize()."""
+    if isinstance(data, dict):
+        return any(
+            (str(key).lower() in SENSITIVE_KEYS and value == REDACTED)
+            or is_redacted(value)
+            for key, value in data.items()
+        )
+    if isinstance(data, list):
+        return any(is_redacted(item) for item in data)
+    return False
+
+
+def latency_summary(latencies: Iterable[float]) -> Dict[str, Any]:
+    """Count, mean and nearest-rank percentiles of latencies in milliseconds."""
+    values = sorted(latencies)
+    if not values:
+        return {"count": 0, **dict.fromkeys(("mean", "p50", "p95", "p99", "max"))}
+
+    def percentile(p: float) -> float:
+        return round(values[max(0, math.ceil(len(values) * p / 100) - 1)], 1)
+
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 1),
+        "p50": percentile(50),
+        "p95": percentile(95),
+        "p99": percentile(99),
+        "max": round(values[-1], 1),
+    }
+
+
+async def replay_call(api: XOAPI, record: Dict[str, Any]) -> Optional[str]:
+    """Issue one captured call, returning None on success or the kind of error."""
+    try:
+        if record["kind"] == "rpc":
+            await api.get_socket().call(record["method"], record.get("params") or {})
+        elif record.get("stream"):
+            # Transfers are read through, not decoded or held in memory
+            async with api.stream(
+                record["method"], record["endpoint"], params=record.get("params")
+            ) as response:
+                async for _ in response.aiter_bytes():
+                    pass
+        else:
+            await api._request(
+                record["method"],
+                record["endpoint"],
+                params=record.get("params"),
+                json=record.get("body"),
+            )
+    except httpx.HTTPStatusError as e:
+        return f"HTTP {e.response.status_code}"
+    except XOSocketError:
+        return "RPC error"
+    except (httpx.HTTPError, OSError, asyncio.TimeoutError) as e:
+        return type(e).__name__
+    return None
+
+
+async def replay(
+    api: XOAPI,
+    records: List[Dict[str, Any]],
+    speed: float = 1.0,
+    allow_writes: bool = False,
+    concurrency: int = 256,
+) -> Dict[str, Any]:
+    """
+    Replay a capture against the server behind api, keeping the captured
+    spacing between calls divided by speed. Calls are issued on schedule
+    whether or not earlier ones have completed, as the original clients did.
+
+    :param records: Records from xoadmin.api.capture.load_capture(), in order.
+    :param speed: Time compression, e.g. 10 replays a minute of traffic in 6s.
+    :param allow_writes: Also replay the calls that change state; by default
+                         only reads are. Calls whose credentials were
+                         redacted in the capture are never replayed, since
+                         they would be sent with "***" in their place, nor
+                         are streamed uploads, whose body isn't captured.
+    :param concurrency: Maximum calls in flight; calls over it are delayed,
+                        which shows up as lag in the report.
+    :return: Totals, latency statistics per operation next to the captured
+             ones, errors by kind and how late calls were issued.
+    """
+    if speed <= 0:
+        raise ValueError("speed must be positive.")
+    # The replaying client authenticates itself
+    candidates = [
+        record
+        for record in records
+        if record.get("method") not in UNGOVERNED_METHODS
+        and (allow_writes or is_read(record))
+        and not (record.get("stream") and not is_read(record))
+    ]
+    selected = [
+        record
+        for record in candidates
+        if not is_redacted(record.get("params")) and not is_redacted(record.get("body"))
+    ]
+    if len(selected) < len(candidates):
+        logger.warning(
+            f"Skipping {len(candidates) - len(selected)} calls whose credentials "
+            "were redacted in the capture."
+        )
+    latencies: Dict[str, List[float]] = {}
+    captured: Dict[str, List[float]] = {}
+    failures: Dict[str, int] = Counter()
+    errors: Dict[str, int] = Counter()
+    lags: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    async def fire(record: Dict[str, Any], due: float) -> None:
+        async with semaphore:
+            lags.append(max(0.0, loop.time() - due) * 1000)
+            started = loop.time()
+            error = await replay_call(api, record)
+            name = operation(record)
+            latencies.setdefault(name, []).append((loop.time() - started) * 1000)
+            if error is not None:
+                failures[name] += 1
+                errors[error] += 1
+
+    use_socket = any(record["kind"] == "rpc" for record in selected)
+    if use_socket:
+        await api.get_socket().open()
+    start = loop.time()
+    pending = set()
+    try:
+        origin = selected[0]["ts"] if selected else 0
+        for record in selected:
+            captured.setdefault(operation(record), []).append(record["latency_ms"])
+            due = start + (record["ts"] - origin) / speed
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+            task = asyncio.ensure_future(fire(record, due))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+    finally:
+        for task in pending:
+            task.cancel()
+        if use_socket:
+            await api.get_socket().close()
+    duration = loop.time() - start
+
+    operations = []
+    for name, values in sorted(latencies.items(), key=lambda item: -len(item[1])):
+        stats = latency_summary(values)
+        operations.append(
+            {
+                "operation": name,
+                "count": stats["count"],
+                "errors": failures[name],
+                "p50_ms": stats["p50"],
+                "p95_ms": stats["p95"],
+                "p99_ms": stats["p99"],
+                "max_ms": stats["max"],
+                "captured_p95_ms": latency_summary(captured[name])["p95"],
+            }
+        )
+    lag = latency_summary(lags)
+    return {
+        "calls": len(selected),
+        "skipped": len(records) - len(selected),
+        "redacted": len(candidates) - len(selected),
+        "errors": sum(errors.values()),
+        "speed": speed,
+        "duration_s": round(duration, 2),
+        "rate": round(len(selected) / duration, 1) if duration > 0 else None,
+        "lag_p95_ms": lag["p95"],
+        "lag_max_ms": lag["max"],
+        "operations": operations,
+        "errors_by_kind": dict(errors),
+    }
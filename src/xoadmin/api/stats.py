@@ -0,0 +1,196 @@
+import asyncio
+import warnings
+from typing import Any, Dict, Iterable, List, Optional
+
+from xoadmin.api.api import XOAPI
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+METRICS = ("cpu", "memory", "disk", "network")
+GRANULARITIES = ("seconds", "minutes", "hours", "days")
+
+
+def require_numpy():
+    """Import numpy, which is an optional dependency (pip install xoadmin[stats])."""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(
+            "Performance statistics need numpy, install it with: pip install 'xoadmin[stats]'"
+        )
+    return numpy
+
+
+def _sum_series(np, groups: Optional[Dict[str, Any]], window: int):
+    """Sum every series of a {name: [samples]} group into one series."""
+    total = np.zeros(window)
+    for series in (groups or {}).values():
+        total += np.nan_to_num(_tail(np, series, window))
+    return total
+
+
+def _tail(np, series: Optional[List[Any]], window: int):
+    """The last `window` samples as floats, left-padded with NaN."""
+    values = np.asarray(series if series is not None else [], dtype=float)[-window:]
+    if len(values) < window:
+        values = np.concatenate([np.full(window - len(values), np.nan), values])
+    return values
+
+
+def decode_stats(np, stats: Dict[str, Any], window: int) -> Dict[str, Any]:
+    """
+    Decode one XO stats payload into fixed-length arrays per metric:
+    cpu (mean % across vCPUs), memory (bytes used), disk and network
+    (bytes per second, read + write and rx + tx summed over all devices).
+    """
+    cpus = (stats.get("cpus") or {}).values()
+    if cpus:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+            cpu = np.nanmean(
+                np.vstack([_tail(np, series, window) for series in cpus]), axis=0
+            )
+    else:
+        cpu = np.full(window, np.nan)
+    memory = _tail(np, stats.get("memory"), window)
+    if "memoryFree" in stats:
+        memory = memory - _tail(np, stats["memoryFree"], window)
+    disks = stats.get("xvds") or {}
+    nics = stats.get("vifs") or stats.get("pifs") or {}
+    return {
+        "cpu": cpu,
+        "memory": memory,
+        "disk": _sum_series(np, disks.get("r"), window)
+        + _sum_series(np, disks.get("w"), window),
+        "network": _sum_series(np, nics.get("rx"), window)
+        + _sum_series(np, nics.get("tx"), window),
+    }
+
+
+class StatsFrame:
+    """
+    Stats for many objects as one (objects x samples) array per metric, so
+    aggregations over thousands of VMs are single vectorized operations.
+    """
+
+    def __init__(self, ids: List[str], series: Dict[str, Any], window: int) -> None:
+        self.ids = ids
+        self.series = series
+        self.window = window
+
+    @classmethod
+    def from_payloads(cls, payloads: Dict[str, Dict[str, Any]], window: int = 12):
+        np = require_numpy()
+        ids = list(payloads)
+        decoded = [
+            decode_stats(np, payloads[i].get("stats") or {}, window) for i in ids
+        ]
+        series = {
+            metric: (
+                np.vstack([d[metric] for d in decoded])
+                if decoded
+                else np.empty((0, window))
+            )
+            for metric in METRICS
+        }
+        return cls(ids, series, window)
+
+    def aggregate(self, metric: str, how: str = "mean"):
+        """Per-object aggregate of a metric: mean, max, last or p<N> (e.g. p95)."""
+        np = require_numpy()
+        values = self.series[metric]
+        if not len(values):
+            return np.empty(0)
+        # Objects without samples aggregate to NaN rather than warning
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return self._aggregate(np, values, how)
+
+    @staticmethod
+    def _aggregate(np, values, how: str):
+        if how == "mean":
+            return np.nanmean(values, axis=1)
+        if how == "max":
+            return np.nanmax(values, axis=1)
+        if how == "last":
+            return values[:, -1]
+        if how.startswith("p"):
+            return np.nanpercentile(values, float(how[1:]), axis=1)
+        raise ValueError(f"Unknown aggregate '{how}'.")
+
+    def top(self, metric: str = "cpu", n: int = 20, how: str = "mean") -> List[str]:
+        """Ids of the n objects with the highest aggregate, highest first."""
+        np = require_numpy()
+        scores = np.nan_to_num(self.aggregate(metric, how), nan=-np.inf)
+        n = min(n, len(scores))
+        if n == 0:
+            return []
+        # argpartition finds the top n in linear time; only those get sorted
+        candidates = np.argpartition(-scores, n - 1)[:n]
+        ordered = candidates[np.argsort(-scores[candidates])]
+        return [self.ids[i] for i in ordered]
+
+    def summary(self, ids: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Mean and p95 of every metric per object, as rows."""
+        index = {obj_id: i for i, obj_id in enumerate(self.ids)}
+        aggregates = {
+            f"{metric}_{how}": self.aggregate(metric, how)
+            for metric in METRICS
+            for how in ("mean", "p95")
+        }
+        rows = []
+        for obj_id in ids if ids is not None else self.ids:
+            i = index[obj_id]
+            row = {"id": obj_id}
+            row.update({key: float(values[i]) for key, values in aggregates.items()})
+            rows.append(row)
+        return rows
+
+
+class StatsManagement:
+    """Fetch RRD performance statistics for VMs and hosts."""
+
+    def __init__(self, api: XOAPI, concurrency: int = 32) -> None:
+        self.api = api
+        self.concurrency = concurrency
+
+    async def get_stats(
+        self, collection: str, obj_id: str, granularity: str = "seconds"
+    ) -> Dict[str, Any]:
+        """Raw stats of one object; collection is "vms" or "hosts"."""
+        return await self.api.get(
+            f"rest/v0/{collection}/{obj_id}/stats",
+            params={"granularity": granularity},
+        )
+
+    async def fetch(
+        self, collection: str, ids: Iterable[str], granularity: str = "seconds"
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch stats for many objects concurrently over the shared connection
+        pool. Objects whose stats can't be fetched (e.g. halted VMs) are skipped.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_one(obj_id: str):
+            async with semaphore:
+                try:
+                    return obj_id, await self.get_stats(collection, obj_id, granularity)
+                except Exception as e:
+                    logger.debug(f"No stats for {collection}/{obj_id}: {e}")
+                    return obj_id, None
+
+        results = await asyncio.gather(*(fetch_one(obj_id) for obj_id in ids))
+        return {obj_id: stats for obj_id, stats in results if stats is not None}
+
+    async def collect(
+        self,
+        collection: str,
+        ids: Iterable[str],
+        granularity: str = "seconds",
+        window: int = 12,
+    ) -> StatsFrame:
+        """Fetch stats for many objects and decode them into a StatsFrame."""
+        payloads = await self.fetch(collection, ids, granularity)
+        return StatsFrame.from_payloads(payloads, window=window)
@@ -1,6 +1,29 @@
-from typing import Any, Dict, List
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+
+import httpx
 
 from xoadmin.api.api import XOAPI
+from xoadmin.api.transfer import (
+    TRANSFER_TIMEOUT,
+    TransferProgress,
+    file_chunks,
+    write_chunks,
+)
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+VDI_FORMATS = ("vhd", "raw")
+
+
+def _range_total(response: httpx.Response) -> Optional[int]:
+    """The full size given by a 416 response, e.g. 1000 for "bytes */1000"."""
+    if response.status_code != 416:
+        return None
+    total = response.headers.get("Content-Range", "").rpartition("/")[2]
+    return int(total) if total.isdigit() else None
 
 
 class StorageManagement:
@@ -9,20 +32,24 @@ class StorageManagement:
     def __init__(self, api: XOAPI) -> None:
         self.api = api
 
-    async def list_srs(self) -> List[Dict[str, Any]]:
-        """List all Storage Repositories (SRs) with basic information."""
-        srs = await self.api.get("rest/v0/srs")
-
-        # Extract SR IDs from the URLs
-        sr_ids = [sr.split("/")[-1] for sr in srs]
-
-        # Fetch detailed information for each storage repository
-        detailed_srs = []
-        for sr_id in sr_ids:
-            detailed_sr = await self.get_sr_details(sr_id)
-            detailed_srs.append(detailed_sr)
+    async def list_srs(self, filter: Optional[str] = None) -> List[Dict[str, Any]]:
+        """List Storage Repositories (SRs) with basic information, optionally filtered."""
+        if filter:
+            sr_ids = [
+                sr["id"]
+                async for sr in self.api.iter_collection(
+                    "srs", fields=["id"], filter=filter
+                )
+            ]
+        else:
+            srs = await self.api.get("rest/v0/srs")
+            # Extract SR IDs from the URLs
+            sr_ids = [sr.split("/")[-1] for sr in srs]
 
-        return detailed_srs
+        # Fetch detailed information for all storage repositories concurrently
+        return list(
+            await asyncio.gather(*(self.get_sr_details(sr_id) for sr_id in sr_ids))
+        )
 
     async def get_sr_details(self, sr_id: str) -> Dict[str, Any]:
         """Get detailed information about a specific Storage Repository (SR)."""
@@ -38,3 +65,97 @@ class StorageManagement:
     async def delete_vdi(self, vdi_id: str) -> bool:
         """Delete a specified VDI."""
         return await self.api.delete(f"rest/v0/vdis/{vdi_id}")
+
+    async def export_vdi(
+        self,
+        vdi_id: str,
+        destination: str,
+        format: str = "vhd",
+        resume: bool = False,
+        progress: Optional[TransferProgress] = None,
+    ) -> TransferProgress:
+        """
+        Stream a VDI's content to a local file.
+
+        :param vdi_id: The VDI to export.
+        :param destination: Path of the file to write.
+        :param format: "vhd" or "raw".
+        :param resume: Continue a partial download from the size of the
+                       existing file, using an HTTP range request. A file
+                       already complete is left as is.
+        :param progress: Progress tracker, created if not given.
+        :return: The progress tracker, with the final byte count and throughput.
+        """
+        if format not in VDI_FORMATS:
+            raise ValueError(
+                f"Unsupported VDI format '{format}', use one of {VDI_FORMATS}."
+            )
+        offset = (
+            os.path.getsize(destination)
+            if resume and os.path.exists(destination)
+            else 0
+        )
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        progress = progress or TransferProgress()
+
+        try:
+            async with self.api.stream(
+                "GET",
+                f"rest/v0/vdis/{vdi_id}.{format}",
+                headers=headers,
+                timeout=TRANSFER_TIMEOUT,
+            ) as response:
+                if offset and response.status_code != 206:
+                    logger.warning(
+                        f"Server ignored the range request for VDI {vdi_id}, restarting from 0."
+                    )
+                    offset = 0
+                length = response.headers.get("Content-Length")
+                progress.offset = offset
+                progress.total = offset + int(length) if length else None
+                with open(destination, "ab" if offset else "wb") as f:
+                    await write_chunks(response, f, progress)
+        except httpx.HTTPStatusError as e:
+            # A range starting at the end of the VDI: nothing is left to fetch
+            if not offset or _range_total(e.response) != offset:
+                raise
+            logger.info(f"VDI {vdi_id} was already fully exported to {destination}.")
+            progress.offset = progress.total = offset
+        return progress
+
+    async def import_vdi(
+        self,
+        vdi_id: str,
+        source: str,
+        format: str = "vhd",
+        progress: Optional[TransferProgress] = None,
+    ) -> TransferProgress:
+        """
+        Stream a local disk image into an existing VDI.
+
+        Uploads always start from the first byte: XO's import writes the
+        body from the start of the VDI and has no way to resume.
+
+        :param vdi_id: The VDI to write to.
+        :param source: Path of the VHD or raw image to upload.
+        :param format: "vhd" or "raw".
+        :param progress: Progress tracker, created if not given.
+        :return: The progress tracker, with the final byte count and throughput.
+        """
+        if format not in VDI_FORMATS:
+            raise ValueError(
+                f"Unsupported VDI format '{format}', use one of {VDI_FORMATS}."
+            )
+        size = os.path.getsize(source)
+        progress = progress or TransferProgress()
+        progress.total = size
+
+        async with self.api.stream(
+            "PUT",
+            f"rest/v0/vdis/{vdi_id}.{format}",
+            content=file_chunks(source, progress=progress),
+            headers={"Content-Length": str(size)},
+            timeout=TRANSFER_TIMEOUT,
+        ) as response:
+            await response.aread()
+        return progress
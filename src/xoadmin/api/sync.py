@@ -0,0 +1,178 @@
+import asyncio
+import functools
+import inspect
+import threading
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+from xoadmin.api.governor import Governor
+from xoadmin.api.manager import XOAManager
+
+
+class LoopThread:
+    """An event loop running forever in a daemon thread."""
+
+    def __init__(self, name: str = "xoadmin-loop") -> None:
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, awaitable: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and block until it returns."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("Blocking call made from the event loop thread.")
+        future = asyncio.run_coroutine_threadsafe(awaitable, self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stop(self) -> None:
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+class SyncProxy:
+    """
+    A blocking view of an asynchronous xoadmin object.
+
+    Coroutine methods run on the loop thread and return their result;
+    async generators become iterators; attributes holding other xoadmin
+    objects (e.g. a manager's vm_management) are wrapped in turn.
+    """
+
+    def __init__(self, target: Any, runner: LoopThread) -> None:
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_runner", runner)
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if inspect.iscoroutinefunction(attr):
+            return self._blocking(attr)
+        if inspect.isasyncgenfunction(attr):
+            return self._iterating(attr)
+        if type(attr).__module__.startswith("xoadmin.") and not callable(attr):
+            return SyncProxy(attr, self._runner)
+        return attr
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._target, name, value)
+
+    def __dir__(self):
+        return dir(self._target)
+
+    def __repr__(self) -> str:
+        return f"SyncProxy({self._target!r})"
+
+    def _blocking(self, method: Callable) -> Callable:
+        @functools.wraps(method)
+        def call(*args: Any, **kwargs: Any) -> Any:
+            return self._runner.run(method(*args, **kwargs))
+
+        return call
+
+    def _iterating(self, method: Callable) -> Callable:
+        @functools.wraps(method)
+        def iterate(*args: Any, **kwargs: Any) -> Iterator[Any]:
+            generator = method(*args, **kwargs)
+            try:
+                while True:
+                    try:
+                        yield self._runner.run(generator.__anext__())
+                    except StopAsyncIteration:
+                        return
+            finally:
+                self._runner.run(generator.aclose())
+
+        return iterate
+
+
+class SyncXOAManager(SyncProxy):
+    """
+    A blocking XOAManager for synchronous code (scripts, Ansible modules,
+    web views).
+
+    One event loop runs in a background thread for the lifetime of the
+    manager, so the HTTP connection pool, the authentication token and the
+    signed-in WebSocket are reused across calls instead of being recreated
+    by an asyncio.run() per call. Every XOAManager method is available as a
+    blocking method, and the management classes through their usual
+    attributes, e.g. manager.vm_management.list_vms().
+
+        with SyncXOAManager("xoa.example.com", verify_ssl=False) as manager:
+            manager.authenticate("admin@admin.net", "secret")
+            vms = manager.vm_management.list_vms(filter="power_state:Running")
+
+    Methods may be called from several threads; the calls are multiplexed
+    on the shared loop.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        rest_base_url: str = None,
+        ws_url: str = None,
+        verify_ssl: bool = True,
+        governor: Optional[Governor] = None,
+        adaptive: bool = False,
+    ) -> None:
+        runner = LoopThread()
+
+        # Build the manager on the loop, which its asyncio objects belong to
+        async def create() -> XOAManager:
+            return XOAManager(
+                host,
+                rest_base_url=rest_base_url,
+                ws_url=ws_url,
+                verify_ssl=verify_ssl,
+                governor=governor,
+                adaptive=adaptive,
+            )
+
+        try:
+            manager = runner.run(create())
+        except BaseException:
+            runner.stop()
+            raise
+        super().__init__(manager, runner)
+        object.__setattr__(self, "_socket_held", False)
+
+    def authenticate(self, username: str, password: str) -> None:
+        """Authenticate, then keep the WebSocket signed in for later calls."""
+
+        async def authenticate() -> None:
+            await self._target.authenticate(username, password)
+            if not self._socket_held:
+                await self._target.api.get_socket().open()
+                object.__setattr__(self, "_socket_held", True)
+
+        self._runner.run(authenticate())
+
+    def close(self) -> None:
+        """Close the connections and stop the background loop."""
+        if self._runner.loop.is_closed():
+            return
+
+        async def close() -> None:
+            if self._socket_held:
+                await self._target.api.get_socket().close()
+                object.__setattr__(self, "_socket_held", False)
+            await self._target.close()
+
+        try:
+            self._runner.run(close())
+        finally:
+            self._runner.stop()
+
+    def __enter__(self) -> "SyncXOAManager":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import mmap
+import os
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Deque, Optional
+
+import httpx
+
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+COMPRESSIONS = ("none", "gzip")
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz"}
+
+# Disk transfers can stall for a long time between chunks (e.g. while XAPI
+# prepares an export), so only the connect phase keeps a short timeout.
+TRANSFER_TIMEOUT = httpx.Timeout(connect=10.0, read=600.0, write=600.0, pool=None)
+
+
+class TransferProgress:
+    """Tracks the bytes moved by one transfer and its throughput."""
+
+    def __init__(
+        self,
+        total: Optional[int] = None,
+        offset: int = 0,
+        callback: Optional[Callable[["TransferProgress"], None]] = None,
+    ) -> None:
+        """
+        :param total: Expected total size in bytes, if known.
+        :param offset: Bytes already transferred before this run (resume).
+        :param callback: Called after every chunk with this object.
+        """
+        self.total = total
+        self.offset = offset
+        self.transferred = 0
+        self.callback = callback
+        self.started = time.monotonic()
+
+    @property
+    def position(self) -> int:
+        return self.offset + self.transferred
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second moved during this run."""
+        return self.transferred / self.elapsed if self.elapsed > 0 else 0.0
+
+    def update(self, size: int) -> None:
+        self.transferred += size
+        if self.callback is not None:
+            self.callback(self)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.position / 2**20:.1f} MiB in {self.elapsed:.1f}s "
+            f"({self.throughput / 2**20:.1f} MiB/s)"
+        )
+
+
+async def file_chunks(
+    path: str,
+    offset: int = 0,
+    chunk_size: int = CHUNK_SIZE,
+    progress: Optional[TransferProgress] = None,
+) -> AsyncIterator[memoryview]:
+    """
+    Yield a file's content from offset as slices of a memory map.
+
+    Slices are views on the page cache, so the file is never copied into
+    Python objects before being written to the socket.
+    """
+    size = os.path.getsize(path)
+    if offset >= size:
+        return
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            for start in range(offset, size, chunk_size):
+                chunk = view[start : start + chunk_size]
+                yield chunk
+                if progress is not None:
+                    progress.update(len(chunk))
+                del chunk
+        finally:
+            try:
+                view.release()
+                mapped.close()
+            except BufferError:
+                # A consumer still references a slice; the map is freed with it
+                logger.debug(f"Deferring unmap of {path}")
+
+
+async def write_chunks(
+    response: httpx.Response,
+    f,
+    progress: Optional[TransferProgress] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> int:
+    """
+    Stream a response body to an open file.
+
+    Each write runs in a worker thread while the next chunk is read from the
+    network, so at most two chunks are held in memory.
+    """
+    loop = asyncio.get_running_loop()
+    written = 0
+    pending: Optional[asyncio.Future] = None
+    async for chunk in response.aiter_bytes(chunk_size):
+        if pending is not None:
+            await pending
+        pending = loop.run_in_executor(None, f.write, chunk)
+        written += len(chunk)
+        if progress is not None:
+            progress.update(len(chunk))
+    if pending is not None:
+        await pending
+    return written
+
+
+class PipelineWriter:
+    """
+    Compresses, checksums and writes chunks on worker threads.
+
+    Two single-threaded stages (compression, then checksum and write) run in
+    order alongside the caller, which keeps reading from the network. zlib
+    and hashlib release the GIL on large buffers, so the stages overlap with
+    the read loop. At most `depth` chunks are in flight.
+    """
+
+    def __init__(self, path: str, compression: str = "none", depth: int = 4) -> None:
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                f"Unsupported compression '{compression}', use one of {COMPRESSIONS}."
+            )
+        self.path = path
+        self.depth = depth
+        self.sha256 = hashlib.sha256()
+        self.written = 0
+        # wbits=31 produces a gzip container readable by gunzip
+        self._compressor = (
+            zlib.compressobj(6, zlib.DEFLATED, 31) if compression == "gzip" else None
+        )
+        self._file = open(path, "wb")
+        self._compress_stage = ThreadPoolExecutor(max_workers=1)
+        self._write_stage = ThreadPoolExecutor(max_workers=1)
+        self._pending: Deque[Future] = deque()
+
+    def _compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) if self._compressor else chunk
+
+    def _write(self, compressed: Future) -> None:
+        data = compressed.result()
+        if data:
+            self.sha256.update(data)
+            self._file.write(data)
+            self.written += len(data)
+
+    async def write(self, chunk: bytes) -> None:
+        """Queue a chunk, waiting only when the pipeline is full."""
+        compressed = self._compress_stage.submit(self._compress, chunk)
+        self._pending.append(self._write_stage.submit(self._write, compressed))
+        while len(self._pending) > self.depth:
+            await asyncio.wrap_future(self._pending.popleft())
+
+    async def close(self) -> str:
+        """Flush the pipeline and return the hex SHA-256 of the written file."""
+        try:
+            while self._pending:
+                await asyncio.wrap_future(self._pending.popleft())
+            if self._compressor is not None:
+                tail = self._write_stage.submit(
+                    self._write, self._compress_stage.submit(self._compressor.flush)
+                )
+                await asyncio.wrap_future(tail)
+        finally:
+            self._compress_stage.shutdown(wait=True)
+            self._write_stage.shutdown(wait=True)
+            self._file.close()
+        return self.sha256.hexdigest()
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from xoadmin.api.api import XOAPI
 from xoadmin.api.error import XOSocketError
@@ -13,9 +13,16 @@ class UserManagement:
     def __init__(self, api: XOAPI) -> None:
         self.api = api
 
-    async def list_users(self) -> List[str]:
-        """List all users by their API paths."""
-        return await self.api.get("rest/v0/users")
+    async def list_users(self, filter: Optional[str] = None) -> List[str]:
+        """List users by their API paths, optionally filtered."""
+        if not filter:
+            return await self.api.get("rest/v0/users")
+        return [
+            f"/rest/v0/users/{user['id']}"
+            async for user in self.api.iter_collection(
+                "users", fields=["id"], filter=filter
+            )
+        ]
 
     async def get_user_details(self, user_path: str) -> Dict[str, Any]:
         """Fetch detailed information for a user given their API path."""
@@ -63,6 +70,29 @@ class UserManagement:
             logger.error(f"Unexpected error occurred: {e}")
             raise
 
+    async def update_user(
+        self,
+        user_id: str,
+        password: Optional[str] = None,
+        permission: Optional[str] = None,
+    ) -> None:
+        """
+        Change a user's password and/or permission with user.set.
+
+        :param user_id: The ID of the user.
+        """
+        params = {"id": user_id}
+        if password is not None:
+            params["password"] = password
+        if permission is not None:
+            params["permission"] = permission
+        socket = self.api.get_socket()
+        await socket.open()
+        try:
+            await socket.call("user.set", params)
+        finally:
+            await socket.close()
+
     async def delete_user(self, user_id: str) -> bool:
         """
         Delete a user by their ID using WebSocket and JSON-RPC.
@@ -1,6 +1,22 @@
-from typing import Any, Dict, List
+import asyncio
+import contextlib
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
 
 from xoadmin.api.api import XOAPI
+from xoadmin.api.limits import TokenBucket
+from xoadmin.api.transfer import (
+    COMPRESSION_SUFFIXES,
+    TRANSFER_TIMEOUT,
+    PipelineWriter,
+    TransferProgress,
+)
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_VM_FIELDS = ("id", "name_label")
 
 
 class VMManagement:
@@ -9,10 +25,23 @@ class VMManagement:
     def __init__(self, api: XOAPI) -> None:
         self.api = api
 
-    async def list_vms(self) -> List[Dict[str, Any]]:
-        """List all VMs."""
-        vms = await self.api.get("rest/v0/vms?fields=id,name_label")
-        return vms
+    async def list_vms(
+        self,
+        filter: Optional[str] = None,
+        fields: Iterable[str] = DEFAULT_VM_FIELDS,
+    ) -> List[Dict[str, Any]]:
+        """
+        List VMs.
+
+        :param filter: Complex-matcher expression, e.g. "tags:prod-db power_state:Running".
+        :param fields: Fields to return for each VM.
+        """
+        return [
+            vm
+            async for vm in self.api.iter_collection(
+                "vms", fields=fields, filter=filter
+            )
+        ]
 
     async def start_vm(self, vm_id: str) -> Dict[str, Any]:
         """Start a specified VM."""
@@ -27,18 +56,227 @@ class VMManagement:
         return await self.api.delete(f"rest/v0/vms/{vm_id}")
 
     async def create_vm_from_template(
-        self, template_id: str, name: str, description: str = ""
+        self,
+        template_id: str,
+        name: str,
+        description: str = "",
+        overrides: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
-        """Create a new VM from a specified template."""
+        """
+        Create a new VM from a specified template.
+
+        :param overrides: Extra creation parameters, e.g. CPUs or memory,
+                          overriding the template's.
+        """
         # This method would need to construct the appropriate payload
         # based on your Xen Orchestra's API requirements for VM creation
         vm_data = {
             "template": template_id,
             "name_label": name,
             "name_description": description,
+            **(overrides or {}),
         }
         return await self.api.post("rest/v0/vms", json_data=vm_data)
 
-    async def list_template_vms(self) -> List[Dict[str, Any]]:
-        """List all VM templates."""
-        return await self.api.get("rest/v0/vm-templates")
+    async def resolve_template(self, template: str) -> Dict[str, Any]:
+        """
+        Find a template by id or exact name.
+
+        :raises ValueError: If no template, or several templates, match.
+        """
+        matches = [
+            candidate
+            async for candidate in self.api.iter_collection(
+                "vm-templates", fields=["id", "name_label"]
+            )
+            if template in (candidate.get("id"), candidate.get("name_label"))
+        ]
+        if not matches:
+            raise ValueError(f"No template named '{template}'.")
+        if len(matches) > 1:
+            raise ValueError(
+                f"Template name '{template}' is ambiguous, use one of the ids: "
+                f"{', '.join(match['id'] for match in matches)}."
+            )
+        return matches[0]
+
+    async def create_vms_from_template(
+        self,
+        template: str,
+        count: int,
+        name_pattern: str = "{template}-{index:03}",
+        description: str = "",
+        overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+        start_index: int = 1,
+        concurrency: int = 8,
+        rate: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Create many VMs from one template concurrently.
+
+        The template is resolved once, then creations run under a concurrency
+        limit and a creations-per-second cap. Each creation waits for its XO
+        task to finish, so a result means the VM exists.
+
+        :param template: Template id or exact name.
+        :param count: Number of VMs to create.
+        :param name_pattern: str.format pattern for the VM names, given
+                             `index` and `template` (the template name).
+        :param description: Description of the new VMs.
+        :param overrides: Creation parameters per VM name; the "*" entry
+                          applies to every VM.
+        :param start_index: Index of the first VM.
+        :param concurrency: Maximum number of creations running at once.
+        :param rate: Maximum creations started per second, unlimited if None.
+        :return: One result per VM, with an "error" key for failed creations.
+        """
+        resolved = await self.resolve_template(template)
+        overrides = overrides or {}
+        names = [
+            name_pattern.format(index=index, template=resolved.get("name_label", ""))
+            for index in range(start_index, start_index + count)
+        ]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Name pattern '{name_pattern}' gives duplicate names.")
+        limiter = TokenBucket(rate, capacity=1) if rate else None
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def create(name: str) -> Dict[str, Any]:
+            async with semaphore:
+                if limiter is not None:
+                    await limiter.acquire()
+                started = time.monotonic()
+                try:
+                    created = await self.create_vm_from_template(
+                        resolved["id"],
+                        name,
+                        description,
+                        overrides={**overrides.get("*", {}), **overrides.get(name, {})},
+                    )
+                    # Asynchronous creations answer with the href of their task
+                    if isinstance(created, str):
+                        created = await self.api.wait_task(created)
+                    vm_id = created.get("id") if isinstance(created, dict) else created
+                    return {
+                        "name_label": name,
+                        "vm_id": vm_id,
+                        "seconds": round(time.monotonic() - started, 2),
+                    }
+                except Exception as e:
+                    logger.error(f"Creation of VM {name} failed: {e}")
+                    return {
+                        "name_label": name,
+                        "error": str(e),
+                        "seconds": round(time.monotonic() - started, 2),
+                    }
+
+        return await asyncio.gather(*(create(name) for name in names))
+
+    async def list_template_vms(
+        self, filter: Optional[str] = None, fields: Iterable[str] = DEFAULT_VM_FIELDS
+    ) -> List[Dict[str, Any]]:
+        """List VM templates, optionally filtered."""
+        if not filter:
+            return await self.api.get("rest/v0/vm-templates")
+        return [
+            template
+            async for template in self.api.iter_collection(
+                "vm-templates", fields=fields, filter=filter
+            )
+        ]
+
+    async def export_vm(
+        self,
+        vm_id: str,
+        destination: str,
+        compression: str = "gzip",
+        limiter: Optional[TokenBucket] = None,
+        progress: Optional[TransferProgress] = None,
+    ) -> Dict[str, Any]:
+        """
+        Stream a VM export (XVA) to a local file.
+
+        The response is read on the event loop while compression, checksumming
+        and disk writes run on worker threads. The file is written under a
+        .part name and renamed once complete.
+
+        :param vm_id: The VM to export.
+        :param destination: Path of the file to write.
+        :param compression: "gzip" or "none".
+        :param limiter: Token bucket in bytes per second, shared between
+                        concurrent exports to cap their total bandwidth.
+        :param progress: Progress tracker, created if not given.
+        :return: A summary with the path, sizes, SHA-256 and duration.
+        """
+        progress = progress or TransferProgress()
+        partial = f"{destination}.part"
+        writer = PipelineWriter(partial, compression=compression)
+        try:
+            async with self.api.stream(
+                "GET", f"rest/v0/vms/{vm_id}.xva", timeout=TRANSFER_TIMEOUT
+            ) as response:
+                length = response.headers.get("Content-Length")
+                progress.total = int(length) if length else None
+                async for chunk in response.aiter_bytes(1024 * 1024):
+                    if limiter is not None:
+                        await limiter.acquire(len(chunk))
+                    await writer.write(chunk)
+                    progress.update(len(chunk))
+            sha256 = await writer.close()
+        except BaseException:
+            with contextlib.suppress(Exception):
+                await writer.close()
+            os.remove(partial)
+            raise
+        os.replace(partial, destination)
+        return {
+            "vm_id": vm_id,
+            "path": destination,
+            "bytes_read": progress.transferred,
+            "bytes_written": writer.written,
+            "sha256": sha256,
+            "seconds": round(progress.elapsed, 2),
+        }
+
+    async def export_vms(
+        self,
+        vm_ids: List[str],
+        directory: str,
+        compression: str = "gzip",
+        concurrency: int = 4,
+        bandwidth: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Export several VMs concurrently into a directory.
+
+        :param vm_ids: The VMs to export.
+        :param directory: Directory receiving one <vm_id>.xva[.gz] per VM.
+        :param compression: "gzip" or "none".
+        :param concurrency: Maximum number of exports running at once.
+        :param bandwidth: Total bytes per second across all exports, unlimited if None.
+        :return: One summary per VM, with an "error" key for failed exports.
+        """
+        os.makedirs(directory, exist_ok=True)
+        limiter = TokenBucket(bandwidth) if bandwidth else None
+        semaphore = asyncio.Semaphore(concurrency)
+        suffix = ".xva" + COMPRESSION_SUFFIXES[compression]
+
+        async def export(vm_id: str) -> Dict[str, Any]:
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    return await self.export_vm(
+                        vm_id,
+                        os.path.join(directory, vm_id + suffix),
+                        compression=compression,
+                        limiter=limiter,
+                    )
+                except Exception as e:
+                    logger.error(f"Export of VM {vm_id} failed: {e}")
+                    return {
+                        "vm_id": vm_id,
+                        "error": str(e),
+                        "seconds": round(time.monotonic() - started, 2),
+                    }
+
+        return await asyncio.gather(*(export(vm_id) for vm_id in vm_ids))
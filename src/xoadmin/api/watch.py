@@ -0,0 +1,154 @@
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from xoadmin.api.api import XOAPI
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Fields XO rewrites on almost every event without a meaningful state change
+NOISY_FIELDS = {"_xapiRef", "$poolId", "current_operations", "other"}
+
+
+def diff_fields(
+    old: Dict[str, Any], new: Dict[str, Any], ignore=NOISY_FIELDS
+) -> Dict[str, List[Any]]:
+    """Return the top-level fields that differ between two objects as [old, new]."""
+    changes = {}
+    for key in old.keys() | new.keys():
+        if key in ignore:
+            continue
+        before, after = old.get(key), new.get(key)
+        if before != after:
+            changes[key] = [before, after]
+    return changes
+
+
+class ObjectWatcher:
+    """
+    Follows the XO object event feed and yields changes for one object type.
+
+    A single websocket connection is kept open: the current objects are
+    fetched once with xo.getAllObjects, then "all" notifications are applied
+    to that local copy and only the differences are reported.
+    """
+
+    def __init__(
+        self,
+        api: XOAPI,
+        object_type: str = "VM",
+        tag: Optional[str] = None,
+        pool: Optional[str] = None,
+        host: Optional[str] = None,
+    ) -> None:
+        self.api = api
+        self.object_type = object_type
+        self.tag = tag
+        self.pool = pool
+        self.host = host
+        self.objects: Dict[str, Dict[str, Any]] = {}
+
+    async def get_objects(self, object_type: str) -> Dict[str, Dict[str, Any]]:
+        """Fetch all objects of a type, keyed by id."""
+        socket = self.api.get_socket()
+        response = await socket.call(
+            "xo.getAllObjects", {"filter": {"type": object_type}}
+        )
+        return response.get("result") or {}
+
+    async def _resolve(self, object_type: str, value: Optional[str]) -> Optional[str]:
+        """Resolve a pool or host given by id or name_label to its id."""
+        if value is None:
+            return None
+        objects = await self.get_objects(object_type)
+        if value in objects:
+            return value
+        for obj_id, obj in objects.items():
+            if obj.get("name_label") == value:
+                return obj_id
+        raise ValueError(f"No {object_type} found matching '{value}'.")
+
+    def _build_predicate(
+        self, pool_id: Optional[str], host_id: Optional[str]
+    ) -> Callable[[Dict[str, Any]], bool]:
+        def predicate(obj: Dict[str, Any]) -> bool:
+            if obj.get("type") != self.object_type:
+                return False
+            if self.tag is not None and self.tag not in (obj.get("tags") or []):
+                return False
+            if pool_id is not None and obj.get("$pool") != pool_id:
+                return False
+            if host_id is not None and obj.get("$container") != host_id:
+                return False
+            return True
+
+        return predicate
+
+    def apply_event(
+        self, event_type: str, items: Dict[str, Any], predicate: Callable
+    ) -> List[Dict[str, Any]]:
+        """
+        Apply one "all" notification to the local copy and return the changes.
+
+        Objects leaving the filter (e.g. a removed tag) are reported as
+        removals, objects entering it as additions.
+        """
+        changes = []
+        for obj_id, obj in items.items():
+            previous = self.objects.get(obj_id)
+            if event_type == "exit" or not predicate(obj):
+                if previous is not None:
+                    del self.objects[obj_id]
+                    changes.append(self._change("remove", obj_id, previous))
+                continue
+            self.objects[obj_id] = obj
+            if previous is None:
+                changes.append(self._change("add", obj_id, obj))
+            else:
+                fields = diff_fields(previous, obj)
+                if fields:
+                    changes.append(self._change("change", obj_id, obj, fields))
+        return changes
+
+    @staticmethod
+    def _change(
+        event: str, obj_id: str, obj: Dict[str, Any], fields: Dict = None
+    ) -> Dict[str, Any]:
+        change = {"event": event, "id": obj_id, "name_label": obj.get("name_label")}
+        if "power_state" in obj:
+            change["power_state"] = obj["power_state"]
+        if fields is not None:
+            change["changes"] = fields
+        return change
+
+    async def watch(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield the current matching objects as additions, then every change.
+        """
+        socket = self.api.get_socket()
+        await socket.open()
+        # Subscribe before fetching the initial set so no event is missed
+        queue = socket.subscribe()
+        try:
+            predicate = self._build_predicate(
+                await self._resolve("pool", self.pool),
+                await self._resolve("host", self.host),
+            )
+            initial = await self.get_objects(self.object_type)
+            for change in self.apply_event("enter", initial, predicate):
+                yield change
+
+            while True:
+                message = await queue.get()
+                if message is None:
+                    logger.warning("Event feed closed by the server.")
+                    return
+                if message.get("method") != "all":
+                    continue
+                params = message.get("params") or {}
+                for change in self.apply_event(
+                    params.get("type", "enter"), params.get("items") or {}, predicate
+                ):
+                    yield change
+        finally:
+            socket.unsubscribe(queue)
+            await socket.close()
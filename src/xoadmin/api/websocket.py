@@ -1,17 +1,26 @@
+import asyncio
 import json
 import ssl
+import time
 import uuid
-from typing import Dict
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set
 from uuid import uuid4
 
 import websockets
 
 from xoadmin.api.error import AuthenticationError, ServerError, XOSocketError
+from xoadmin.api.jsonstream import ItemParser
 from xoadmin.utils import get_logger
 
 logger = get_logger()
 
 
+def is_read_method(method: str) -> bool:
+    """Whether a JSON-RPC method only reads state, e.g. vm.getAll or xo.getAllObjects."""
+    action = method.rsplit(".", 1)[-1]
+    return action.startswith(("get", "list")) or action in ("stats", "signIn")
+
+
 class XOSocket:
     """
     A client for establishing a WebSocket connection with a Xen Orchestra server
@@ -35,6 +44,25 @@ class XOSocket:
         self.user = None
         self.websocket = None
         self.verify_ssl = verify_ssl
+        # Multiplexing state: pending calls keyed by JSON-RPC id, queues of
+        # subscribers to server notifications and the task reading frames.
+        self._pending: Dict[str, asyncio.Future] = {}
+        # Ids of the calls whose response frame is passed on undecoded
+        self._raw: Set[str] = set()
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._reader: Optional[asyncio.Task] = None
+        self._refs = 0
+        self._lock: Optional[asyncio.Lock] = None
+        # Called with the method name before each call, e.g. to invalidate caches
+        self.on_call: Optional[Callable[[str], None]] = None
+        # Optional xoadmin.api.governor.Governor limiting the calls, and
+        # xoadmin.api.limits.AdaptiveLimiter adapting their concurrency
+        self.governor = None
+        self.limiter = None
+        # Optional xoadmin.api.capture.TrafficRecorder, and the size of the
+        # responses received for calls being recorded
+        self.recorder = None
+        self._response_sizes: Dict[str, int] = {}
 
     def is_verify_ssl(self):
         return self.verify_ssl
@@ -42,10 +70,31 @@ class XOSocket:
     def set_credentials(self, username: str, password: str) -> None:
         self.credentials = {"email": str(username), "password": str(password)}
 
+    def is_open(self) -> bool:
+        return (
+            self.websocket is not None
+            and self._reader is not None
+            and not self._reader.done()
+        )
+
     async def open(self) -> bool:
         """
         Opens the WebSocket connection and signs in with the provided credentials.
+
+        The connection is shared: opening an already open socket only takes a
+        reference on it, and it is closed once every opener has called close().
         """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self.is_open():
+                # Drop a connection the server has closed before reconnecting
+                await self._disconnect()
+                await self._connect()
+            self._refs += 1
+        return True
+
+    async def _connect(self) -> None:
         ssl_context = (
             ssl.create_default_context()
             if self.url.startswith("wss://") and self.verify_ssl
@@ -57,32 +106,144 @@ class XOSocket:
             ssl_context.verify_mode = ssl.CERT_NONE
 
         try:
+            # xo.getAllObjects replies easily exceed the default 1 MiB frame
+            # limit; permessage-deflate shrinks them several times on the wire
             self.websocket = await websockets.connect(
-                self.url, ssl=ssl_context if self.url.startswith("wss://") else None
+                self.url,
+                ssl=ssl_context if self.url.startswith("wss://") else None,
+                max_size=None,
+                compression="deflate",
             )
             logger.debug("Connection opened.")
+            self._reader = asyncio.ensure_future(self._read_loop(self.websocket))
             if self.credentials:
                 await self.sign_in(self.credentials)
                 logger.debug("Sign in successful.")
         except Exception as e:
             logger.error(f"Error opening WebSocket connection: {e}")
+            await self._disconnect()
             raise
 
-        return True
-
     async def close(self):
         """
-        Closes the WebSocket connection.
+        Closes the WebSocket connection once the last opener releases it.
         """
-        await self.websocket.close()
+        if self._refs > 1:
+            self._refs -= 1
+            return
+        self._refs = 0
+        await self._disconnect()
         logger.debug("Connection closed.")
 
-    async def call(self, method: str, params: dict = None):
+    async def _disconnect(self) -> None:
+        websocket, self.websocket = self.websocket, None
+        reader, self._reader = self._reader, None
+        if websocket is not None:
+            await websocket.close()
+        if reader is not None:
+            reader.cancel()
+            try:
+                await reader
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._fail_pending(XOSocketError("WebSocket connection closed."))
+
+    async def _read_loop(self, websocket) -> None:
+        """
+        Reads frames for the lifetime of the connection, resolving pending
+        calls by id and fanning out server notifications to subscribers.
+        """
+        try:
+            async for message in websocket:
+                request_id = self._raw_id(message) if self._raw else None
+                if request_id is not None:
+                    self._resolve_raw(request_id, message)
+                    continue
+                data = json.loads(message)
+                if self.recorder is not None and data.get("id") in self._pending:
+                    self._response_sizes[data["id"]] = len(message)
+                self._dispatch(data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"WebSocket reader stopped: {e}")
+        finally:
+            self._fail_pending(XOSocketError("WebSocket connection closed."))
+            for queue in self._subscribers:
+                queue.put_nowait(None)
+
+    def _raw_id(self, message) -> Optional[str]:
+        """The id of the raw call a frame answers, found without decoding it."""
+        if isinstance(message, bytes):
+            message = message.decode()
+        for request_id in self._raw:
+            # Ids are random UUIDs, so they only appear in their own response
+            if f'"{request_id}"' in message:
+                return request_id
+        return None
+
+    def _resolve_raw(self, request_id: str, message) -> None:
+        future = self._pending.pop(request_id, None)
+        if self.recorder is not None:
+            self._response_sizes[request_id] = len(message)
+        if future is not None and not future.done():
+            future.set_result(message)
+
+    def _dispatch(self, data: Dict[str, Any]) -> None:
+        future = self._pending.pop(data.get("id"), None) if "id" in data else None
+        if future is not None:
+            if not future.done():
+                future.set_result(data)
+        elif "method" in data:
+            for queue in self._subscribers:
+                queue.put_nowait(data)
+        else:
+            logger.debug(f"Dropping unexpected message: {data}")
+
+    def _fail_pending(self, error: Exception) -> None:
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Registers a queue receiving server notifications (JSON-RPC messages
+        without an id). None is put on the queue when the connection closes.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    async def notifications(self, method: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields server notifications as they arrive, until the connection is closed.
+
+        :param method: Only yield notifications for this method, e.g. "all"
+                       for the XO object event feed.
+        """
+        queue = self.subscribe()
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    return
+                if method is None or message.get("method") == method:
+                    yield message
+        finally:
+            self.unsubscribe(queue)
+
+    async def call(self, method: str, params: dict = None, raw: bool = False):
         """
         Performs a JSON-RPC call over the WebSocket connection.
 
         :param method: The JSON-RPC method name to call.
         :param params: A dictionary of parameters to pass with the method call.
+        :param raw: Return the response frame undecoded, without checking it
+                    for errors, see call_stream().
         :return: The JSON-RPC response from the server.
         :raises XoError: If the method is not allowed or if other errors occur.
         """
@@ -95,13 +256,19 @@ class XOSocket:
         if params is None:
             params = {}
 
-        message = json.dumps(
-            {"jsonrpc": "2.0", "method": method, "params": params, "id": str(uuid4())}
-        )
-        await self.websocket.send(message)
-        response = await self.websocket.recv()
-        response_data = json.loads(response)
+        if self.websocket is None:
+            raise XOSocketError("WebSocket connection is not open.")
+        if self.on_call is not None:
+            self.on_call(method)
 
+        if self.governor is not None:
+            async with self.governor.for_call(method):
+                response_data = await self._adapt(method, params, raw)
+        else:
+            response_data = await self._adapt(method, params, raw)
+
+        if raw:
+            return response_data
         if "error" in response_data:
             error_msg = response_data["error"].get("message", "Unknown error")
             # Raise a generic XoSocketError with the server's error message
@@ -109,6 +276,73 @@ class XOSocket:
 
         return response_data
 
+    async def call_stream(self, method: str, params: dict = None) -> AsyncIterator[Any]:
+        """
+        Performs a JSON-RPC call and yields the elements of its array result,
+        or the values of its object result (e.g. the objects of
+        xo.getAllObjects), one at a time.
+
+        The response frame is decoded incrementally, so the whole decoded
+        result is never held in memory next to the frame.
+
+        :raises XOSocketError: If the server returns an error.
+        """
+        parser = ItemParser(path=("result",))
+        parser.feed(await self.call(method, params, raw=True))
+        parser.end()
+        try:
+            for item in parser.items():
+                yield item
+        except ValueError:
+            error = parser.members.get("error")
+            if error is None:
+                raise
+            error_msg = error.get("message", "Unknown error")
+            raise XOSocketError(f"Error from server: {error_msg}") from None
+
+    async def _adapt(self, method: str, params: dict, raw: bool = False) -> Any:
+        # Authentication happens while other calls hold slots, so it bypasses the limiter
+        if self.limiter is None or method in ("session.signIn", "token.create"):
+            return await self._send(method, params, raw)
+        async with self.limiter.track(method):
+            return await self._send(method, params, raw)
+
+    async def _send(self, method: str, params: dict, raw: bool = False) -> Any:
+        """Send one JSON-RPC request and wait for the response with its id."""
+        request_id = str(uuid4())
+        message = json.dumps(
+            {"jsonrpc": "2.0", "method": method, "params": params, "id": request_id}
+        )
+        # Responses are matched by id, so several calls can share the connection
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        if raw:
+            self._raw.add(request_id)
+        started, clock = time.time(), time.monotonic()
+        error = None
+        try:
+            await self.websocket.send(message)
+            response = await future
+            if not raw and "error" in response:
+                error = response["error"].get("message", "Unknown error")
+            return response
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+            self._raw.discard(request_id)
+            if self.recorder is not None:
+                self.recorder.record_rpc(
+                    method,
+                    params,
+                    started,
+                    time.monotonic() - clock,
+                    error=error,
+                    request_bytes=len(message),
+                    response_bytes=self._response_sizes.pop(request_id, 0),
+                )
+
     async def sign_in(self, credentials: dict):
         response = await self.call("session.signIn", credentials)
         if "result" in response and "authenticationToken" in response["result"]:
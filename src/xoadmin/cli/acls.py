@@ -0,0 +1,122 @@
+import click
+
+from xoadmin.api.acl import ACTIONS, ACLManagement
+from xoadmin.cli.utils import get_authenticated_api, release_api, render, render_table
+
+
+@click.group(name="acl")
+def acl_commands():
+    """Manage access control lists."""
+    pass
+
+
+def acl_options(func):
+    """Options shared by grant and revoke."""
+    for decorator in reversed(
+        [
+            click.option(
+                "-s",
+                "--subject",
+                "subjects",
+                multiple=True,
+                required=True,
+                help="User email, group name or id; repeatable.",
+            ),
+            click.option(
+                "-o",
+                "--object",
+                "objects",
+                multiple=True,
+                help="XO object id, e.g. of a VM or pool; repeatable.",
+            ),
+            click.option(
+                "--filter",
+                "filter_",
+                default=None,
+                help="Also select the VMs matching this XO filter expression.",
+            ),
+            click.option(
+                "--action",
+                type=click.Choice(ACTIONS),
+                default="viewer",
+                help="Role given on the objects.",
+            ),
+            click.option(
+                "--concurrency", type=int, default=32, help="ACLs changed at once."
+            ),
+            click.option(
+                "--format",
+                "format_",
+                type=click.Choice(["yaml", "json"], case_sensitive=False),
+                default="yaml",
+                help="Output format.",
+            ),
+        ]
+    ):
+        func = decorator(func)
+    return func
+
+
+async def _change(revoke, subjects, objects, filter_, action, concurrency, format_):
+    api = await get_authenticated_api()
+    acl_management = ACLManagement(api)
+    try:
+        objects = list(objects)
+        if filter_:
+            objects += [
+                vm["id"]
+                async for vm in api.iter_collection(
+                    "vms", fields=["id"], filter=filter_
+                )
+            ]
+        if not objects:
+            raise click.UsageError("Select objects with --object or --filter.")
+        change = acl_management.revoke if revoke else acl_management.grant
+        result = await change(subjects, objects, action, concurrency=concurrency)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        await release_api(api)
+    click.echo(render(result, format_))
+    if result["failed"]:
+        raise click.ClickException(f"{len(result['failed'])} ACL changes failed.")
+
+
+@acl_commands.command(name="list")
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(["table", "yaml", "json"], case_sensitive=False),
+    default="table",
+    help="Output format.",
+)
+async def list_acls(format_):
+    """List every ACL."""
+    api = await get_authenticated_api()
+    try:
+        acls = await ACLManagement(api).list_acls()
+    finally:
+        await release_api(api)
+    if not acls:
+        click.echo("No ACLs found.")
+    elif format_ == "table":
+        click.echo(render_table(acls, ["subject", "object", "action"]))
+    else:
+        click.echo(render(acls, format_))
+
+
+@acl_commands.command(name="grant")
+@acl_options
+async def grant_acls(subjects, objects, filter_, action, concurrency, format_):
+    """
+    Give subjects a role on objects, in one batch. ACLs already present
+    are skipped, so running it again changes nothing.
+    """
+    await _change(False, subjects, objects, filter_, action, concurrency, format_)
+
+
+@acl_commands.command(name="revoke")
+@acl_options
+async def revoke_acls(subjects, objects, filter_, action, concurrency, format_):
+    """Remove a role of subjects on objects, in one batch."""
+    await _change(True, subjects, objects, filter_, action, concurrency, format_)
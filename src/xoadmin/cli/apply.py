@@ -1,7 +1,31 @@
+from typing import Any, Dict, Optional, Tuple
+
 import click
+import yaml
 
-from xoadmin.cli.utils import get_authenticated_manager
+from xoadmin.cli.utils import get_authenticated_manager, release_api
 from xoadmin.configurator.configurator import XOAConfigurator
+from xoadmin.configurator.reconcile import Reconciler
+from xoadmin.configurator.template import load_variables_file
+
+
+def parse_variables(
+    pairs: Tuple[str, ...], vars_file: Optional[str] = None
+) -> Dict[str, Any]:
+    """Template variables from a YAML file, overridden by KEY=VALUE pairs."""
+    variables: Dict[str, Any] = {}
+    if vars_file:
+        try:
+            variables.update(load_variables_file(vars_file))
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--vars-file")
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep or not key:
+            raise click.BadParameter(f"'{pair}' is not KEY=VALUE", param_hint="--var")
+        # Parsed as YAML so that numbers and lists keep their type
+        variables[key] = yaml.safe_load(value) if value else ""
+    return variables
 
 
 @click.command(name="apply")
@@ -10,18 +34,88 @@ from xoadmin.configurator.configurator import XOAConfigurator
     "--file",
     type=click.Path(exists=True),
     required=True,
-    help="Path to the configuration file.",
+    multiple=True,
+    help="Configuration file or directory of files (repeatable).",
 )
 @click.option(
     "-c", "--config-path", default=None, help="Use a specific configuration file."
 )
-async def apply_config(file, config_path):
+@click.option(
+    "--var",
+    "var",
+    multiple=True,
+    metavar="KEY=VALUE",
+    help="Variable for the *.j2 template files (repeatable).",
+)
+@click.option(
+    "--vars-file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="YAML file of variables for the *.j2 template files.",
+)
+@click.option("--concurrency", type=int, default=16, help="Entries applied at once.")
+@click.option(
+    "--watch",
+    is_flag=True,
+    default=False,
+    help="Keep running and apply changes to the files as they are made.",
+)
+@click.option(
+    "--interval",
+    type=float,
+    default=2.0,
+    help="Seconds between checks of the files for changes (with --watch).",
+)
+@click.option(
+    "--drift-interval",
+    type=float,
+    default=300.0,
+    help="Seconds between checks of XO for drift (with --watch).",
+)
+@click.option(
+    "--prune",
+    is_flag=True,
+    default=False,
+    help="Delete users, hosts and ACLs removed from the files (with --watch).",
+)
+async def apply_config(
+    file,
+    config_path,
+    var,
+    vars_file,
+    concurrency,
+    watch,
+    interval,
+    drift_interval,
+    prune,
+):
     """Apply configuration to Xen Orchestra instances."""
+    variables = parse_variables(var, vars_file)
     xoa_manager = await get_authenticated_manager(config_path=config_path)
+    if watch:
+        reconciler = Reconciler(
+            xoa_manager,
+            list(file),
+            prune=prune,
+            concurrency=concurrency,
+            # The file is re-read on changes, under the --var overrides
+            variables=parse_variables(var),
+            vars_file=vars_file,
+        )
+        click.echo(f"Watching {', '.join(file)}, press Ctrl-C to stop.")
+        try:
+            await reconciler.run(interval=interval, drift_interval=drift_interval)
+        finally:
+            await release_api(xoa_manager)
+        return
     configurator = XOAConfigurator(xoa_manager=xoa_manager)
     try:
-        configurator.load(file)
-        await configurator.apply()
+        # Entries are applied while the files are still being parsed
+        await configurator.apply_stream(
+            list(file), concurrency=concurrency, variables=variables
+        )
         click.echo("Configuration applied successfully.")
     except Exception as e:
         click.echo(f"Error during configuration application: {e}", err=True)
+    finally:
+        await release_api(xoa_manager)
@@ -0,0 +1,53 @@
+import click
+
+from xoadmin.api.bench import DEFAULT_ENDPOINT, DEFAULT_RPC_METHOD, SCENARIOS, Benchmark
+from xoadmin.cli.utils import get_authenticated_api, release_api, render, render_table
+
+
+@click.command(name="bench")
+@click.option(
+    "-s",
+    "--scenario",
+    "scenarios",
+    type=click.Choice(list(SCENARIOS)),
+    multiple=True,
+    help="Scenario to run, repeatable (default: all).",
+)
+@click.option(
+    "-c", "--concurrency", type=int, default=4, help="Concurrent workers per scenario."
+)
+@click.option(
+    "-d", "--duration", type=float, default=5.0, help="Seconds to run each scenario."
+)
+@click.option(
+    "--endpoint", default=DEFAULT_ENDPOINT, help="REST endpoint read by 'rest'."
+)
+@click.option(
+    "--rpc-method",
+    default=DEFAULT_RPC_METHOD,
+    help="Read-only JSON-RPC method called by 'rpc'.",
+)
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(["table", "json"], case_sensitive=False),
+    default="table",
+    help="Output format.",
+)
+async def bench(scenarios, concurrency, duration, endpoint, rpc_method, format_):
+    """
+    Measure latency and throughput of XO: TCP/TLS setup, websocket connect
+    and sign-in, token creation, a REST read and a JSON-RPC read.
+    """
+    api = await get_authenticated_api()
+    # Measure the traffic, don't capture it
+    api.set_recorder(None)
+    try:
+        rows = await Benchmark(api, endpoint=endpoint, rpc_method=rpc_method).run(
+            scenarios or SCENARIOS, concurrency=concurrency, duration=duration
+        )
+    finally:
+        await release_api(api)
+    click.echo(
+        render_table(rows) if format_.lower() == "table" else render(rows, "json")
+    )
@@ -2,11 +2,21 @@ import asyncio
 
 import click
 
+from xoadmin.cli.acls import acl_commands
 from xoadmin.cli.apply import apply_config
 from xoadmin.cli.auth import auth_commands
+from xoadmin.cli.bench import bench
+from xoadmin.cli.completion import completion_commands
 from xoadmin.cli.config import config_commands
+from xoadmin.cli.daemon import daemon
+from xoadmin.cli.exporter import exporter
 from xoadmin.cli.hosts import host_commands
+from xoadmin.cli.inventory import inventory_commands
+from xoadmin.cli.replay import replay_capture
+from xoadmin.cli.session import run_coroutine
+from xoadmin.cli.shell import shell
 from xoadmin.cli.storage import storage_commands
+from xoadmin.cli.top import top
 from xoadmin.cli.users import user_commands
 from xoadmin.cli.vms import vm_commands
 
@@ -15,7 +25,7 @@ from xoadmin.cli.vms import vm_commands
 def coro(f):
     def wrapper(*args, **kwargs):
         if asyncio.iscoroutinefunction(f):
-            return asyncio.run(f(*args, **kwargs))
+            return run_coroutine(f(*args, **kwargs))
         else:
             return f(*args, **kwargs)
 
@@ -42,10 +52,19 @@ def cli():
 cli.add_command(apply_config)
 cli.add_command(user_commands)
 cli.add_command(host_commands)
+cli.add_command(acl_commands)
 cli.add_command(vm_commands)
 cli.add_command(storage_commands)
 cli.add_command(config_commands)
 cli.add_command(auth_commands)
+cli.add_command(inventory_commands)
+cli.add_command(daemon)
+cli.add_command(top)
+cli.add_command(replay_capture)
+cli.add_command(bench)
+cli.add_command(completion_commands)
+cli.add_command(shell)
+cli.add_command(exporter)
 
 # Wrap command callbacks
 wrap_commands(cli.commands.values())
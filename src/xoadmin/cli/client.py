@@ -0,0 +1,110 @@
+"""
+Entry point of the xoadmin command. Commands are forwarded to a running
+`xoadmin daemon` when there is one, and run in-process otherwise.
+
+This module only imports the standard library so forwarding and completion
+stay cheap (xoadmin.cli.complete follows the same rule).
+"""
+
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from xoadmin.cli.complete import fast_complete, refresh_in_background
+
+DEFAULT_DAEMON_SOCKET = os.path.join(Path.home(), ".xoadmin/daemon.sock")
+
+# Commands that need the caller's terminal or environment, or manage the daemon
+LOCAL_COMMANDS = {"daemon", "config", "top", "replay", "bench", "shell", "exporter"}
+LOCAL_SUBCOMMANDS = {("vm", "watch"), ("host", "delete"), ("inventory", "diff")}
+# Options turning a command into a long-running one
+LOCAL_OPTIONS = {("apply", "--watch")}
+
+
+def get_daemon_socket_path() -> str:
+    return os.getenv("XOADMIN_DAEMON_SOCKET", DEFAULT_DAEMON_SOCKET)
+
+
+def is_local_command(argv: List[str]) -> bool:
+    words = [arg for arg in argv if not arg.startswith("-")]
+    if not words or "--help" in argv:
+        return True
+    if any((words[0], arg) in LOCAL_OPTIONS for arg in argv):
+        return True
+    return words[0] in LOCAL_COMMANDS or tuple(words[:2]) in LOCAL_SUBCOMMANDS
+
+
+def forward(argv: List[str], socket_path: Optional[str] = None) -> Optional[int]:
+    """
+    Run a command through the daemon, echoing its output.
+
+    :return: The command's exit code, or None if it must run in-process
+             because no daemon is listening, the command is local-only or
+             XOADMIN_CAPTURE asks for its traffic to be captured.
+             Once the command is sent it is never run in-process, and a
+             lost connection gives exit code 1.
+    """
+    if os.getenv("XOADMIN_NO_DAEMON") or not hasattr(socket, "AF_UNIX"):
+        return None
+    # The daemon's sessions would not record the caller's traffic
+    if os.getenv("XOADMIN_CAPTURE"):
+        return None
+    path = socket_path or get_daemon_socket_path()
+    if is_local_command(argv) or not os.path.exists(path):
+        return None
+
+    request = {"argv": argv, "cwd": os.getcwd()}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            # Stale socket file left by a daemon that is no longer running
+            return None
+        # The daemon may have started running the command, so running it
+        # again in-process could apply it twice
+        try:
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as stream:
+                line = stream.readline()
+        except OSError as e:
+            sys.stderr.write(f"Error: lost the connection to the daemon: {e}\n")
+            return 1
+    if not line:
+        sys.stderr.write("Error: the daemon closed the connection without a result.\n")
+        return 1
+
+    response = json.loads(line)
+    sys.stdout.write(response["stdout"])
+    sys.stdout.flush()
+    sys.stderr.write(response["stderr"])
+    return response["exit_code"]
+
+
+def main() -> None:
+    instruction = os.getenv("_XOADMIN_COMPLETE")
+    if instruction:
+        # Resource ids are completed from the cache without loading the CLI
+        output = fast_complete(instruction)
+        if output is not None:
+            sys.stdout.write(output)
+            return
+        from xoadmin.cli.cli import cli
+
+        cli(complete_var="_XOADMIN_COMPLETE")
+        return
+
+    argv = sys.argv[1:]
+    exit_code = forward(argv)
+    if exit_code is None:
+        from xoadmin.cli.cli import cli
+
+        try:
+            cli()
+        except SystemExit as e:
+            exit_code = e.code or 0
+    if exit_code == 0:
+        refresh_in_background(argv)
+    sys.exit(exit_code)
@@ -0,0 +1,214 @@
+"""
+Shell completion of resource ids from a local cache.
+
+This module is imported when answering completion requests, before the rest
+of the CLI, so it must only use the standard library and click.
+"""
+
+import os
+import shlex
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_CACHE_DIR = os.path.join(Path.home(), ".xoadmin/completion")
+# Seconds after which a command triggers a background refresh of the cache
+COMPLETION_TTL = 300
+# Seconds during which a started refresh isn't started again
+REFRESH_GRACE = 120
+
+# Cached kinds, each a file of "id<TAB>name" lines
+RESOURCES = ("vms", "vdis", "srs", "hosts", "users")
+
+# Resource kind of each positional argument of the commands completed from
+# the cache; an Ellipsis repeats the previous kind (nargs=-1)
+COMMAND_ARGUMENTS: Dict[Tuple[str, str], Sequence] = {
+    ("vm", "start"): ("vms",),
+    ("vm", "stop"): ("vms",),
+    ("vm", "delete"): ("vms",),
+    ("vm", "export"): ("vms", ...),
+    ("storage", "create-vdi"): ("srs",),
+    ("storage", "delete-vdi"): ("vdis",),
+    ("storage", "export-vdi"): ("vdis",),
+    ("storage", "import-vdi"): ("vdis",),
+    ("host", "delete"): ("hosts",),
+    ("user", "delete"): ("users",),
+}
+
+# Commands after which no refresh is started
+_NO_REFRESH = {"completion", "config", "daemon", "auth"}
+
+
+def cache_dir() -> str:
+    return os.getenv("XOADMIN_COMPLETION_CACHE", DEFAULT_CACHE_DIR)
+
+
+def write_cache(
+    kind: str, items: Iterable[Tuple[str, str]], directory: Optional[str] = None
+) -> int:
+    """
+    Replace the cached (id, name) pairs of a kind, atomically.
+
+    :return: The number of items written.
+    """
+    directory = directory or cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{kind}.tsv")
+    count = 0
+    with open(f"{path}.tmp", "w") as f:
+        for value, name in items:
+            name = " ".join(str(name or "").split())  # no tabs or newlines
+            f.write(f"{value}\t{name}\n")
+            count += 1
+    os.replace(f"{path}.tmp", path)
+    return count
+
+
+def read_cache(
+    kind: str, incomplete: str = "", directory: Optional[str] = None
+) -> List[Tuple[str, str]]:
+    """The cached (id, name) pairs whose id or name starts with incomplete."""
+    path = os.path.join(directory or cache_dir(), f"{kind}.tsv")
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+    matches = []
+    for line in lines:
+        value, _, name = line.partition("\t")
+        if value.startswith(incomplete) or name.startswith(incomplete):
+            matches.append((value, name))
+    return matches
+
+
+def cache_age(directory: Optional[str] = None) -> float:
+    """Seconds since the cache was last refreshed, infinite if it never was."""
+    try:
+        stamp = os.path.getmtime(os.path.join(directory or cache_dir(), "updated"))
+    except OSError:
+        return float("inf")
+    return time.time() - stamp
+
+
+def mark_updated(directory: Optional[str] = None) -> None:
+    directory = directory or cache_dir()
+    Path(directory, "updated").touch()
+    Path(directory, "refreshing").unlink(missing_ok=True)
+
+
+def refresh_in_background(argv: List[str], directory: Optional[str] = None) -> bool:
+    """
+    Start `xoadmin completion refresh` in a detached process if the cache is
+    older than COMPLETION_TTL and no refresh is already running.
+
+    :param argv: Arguments of the command that just ran successfully.
+    :return: Whether a refresh was started.
+    """
+    words = [arg for arg in argv if not arg.startswith("-")]
+    if not words or words[0] in _NO_REFRESH or "--help" in argv:
+        return False
+    directory = directory or cache_dir()
+    if cache_age(directory) < COMPLETION_TTL:
+        return False
+    marker = os.path.join(directory, "refreshing")
+    try:
+        if time.time() - os.path.getmtime(marker) < REFRESH_GRACE:
+            return False
+    except OSError:
+        pass
+    os.makedirs(directory, exist_ok=True)
+    Path(marker).touch()
+    subprocess.Popen(
+        [sys.executable, "-m", "xoadmin", "completion", "refresh"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    return True
+
+
+def argument_kind(words: List[str]) -> Optional[str]:
+    """
+    The resource kind of the positional argument that follows words, e.g.
+    ["vm", "start"] -> "vms", None when it isn't completed from the cache.
+    """
+    if len(words) < 2 or any(word.startswith("-") for word in words):
+        return None
+    kinds = COMMAND_ARGUMENTS.get((words[0], words[1]))
+    if kinds is None:
+        return None
+    position = len(words) - 2
+    if position < len(kinds) and kinds[position] is not Ellipsis:
+        return kinds[position]
+    if kinds[-1] is Ellipsis:
+        return kinds[-2]
+    return None
+
+
+def format_items(shell: str, items: List[Tuple[str, str]]) -> str:
+    """Format completions like click's completion classes for the shell."""
+    if shell == "zsh":
+        # Colons separate the value from its help, see click's ZshComplete
+        lines = []
+        for value, name in items:
+            if name:
+                lines.append("plain\n" + value.replace(":", r"\:") + f"\n{name}")
+            else:
+                lines.append(f"plain\n{value}\n_")
+        return "\n".join(lines)
+    if shell == "fish":
+        return "\n".join(
+            f"plain,{value}\t{name}" if name else f"plain,{value}"
+            for value, name in items
+        )
+    return "\n".join(f"plain,{value}" for value, _ in items)
+
+
+def fast_complete(instruction: str, environ=os.environ) -> Optional[str]:
+    """
+    Answer a completion request for a cached resource argument without
+    loading the CLI, using click's protocol (COMP_WORDS and COMP_CWORD).
+
+    :param instruction: Value of _XOADMIN_COMPLETE, e.g. "bash_complete".
+    :return: The output for the shell, or None to let click handle it.
+    """
+    shell, _, action = instruction.partition("_")
+    if action != "complete" or shell not in ("bash", "zsh", "fish"):
+        return None
+    try:
+        words = shlex.split(environ["COMP_WORDS"])
+        if shell == "fish":
+            incomplete = environ["COMP_CWORD"]
+            args = words[1:]
+            if incomplete and args and args[-1] == incomplete:
+                args.pop()
+        else:
+            cword = int(environ["COMP_CWORD"])
+            args = words[1:cword]
+            incomplete = words[cword] if cword < len(words) else ""
+    except (KeyError, ValueError):
+        return None
+    if incomplete.startswith("-"):
+        return None
+    kind = argument_kind(args)
+    if kind is None:
+        return None
+    return format_items(shell, read_cache(kind, incomplete))
+
+
+def complete_resource(kind: str):
+    """A click shell_complete callback offering the cached ids of a kind."""
+
+    def complete(ctx, param, incomplete: str):
+        from click.shell_completion import CompletionItem
+
+        return [
+            CompletionItem(value, help=name or None)
+            for value, name in read_cache(kind, incomplete)
+        ]
+
+    return complete
@@ -0,0 +1,67 @@
+import asyncio
+from typing import Dict, List, Tuple
+
+import click
+
+from xoadmin.api.api import XOAPI
+from xoadmin.cli.complete import RESOURCES, cache_dir, mark_updated, write_cache
+from xoadmin.cli.utils import get_authenticated_api, release_api
+
+# REST collection and name field of each cached kind; hosts come from server.getAll
+_COLLECTIONS = {
+    "vms": ("vms", "name_label"),
+    "vdis": ("vdis", "name_label"),
+    "srs": ("srs", "name_label"),
+    "users": ("users", "email"),
+}
+
+
+@click.group(name="completion")
+def completion_commands():
+    """Manage the cache used by shell completion."""
+    pass
+
+
+async def fetch_resources(api: XOAPI) -> Dict[str, List[Tuple[str, str]]]:
+    """The (id, name) pairs of every cached kind, fetched concurrently."""
+
+    async def collection(kind: str) -> List[Tuple[str, str]]:
+        name, field = _COLLECTIONS[kind]
+        return [
+            (item["id"], item.get(field, ""))
+            async for item in api.iter_collection(
+                name, fields=["id", field], stream=True
+            )
+        ]
+
+    async def servers() -> List[Tuple[str, str]]:
+        socket = api.get_socket()
+        await socket.open()
+        try:
+            result = (await socket.call("server.getAll"))["result"]
+        finally:
+            await socket.close()
+        return [
+            (server["id"], server.get("label") or server.get("host", ""))
+            for server in result
+        ]
+
+    kinds = [kind for kind in RESOURCES if kind in _COLLECTIONS]
+    results = await asyncio.gather(servers(), *(collection(kind) for kind in kinds))
+    return dict(zip(["hosts", *kinds], results))
+
+
+@completion_commands.command(name="refresh")
+async def refresh_cache():
+    """Refresh the ids and names offered by shell completion."""
+    api = await get_authenticated_api()
+    try:
+        resources = await fetch_resources(api)
+    finally:
+        await release_api(api)
+    directory = cache_dir()
+    counts = {
+        kind: write_cache(kind, items, directory) for kind, items in resources.items()
+    }
+    mark_updated(directory)
+    click.echo(", ".join(f"{count} {kind}" for kind, count in counts.items()))
@@ -0,0 +1,210 @@
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+import traceback
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import click
+
+from xoadmin.cli.client import get_daemon_socket_path
+from xoadmin.cli.session import SessionPool, set_session_pool
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Standard streams of the command being run. Commands run concurrently, so
+# the process-wide streams are replaced by routers reading this variable,
+# which run_coroutine carries over to the command's coroutines.
+_command_streams: ContextVar[Optional[Dict[str, Any]]] = ContextVar(
+    "command_streams", default=None
+)
+_routers_lock = threading.Lock()
+
+
+class StreamRouter:
+    """
+    Stands in for sys.stdout, sys.stderr or sys.stdin, forwarding to the
+    stream of the command being run, or to the original one outside commands.
+    """
+
+    def __init__(self, name: str, default: Any) -> None:
+        self._name = name
+        self._default = default
+
+    @property
+    def target(self) -> Any:
+        streams = _command_streams.get()
+        return self._default if streams is None else streams[self._name]
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.target, attr)
+
+
+def install_stream_routers() -> None:
+    """Route the standard streams and log output per command; idempotent."""
+    with _routers_lock:
+        for name in ("stdin", "stdout", "stderr"):
+            stream = getattr(sys, name)
+            if not isinstance(stream, StreamRouter):
+                setattr(sys, name, StreamRouter(name, stream))
+        # Log records go to the client too, not only to the daemon's terminal
+        for handler in get_logger().handlers:
+            stream = getattr(handler, "stream", None)
+            if hasattr(handler, "setStream") and not isinstance(stream, StreamRouter):
+                handler.setStream(StreamRouter("stderr", stream))
+
+
+def execute_command(argv: List[str]) -> Dict[str, Any]:
+    """
+    Run one CLI invocation in-process and capture its output.
+
+    Runs in a worker thread, in the working directory set by the caller; the
+    command's coroutines are sent back to the daemon's event loop by
+    run_coroutine, where the warm sessions live.
+    """
+    from xoadmin.cli.cli import cli
+
+    install_stream_routers()
+    stdout, stderr = io.StringIO(), io.StringIO()
+    # No terminal: prompts abort instead of hanging
+    token = _command_streams.set(
+        {"stdin": io.StringIO(), "stdout": stdout, "stderr": stderr}
+    )
+    exit_code = 0
+    try:
+        cli.main(args=argv, prog_name="xoadmin", standalone_mode=True)
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else int(e.code is not None)
+    except Exception:
+        stderr.write(traceback.format_exc())
+        exit_code = 1
+    finally:
+        _command_streams.reset(token)
+    return {
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "exit_code": exit_code,
+    }
+
+
+class DirectoryGate:
+    """
+    Lets commands run concurrently as long as they share a working directory,
+    which is process-wide. A command from another directory waits for the
+    running ones to finish, and holds back later arrivals meanwhile.
+    """
+
+    def __init__(self) -> None:
+        self.home = os.getcwd()
+        self.cwd: Optional[str] = None
+        self.running = 0
+        self.waiting = 0
+        self._changed = asyncio.Condition()
+
+    @asynccontextmanager
+    async def enter(self, cwd: Optional[str]) -> AsyncIterator[None]:
+        cwd = cwd or self.home
+        async with self._changed:
+            if self.running and (cwd != self.cwd or self.waiting):
+                self.waiting += 1
+                try:
+                    await self._changed.wait_for(
+                        lambda: not self.running or cwd == self.cwd
+                    )
+                finally:
+                    self.waiting -= 1
+            if not self.running:
+                os.chdir(cwd)
+                self.cwd = cwd
+            self.running += 1
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self.running -= 1
+                if not self.running:
+                    os.chdir(self.home)
+                    self.cwd = None
+                self._changed.notify_all()
+
+
+class CommandServer:
+    """Serves CLI invocations over a Unix socket with a shared session pool."""
+
+    def __init__(self, path: Optional[str] = None, cache_ttl: float = 0) -> None:
+        # Absolute, since commands change the working directory
+        self.path = os.path.abspath(path or get_daemon_socket_path())
+        self.cache_ttl = cache_ttl
+        self.pool: Optional[SessionPool] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._gate: Optional[DirectoryGate] = None
+
+    async def start(self) -> None:
+        self.pool = SessionPool(asyncio.get_running_loop(), cache_ttl=self.cache_ttl)
+        self._gate = DirectoryGate()
+        set_session_pool(self.pool)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # left over from a previous daemon
+        # Created owner-only, rather than restricted once other users could connect
+        umask = os.umask(0o177)
+        try:
+            self.server = await asyncio.start_unix_server(self._handle, path=self.path)
+        finally:
+            os.umask(umask)
+        logger.info(f"xoadmin daemon listening on {self.path}")
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        set_session_pool(None)
+        if self.pool is not None:
+            await self.pool.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request = json.loads(await reader.readline())
+            # Sessions are multiplexed, so commands only wait for each other
+            # when they need another working directory
+            async with self._gate.enter(request.get("cwd")):
+                response = await asyncio.get_running_loop().run_in_executor(
+                    None, execute_command, request["argv"]
+                )
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+        except Exception as e:
+            logger.error(f"Failed to handle daemon request: {e}")
+        finally:
+            writer.close()
+
+
+@click.command(name="daemon")
+@click.option("--socket", "socket_path", default=None, help="Path of the Unix socket.")
+@click.option(
+    "--cache-ttl",
+    type=float,
+    default=5.0,
+    show_default=True,
+    help="Seconds for which read results are reused between commands (0 disables).",
+)
+async def daemon(socket_path: Optional[str], cache_ttl: float):
+    """Keep XO sessions warm and serve CLI commands over a Unix socket."""
+    server = CommandServer(socket_path, cache_ttl=cache_ttl)
+    await server.serve_forever()
@@ -0,0 +1,34 @@
+import click
+
+from xoadmin.api.exporter import Exporter
+from xoadmin.cli.utils import get_authenticated_api, release_api
+
+
+@click.command(name="exporter")
+@click.option(
+    "--host", default="0.0.0.0", show_default=True, help="Address to listen on."
+)
+@click.option(
+    "--port", type=int, default=9477, show_default=True, help="Port to listen on."
+)
+@click.option(
+    "--users-interval",
+    type=float,
+    default=300.0,
+    show_default=True,
+    help="Seconds between user counts, which XO sends no events for.",
+)
+@click.option(
+    "-c", "--config-path", default=None, help="Use a specific configuration file."
+)
+async def exporter(host, port, users_interval, config_path):
+    """
+    Serve Prometheus metrics on /metrics: VMs per pool and power state, host
+    status, SR usage and users. They are kept current from XO's event feed,
+    so scrapes are answered from memory without querying XO.
+    """
+    api = await get_authenticated_api(config_path)
+    try:
+        await Exporter(api, host=host, port=port, users_interval=users_interval).run()
+    finally:
+        await release_api(api)
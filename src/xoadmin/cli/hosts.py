@@ -1,8 +1,19 @@
+import json
+
 import click
+import yaml
 
 from xoadmin.api.host import HostManagement
-from xoadmin.cli.options import output_format
-from xoadmin.cli.utils import get_authenticated_api, render
+from xoadmin.api.probe import DEFAULT_PROBE_TIMEOUT
+from xoadmin.cli.complete import complete_resource
+from xoadmin.cli.options import filter_option, output_format
+from xoadmin.cli.utils import (
+    describe_concurrency,
+    get_authenticated_api,
+    release_api,
+    render,
+    render_table,
+)
 
 
 @click.group(name="host")
@@ -37,21 +48,149 @@ async def add_host(host, username, password, auto_connect, allow_unauthorized):
     click.echo(f"Added host {host}.")
 
 
+@host_commands.command(name="add-many")
+@click.argument("hosts_file", type=click.File("r"))
+@click.option("--username", default=None, help="Default username for the hosts.")
+@click.option("--password", default=None, help="Default password for the hosts.")
+@click.option(
+    "--allow-unauthorized",
+    is_flag=True,
+    default=False,
+    help="Allow unauthorized certificates unless a host says otherwise.",
+)
+@click.option(
+    "--no-probe", is_flag=True, default=False, help="Skip the reachability probes."
+)
+@click.option(
+    "--probe-timeout",
+    type=float,
+    default=DEFAULT_PROBE_TIMEOUT,
+    help="Seconds allowed per reachability probe.",
+)
+@click.option("--concurrency", type=int, default=16, help="Hosts added at once.")
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(["table", "yaml", "json"], case_sensitive=False),
+    default="table",
+    help="Output format.",
+)
+async def add_many_hosts(
+    hosts_file,
+    username,
+    password,
+    allow_unauthorized,
+    no_probe,
+    probe_timeout,
+    concurrency,
+    format_,
+):
+    """
+    Add the hosts listed in a YAML/JSON file concurrently.
+
+    The file holds a list of hosts, each either an address or a mapping with
+    host, username, password, autoConnect and allowUnauthorized.
+    """
+    hosts = []
+    for entry in yaml.safe_load(hosts_file) or []:
+        spec = {"host": entry} if isinstance(entry, str) else dict(entry)
+        spec.setdefault("username", username)
+        spec.setdefault("password", password)
+        spec.setdefault("allowUnauthorized", allow_unauthorized)
+        if not spec["username"] or spec["password"] is None:
+            raise click.UsageError(
+                f"No credentials for host {spec.get('host')}, "
+                "set them in the file or with --username/--password."
+            )
+        hosts.append(spec)
+
+    api = await get_authenticated_api()
+    host_management = HostManagement(api)
+    try:
+        results = await host_management.add_hosts(
+            hosts,
+            probe=not no_probe,
+            probe_timeout=probe_timeout,
+            concurrency=concurrency,
+        )
+    finally:
+        await release_api(api)
+    concurrency_summary = describe_concurrency(api)
+    if concurrency_summary:
+        click.echo(f"Adaptive concurrency: {concurrency_summary}", err=True)
+    click.echo(render(results, format_))
+    if any(result["status"] in ("unreachable", "failed") for result in results):
+        raise click.ClickException("Some hosts could not be added.")
+
+
 @host_commands.command(name="list")
 @output_format
-async def list_hosts(format_: str):
+@filter_option
+async def list_hosts(format_: str, filter_: str):
     """List all registered hosts."""
     api = await get_authenticated_api()
     host_management = HostManagement(api)
-    hosts = await host_management.list_hosts()
+    hosts = await host_management.list_hosts(filter=filter_)
     if hosts:
         click.echo(render(hosts, format_))  # Example: using 'name' key
     else:
         click.echo("No hosts found.")
 
 
+@host_commands.command(name="health")
+@click.option(
+    "--timeout",
+    type=float,
+    default=DEFAULT_PROBE_TIMEOUT,
+    help="Seconds allowed per host.",
+)
+@click.option("--concurrency", type=int, default=64, help="Hosts checked at once.")
+@filter_option
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(["table", "ndjson", "json"], case_sensitive=False),
+    default="table",
+    help="Output format; ndjson prints each host as soon as it is checked.",
+)
+async def host_health(timeout, concurrency, filter_, format_):
+    """
+    Check every registered host: XO's connection status, XAPI reachability
+    and latency. Exits with an error if any host is unhealthy.
+    """
+    api = await get_authenticated_api()
+    host_management = HostManagement(api)
+    try:
+        if format_ == "ndjson":
+            results = []
+            async for result in host_management.iter_health(
+                timeout=timeout, concurrency=concurrency, filter=filter_
+            ):
+                click.echo(json.dumps(result))
+                results.append(result)
+        else:
+            results = await host_management.check_health(
+                timeout=timeout, concurrency=concurrency, filter=filter_
+            )
+            click.echo(
+                render_table(
+                    results,
+                    ["label", "host", "health", "status", "latency_ms", "error", "id"],
+                )
+                if format_ == "table"
+                else render(results, "json")
+            )
+    finally:
+        await release_api(api)
+    unhealthy = sum(result["health"] != "ok" for result in results)
+    if unhealthy:
+        raise click.ClickException(
+            f"{unhealthy} of {len(results)} hosts are unhealthy."
+        )
+
+
 @host_commands.command(name="delete")
-@click.argument("host_id")
+@click.argument("host_id", shell_complete=complete_resource("hosts"))
 async def delete_host(host_id):
     """Delete a host by ID."""
     confirmation = click.confirm(f"Are you sure you want to delete host {host_id}?")
@@ -0,0 +1,135 @@
+import json
+from typing import Optional
+
+import click
+
+from xoadmin.api.watch import NOISY_FIELDS
+from xoadmin.cli.options import output_format
+from xoadmin.cli.utils import get_authenticated_api, release_api, render
+from xoadmin.inventory.diff import diff_snapshots, format_change, open_snapshot
+from xoadmin.inventory.store import InventoryStore, parse_where
+from xoadmin.inventory.sync import sync_inventory
+
+
+@click.group(name="inventory")
+def inventory_commands():
+    """Local inventory snapshot commands."""
+    pass
+
+
+@inventory_commands.command(name="sync")
+@click.option("--db", default=None, help="Path of the inventory database.")
+@click.option(
+    "-c", "--config-path", default=None, help="Use a specific configuration file."
+)
+async def sync(db: Optional[str], config_path: Optional[str]):
+    """Fetch all XO objects into the local inventory snapshot."""
+    api = await get_authenticated_api(config_path)
+    store = InventoryStore(db)
+    try:
+        stats = await sync_inventory(api, store)
+    finally:
+        store.close()
+        await release_api(api)
+    click.echo(
+        f"Inventory generation {stats['generation']}: {stats['added']} added, "
+        f"{stats['changed']} changed, {stats['removed']} removed, "
+        f"{stats['unchanged']} unchanged."
+    )
+
+
+@inventory_commands.command(name="query")
+@output_format
+@click.option("--db", default=None, help="Path of the inventory database.")
+@click.option(
+    "-t", "--type", "object_type", default=None, help="XO object type, e.g. VM."
+)
+@click.option(
+    "-w",
+    "--where",
+    multiple=True,
+    help="Condition such as power_state=Running or memory.size>=1e9 (repeatable).",
+)
+@click.option("--fields", default=None, help="Comma-separated fields to display.")
+@click.option("--group-by", default=None, help="Field to group results on.")
+@click.option(
+    "--agg",
+    "aggregate",
+    default="count",
+    help="Aggregate for --group-by: count, sum:field, avg:field, min:field, max:field.",
+)
+@click.option(
+    "--since",
+    type=int,
+    default=None,
+    help="Only objects changed after this generation.",
+)
+@click.option("--limit", type=int, default=None, help="Maximum number of rows.")
+def query(format_, db, object_type, where, fields, group_by, aggregate, since, limit):
+    """Query the local inventory snapshot without contacting XO."""
+    store = InventoryStore(db)
+    try:
+        rows = list(
+            store.query(
+                object_type=object_type,
+                where=[parse_where(expression) for expression in where],
+                fields=fields.split(",") if fields else None,
+                group_by=group_by,
+                aggregate=aggregate,
+                since=since,
+                limit=limit,
+            )
+        )
+    finally:
+        store.close()
+    click.echo(render(rows, format_))
+
+
+@inventory_commands.command(name="diff")
+@click.argument("old", type=click.Path(exists=True, dir_okay=False))
+@click.argument("new", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "-t", "--type", "object_type", default=None, help="XO object type, e.g. VM."
+)
+@click.option(
+    "--ignore",
+    multiple=True,
+    help="Field whose changes are not reported, e.g. memory.usage (repeatable).",
+)
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(["text", "ndjson", "json", "yaml"], case_sensitive=False),
+    default="text",
+    help="Output format; text and ndjson are written as changes are found.",
+)
+def diff(old, new, object_type, ignore, format_):
+    """
+    Show the objects added, removed or changed between two snapshots.
+
+    OLD and NEW are inventory databases, e.g. written with
+    `inventory sync --db before.db`, or JSON dumps of objects.
+    """
+    before, after = open_snapshot(old), open_snapshot(new)
+    try:
+        changes = diff_snapshots(
+            before, after, object_type=object_type, ignore=NOISY_FIELDS | set(ignore)
+        )
+        if format_ in ("json", "yaml"):
+            click.echo(render(list(changes), format_))
+            return
+        counts = {"added": 0, "removed": 0, "changed": 0}
+        for change in changes:
+            counts[change["change"]] += 1
+            if format_ == "ndjson":
+                click.echo(json.dumps(change, default=str))
+            else:
+                click.echo(format_change(change))
+        if format_ == "text":
+            click.echo(
+                f"{counts['added']} added, {counts['removed']} removed, "
+                f"{counts['changed']} changed."
+            )
+    finally:
+        before.close()
+        after.close()
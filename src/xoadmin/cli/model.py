@@ -45,6 +45,23 @@ class XOASettings:
         return None
 
 
+class OperationLimit(BaseModel):
+    """Load limits for one operation class; 0 means unlimited."""
+
+    rate: float = 0  # operations per second
+    burst: float = 0  # defaults to one second of rate
+    concurrency: int = 0
+
+
+class Limits(BaseModel):
+    """Load budget on xo-server, per operation class."""
+
+    read: OperationLimit = Field(default_factory=OperationLimit)
+    write: OperationLimit = Field(default_factory=OperationLimit)
+    server_add: OperationLimit = Field(default_factory=OperationLimit)
+    vm_lifecycle: OperationLimit = Field(default_factory=OperationLimit)
+
+
 class XOA(BaseModel):
     host: str
     websocket: Optional[str] = None
@@ -52,6 +69,8 @@ class XOA(BaseModel):
     username: str
     password: SecretStr
     verify_ssl: bool = True
+    limits: Limits = Field(default_factory=Limits)
+    adaptive_concurrency: bool = False
 
     model_config = ConfigDict(extra="allow")
 
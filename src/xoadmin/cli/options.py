@@ -29,3 +29,13 @@ def output_format(func: Callable) -> Callable:
         return render(result, format_)
 
     return wrapper
+
+
+def filter_option(func: Callable) -> Callable:
+    """Decorator adding a --filter option passed to the list APIs."""
+    return click.option(
+        "--filter",
+        "filter_",
+        default=None,
+        help="XO filter expression, e.g. 'tags:prod-db power_state:Running'.",
+    )(func)
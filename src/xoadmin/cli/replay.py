@@ -0,0 +1,65 @@
+import click
+
+from xoadmin.api.capture import load_capture
+from xoadmin.api.replay import replay
+from xoadmin.cli.utils import get_authenticated_api, release_api, render, render_table
+
+
+@click.command(name="replay")
+@click.argument("capture", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--speed",
+    type=float,
+    default=1.0,
+    help="Speed multiplier, e.g. 10 to replay ten times faster than captured.",
+)
+@click.option(
+    "--allow-writes",
+    is_flag=True,
+    default=False,
+    help="Also replay calls that change state; only reads are replayed otherwise.",
+)
+@click.option("--concurrency", type=int, default=256, help="Maximum calls in flight.")
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(["table", "yaml", "json"], case_sensitive=False),
+    default="table",
+    help="Output format.",
+)
+async def replay_capture(capture, speed, allow_writes, concurrency, format_):
+    """
+    Replay traffic captured with XOADMIN_CAPTURE against the configured XO
+    and report latency and errors per operation. Only reads are replayed
+    unless --allow-writes is given, and calls whose credentials were
+    redacted in the capture never are.
+    """
+    records = load_capture(capture)
+    api = await get_authenticated_api()
+    # Don't append the replayed calls to a capture being recorded
+    api.set_recorder(None)
+    try:
+        report = await replay(
+            api,
+            records,
+            speed=speed,
+            allow_writes=allow_writes,
+            concurrency=concurrency,
+        )
+    finally:
+        await release_api(api)
+
+    if format_.lower() != "table":
+        click.echo(render(report, format_))
+        return
+    click.echo(
+        f"{report['calls']} calls replayed at {speed:g}x in {report['duration_s']}s "
+        f"({report['rate']}/s), {report['errors']} errors, "
+        f"{report['skipped']} skipped; issue lag p95 {report['lag_p95_ms']} ms\n"
+    )
+    click.echo(render_table(report["operations"]))
+    if report["errors_by_kind"]:
+        errors = ", ".join(
+            f"{kind}: {count}" for kind, count in report["errors_by_kind"].items()
+        )
+        click.echo(f"\nErrors: {errors}")
@@ -0,0 +1,98 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Hashable, Optional
+
+# Set while commands run inside a long-lived process (the daemon), so they
+# reuse its event loop and authenticated sessions instead of creating their own.
+_active_pool: Optional["SessionPool"] = None
+
+
+class SessionPool:
+    """
+    Keeps authenticated XOAPI/XOAManager instances alive between commands.
+
+    Sessions are keyed by whatever identifies their configuration; each one
+    also holds a reference on its websocket so the connection stays signed in.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, cache_ttl: float = 0) -> None:
+        self.loop = loop
+        self.cache_ttl = cache_ttl
+        self._sessions: Dict[Hashable, Any] = {}
+        self._lock = asyncio.Lock()
+
+    async def get(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the session for key, creating it with factory on first use."""
+        async with self._lock:
+            session = self._sessions.get(key)
+            if session is not None and _api(session).session.is_closed:
+                # A command closed it (e.g. apply); start a fresh one
+                await _api(session).get_socket().close()
+                session = None
+            if session is None:
+                session = await factory()
+                api = _api(session)
+                api.cache_ttl = self.cache_ttl
+                await api.get_socket().open()
+                self._sessions[key] = session
+            return session
+
+    def owns(self, session: Any) -> bool:
+        return any(
+            session is owned or session is _api(owned)
+            for owned in self._sessions.values()
+        )
+
+    def clear_caches(self) -> None:
+        for session in self._sessions.values():
+            _api(session).clear_cache()
+
+    async def close(self) -> None:
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            api = _api(session)
+            await api.get_socket().close()
+            await api.close()
+
+
+def _api(session: Any) -> Any:
+    """The XOAPI behind a session, which is either an XOAPI or an XOAManager."""
+    return getattr(session, "api", session)
+
+
+def get_session_pool() -> Optional[SessionPool]:
+    return _active_pool
+
+
+def set_session_pool(pool: Optional[SessionPool]) -> None:
+    global _active_pool
+    _active_pool = pool
+
+
+def run_coroutine(coroutine: Coroutine) -> Any:
+    """
+    Run a command coroutine to completion from synchronous code.
+
+    Without a session pool this is asyncio.run. With one, the coroutine is
+    handed to the pool's event loop (running in another thread) so it can use
+    the sessions bound to that loop, and is cancelled there if interrupted.
+    The caller's context variables, e.g. the daemon's per-command streams,
+    are carried over to the coroutine.
+    """
+    pool = _active_pool
+    if pool is None:
+        return asyncio.run(coroutine)
+    context = contextvars.copy_context()
+
+    async def in_caller_context() -> Any:
+        for variable, value in context.items():
+            variable.set(value)
+        return await coroutine
+
+    future = asyncio.run_coroutine_threadsafe(in_caller_context(), pool.loop)
+    try:
+        return future.result()
+    except BaseException:
+        # e.g. Ctrl-C in the shell: stop the command on the loop thread too
+        future.cancel()
+        raise
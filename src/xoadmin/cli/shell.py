@@ -0,0 +1,117 @@
+import shlex
+from typing import List, Optional
+
+import click
+
+from xoadmin.api.sync import LoopThread
+from xoadmin.cli.session import SessionPool, set_session_pool
+from xoadmin.cli.utils import get_authenticated_api
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Commands that make no sense inside the shell
+_UNAVAILABLE = {"shell", "daemon"}
+
+SHELL_HELP = """\
+Run any xoadmin command without the `xoadmin` prefix, e.g. `vm list`.
+  refresh   Drop cached read results so the next commands fetch fresh data.
+  help      Show this help, or `--help` for the list of commands.
+  exit      Leave the shell (also quit or Ctrl-D).
+"""
+
+
+def run_line(line: str, pool: SessionPool) -> Optional[int]:
+    """
+    Run one line typed in the shell.
+
+    :return: The command's exit code, or None when the shell should exit.
+    """
+    from xoadmin.cli.cli import cli
+
+    try:
+        argv: List[str] = shlex.split(line)
+    except ValueError as e:
+        click.echo(f"Error: {e}", err=True)
+        return 2
+    if not argv:
+        return 0
+    if argv[0] in ("exit", "quit"):
+        return None
+    if argv[0] == "help":
+        click.echo(SHELL_HELP)
+        return 0
+    if argv[0] == "refresh":
+        pool.loop.call_soon_threadsafe(pool.clear_caches)
+        click.echo("Cached results dropped.")
+        return 0
+    if argv[0] in _UNAVAILABLE:
+        click.echo(f"Error: '{argv[0]}' is not available in the shell.", err=True)
+        return 2
+    try:
+        result = cli.main(args=argv, prog_name="xoadmin", standalone_mode=False)
+    except click.ClickException as e:
+        e.show()
+        return e.exit_code
+    except click.Abort:
+        click.echo("Aborted!", err=True)
+        return 1
+    except KeyboardInterrupt:
+        click.echo("Interrupted.", err=True)
+        return 130
+    except Exception as e:
+        # Keep the session alive whatever a command raises
+        logger.error(f"{type(e).__name__}: {e}")
+        return 1
+    return result if isinstance(result, int) else 0
+
+
+@click.command(name="shell")
+@click.option(
+    "--cache-ttl",
+    type=float,
+    default=60.0,
+    show_default=True,
+    help="Seconds for which read results are reused between commands (0 disables).",
+)
+def shell(cache_ttl: float):
+    """
+    Run commands interactively over one authenticated session.
+
+    The session, its connection pool and its websocket are kept open between
+    commands, and read results are cached until they expire, a command
+    changes something or `refresh` is typed.
+    """
+    try:
+        import readline  # noqa: F401 - line editing and history for input()
+    except ImportError:
+        pass
+
+    runner = LoopThread(name="xoadmin-shell")
+
+    async def create_pool() -> SessionPool:
+        return SessionPool(runner.loop, cache_ttl=cache_ttl)
+
+    pool = runner.run(create_pool())
+    set_session_pool(pool)
+    try:
+        # Authenticate up front so the first command is as fast as the others
+        runner.run(get_authenticated_api())
+        click.echo("Connected. Type `help` for help, `exit` to leave.")
+        while True:
+            try:
+                line = input("xoadmin> ")
+            except EOFError:
+                click.echo()
+                break
+            except KeyboardInterrupt:
+                click.echo()
+                continue
+            if run_line(line, pool) is None:
+                break
+    finally:
+        set_session_pool(None)
+        try:
+            runner.run(pool.close())
+        finally:
+            runner.stop()
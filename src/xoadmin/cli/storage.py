@@ -1,8 +1,21 @@
+import time
+from typing import Optional
+
 import click
 
-from xoadmin.api.storage import StorageManagement
-from xoadmin.cli.options import output_format
-from xoadmin.cli.utils import get_authenticated_api, render
+from xoadmin.api.capacity import CapacityManagement, forecast
+from xoadmin.api.storage import VDI_FORMATS, StorageManagement
+from xoadmin.api.transfer import TransferProgress
+from xoadmin.cli.complete import complete_resource
+from xoadmin.cli.options import filter_option, output_format
+from xoadmin.cli.utils import (
+    get_authenticated_api,
+    human_bytes,
+    release_api,
+    render,
+    render_table,
+)
+from xoadmin.inventory.store import InventoryStore
 
 
 @click.group(name="storage")
@@ -14,11 +27,12 @@ def storage_commands():
 @storage_commands.command(name="list")
 @output_format
 @click.option("--raw", is_flag=True, default=False, help="Display full details of SRs.")
-async def list_srs(format_: str, raw: bool):
+@filter_option
+async def list_srs(format_: str, raw: bool, filter_: str):
     """List all Storage Repositories (SRs)."""
     api = await get_authenticated_api()
     storage_management = StorageManagement(api)
-    srs = await storage_management.list_srs()
+    srs = await storage_management.list_srs(filter=filter_)
 
     if raw:
         click.echo(render(srs, format_))
@@ -37,7 +51,7 @@ async def list_srs(format_: str, raw: bool):
 
 
 @storage_commands.command(name="create-vdi")
-@click.argument("sr_id")
+@click.argument("sr_id", shell_complete=complete_resource("srs"))
 @click.argument("size", type=int)
 @click.argument("name_label")
 async def create_vdi(sr_id, size, name_label):
@@ -49,7 +63,7 @@ async def create_vdi(sr_id, size, name_label):
 
 
 @storage_commands.command(name="delete-vdi")
-@click.argument("vdi_id")
+@click.argument("vdi_id", shell_complete=complete_resource("vdis"))
 async def delete_vdi(vdi_id):
     """Delete a specified VDI."""
     api = await get_authenticated_api()
@@ -58,4 +72,159 @@ async def delete_vdi(vdi_id):
     click.echo(f"VDI {vdi_id} deleted.")
 
 
+def progress_bar(label: str):
+    """A click progress bar driven by TransferProgress callbacks."""
+    bar = click.progressbar(
+        length=1, label=label, show_pos=False, file=click.get_text_stream("stderr")
+    )
+
+    def update(progress: TransferProgress) -> None:
+        if progress.total and bar.length != progress.total:
+            bar.length = progress.total
+            bar.pos = progress.offset
+        bar.update(progress.position - bar.pos)
+
+    return bar, update
+
+
+@storage_commands.command(name="export-vdi")
+@click.argument("vdi_id", shell_complete=complete_resource("vdis"))
+@click.argument("destination", type=click.Path(dir_okay=False))
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(VDI_FORMATS),
+    default="vhd",
+    help="Disk format.",
+)
+@click.option(
+    "--resume", is_flag=True, default=False, help="Continue a partial export."
+)
+async def export_vdi(vdi_id, destination, format_, resume):
+    """Stream a VDI's content to a local file."""
+    api = await get_authenticated_api()
+    storage_management = StorageManagement(api)
+    bar, update = progress_bar(f"Exporting {vdi_id}")
+    with bar:
+        progress = await storage_management.export_vdi(
+            vdi_id, destination, format_, resume, TransferProgress(callback=update)
+        )
+    click.echo(f"VDI {vdi_id} exported to {destination}: {progress}.")
+
+
+@storage_commands.command(name="import-vdi")
+@click.argument("vdi_id", shell_complete=complete_resource("vdis"))
+@click.argument("source", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(VDI_FORMATS),
+    default="vhd",
+    help="Disk format.",
+)
+async def import_vdi(vdi_id, source, format_):
+    """Stream a local disk image into an existing VDI."""
+    api = await get_authenticated_api()
+    storage_management = StorageManagement(api)
+    bar, update = progress_bar(f"Importing {source}")
+    with bar:
+        progress = await storage_management.import_vdi(
+            vdi_id, source, format_, TransferProgress(callback=update)
+        )
+    click.echo(f"{source} imported into VDI {vdi_id}: {progress}.")
+
+
+CAPACITY_BYTES = (
+    "size",
+    "physical_usage",
+    "virtual_allocation",
+    "free",
+    "growth_per_day",
+)
+
+
+@storage_commands.command(name="capacity")
+@click.option(
+    "--by",
+    type=click.Choice(["sr", "pool", "total"]),
+    default="pool",
+    help="Level to report capacity at.",
+)
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(["table", "yaml", "json"], case_sensitive=False),
+    default="table",
+    help="Output format.",
+)
+@filter_option
+@click.option(
+    "--record",
+    is_flag=True,
+    default=False,
+    help="Store this sample in the inventory database for forecasting.",
+)
+@click.option(
+    "--forecast",
+    "with_forecast",
+    is_flag=True,
+    default=False,
+    help="Add growth and days-to-full from recorded samples (SR level).",
+)
+@click.option(
+    "--history", type=int, default=90, help="Days of samples used for forecasting."
+)
+@click.option("--db", default=None, help="Path of the inventory database.")
+async def capacity(
+    by: str,
+    format_: str,
+    filter_: Optional[str],
+    record: bool,
+    with_forecast: bool,
+    history: int,
+    db: Optional[str],
+):
+    """Report SR capacity, allocation and overcommit per SR, pool or in total."""
+    api = await get_authenticated_api()
+    try:
+        report = await CapacityManagement(api).report(filter=filter_)
+    finally:
+        await release_api(api)
+
+    if record or with_forecast:
+        store = InventoryStore(db)
+        try:
+            if record:
+                store.record_capacity(report["objects"])
+            samples = store.capacity_samples(since=time.time() - history * 86400)
+        finally:
+            store.close()
+        if with_forecast:
+            by = "sr"
+            trends = forecast(samples)
+            for row in report["srs"]:
+                row.update(
+                    trends.get(
+                        row["id"], {"growth_per_day": None, "days_to_full": None}
+                    )
+                )
+
+    rows = report[{"sr": "srs", "pool": "pools", "total": "total"}[by]]
+    if format_.lower() == "table":
+        rows = [
+            {
+                key: (
+                    human_bytes(value, "/day" if key == "growth_per_day" else "")
+                    if key in CAPACITY_BYTES and value is not None
+                    else value
+                )
+                for key, value in row.items()
+            }
+            for row in rows
+        ]
+        click.echo(render_table(rows))
+    else:
+        click.echo(render(rows, format_))
+
+
 # Make sure to add the storage_commands group to your main cli group in main.py
@@ -0,0 +1,94 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+import click
+
+from xoadmin.api.stats import METRICS, StatsManagement
+from xoadmin.cli.utils import (
+    get_authenticated_api,
+    human_bytes,
+    release_api,
+    render_table,
+)
+
+
+def format_rows(rows: List[Dict], names: Dict[str, str]) -> List[Dict]:
+    return [
+        {
+            "name": names.get(row["id"], row["id"]),
+            "cpu %": (
+                "-" if row["cpu_mean"] != row["cpu_mean"] else f"{row['cpu_mean']:.1f}"
+            ),
+            "cpu p95": (
+                "-" if row["cpu_p95"] != row["cpu_p95"] else f"{row['cpu_p95']:.1f}"
+            ),
+            "memory": human_bytes(row["memory_mean"]),
+            "disk": human_bytes(row["disk_mean"], "/s"),
+            "network": human_bytes(row["network_mean"], "/s"),
+            "id": row["id"],
+        }
+        for row in rows
+    ]
+
+
+@click.command(name="top")
+@click.option("--hosts", is_flag=True, default=False, help="Show hosts instead of VMs.")
+@click.option(
+    "-s",
+    "--sort",
+    type=click.Choice(METRICS),
+    default="cpu",
+    help="Metric to rank by (mean over the window).",
+)
+@click.option("-n", "--limit", type=int, default=20, help="Number of rows to show.")
+@click.option(
+    "-i", "--interval", type=float, default=5.0, help="Seconds between refreshes."
+)
+@click.option(
+    "--iterations", type=int, default=0, help="Stop after N refreshes (0 = forever)."
+)
+@click.option(
+    "--window", type=int, default=12, help="Samples per object to aggregate over."
+)
+@click.option(
+    "--filter",
+    "filter_",
+    default=None,
+    help="XO filter selecting the objects, e.g. 'tags:prod'.",
+)
+async def top(hosts, sort, limit, interval, iterations, window, filter_):
+    """Show the busiest VMs or hosts, refreshing in place."""
+    api = await get_authenticated_api()
+    stats = StatsManagement(api)
+    collection = "hosts" if hosts else "vms"
+    # Halted VMs have no stats, so only list running ones by default
+    object_filter = filter_ or "power_state:Running"
+    names: Dict[str, str] = {}
+    try:
+        iteration = 0
+        while not iterations or iteration < iterations:
+            started = time.monotonic()
+            # The object list changes slowly; refresh it every 12 rounds
+            if iteration % 12 == 0:
+                names = {
+                    obj["id"]: obj.get("name_label", "")
+                    async for obj in api.iter_collection(
+                        collection, fields=["id", "name_label"], filter=object_filter
+                    )
+                }
+            frame = await stats.collect(collection, names, window=window)
+            ranked = frame.top(sort, n=limit)
+            rows = format_rows(frame.summary(ranked), names)
+            if iterations != 1:
+                click.clear()
+            click.echo(
+                f"{len(frame.ids)} {collection} sampled in "
+                f"{time.monotonic() - started:.1f}s, top {len(rows)} by {sort}\n"
+            )
+            click.echo(render_table(rows))
+            iteration += 1
+            if not iterations or iteration < iterations:
+                await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+    finally:
+        await release_api(api)
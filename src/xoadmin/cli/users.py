@@ -3,7 +3,8 @@ from typing import Optional
 import click
 
 from xoadmin.api.user import UserManagement
-from xoadmin.cli.options import output_format
+from xoadmin.cli.complete import complete_resource
+from xoadmin.cli.options import filter_option, output_format
 from xoadmin.cli.utils import get_authenticated_api, render
 
 
@@ -15,14 +16,17 @@ def user_commands():
 
 @user_commands.command(name="list")
 @output_format
+@filter_option
 @click.option(
     "-c", "--config-path", default=None, help="Use a specific configuration file."
 )
-async def list_users(format_: str, config_path: Optional[str] = None):
+async def list_users(
+    format_: str, filter_: Optional[str] = None, config_path: Optional[str] = None
+):
     """List all users with an option for raw information."""
     api = await get_authenticated_api(config_path)
     user_management = UserManagement(api)
-    user_paths = await user_management.list_users()
+    user_paths = await user_management.list_users(filter=filter_)
 
     users = []
     for path in user_paths:
@@ -47,7 +51,7 @@ async def create_user(email, password, permission, config_path: Optional[str] =
 
 
 @user_commands.command(name="delete")
-@click.argument("email")
+@click.argument("email", shell_complete=complete_resource("users"))
 @click.option(
     "-c", "--config-path", default=None, help="Use a specific configuration file."
 )
@@ -3,28 +3,60 @@ import json
 import os
 from copy import deepcopy
 from pathlib import Path
-from typing import Any, Dict, Type, Union
+from typing import Any, Dict, List, Optional, Type, Union
 
 import yaml
 from pydantic import BaseModel, SecretStr, ValidationError, parse_obj_as
 
 from xoadmin.api.api import XOAPI
+from xoadmin.api.capture import TrafficRecorder
+from xoadmin.api.governor import Governor
 from xoadmin.api.manager import XOAManager
 from xoadmin.cli.model import XOAConfig
+from xoadmin.cli.session import get_session_pool
 
 DEFAULT_CONFIG_PATH = os.path.join(Path.home(), ".xoadmin/config")
 
+# Recorders by capture file, shared by all the sessions of a process
+_recorders: Dict[str, TrafficRecorder] = {}
+
+
+def _session_key(kind: str, config_path: str, username: str, password: str):
+    # Include the config file's mtime so edits made after a session was
+    # created are picked up by the next command
+    path = os.path.abspath(config_path or DEFAULT_CONFIG_PATH)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    return (kind, path, mtime, username, password)
+
 
 async def get_authenticated_api(
     config_path: str = None, username: str = None, password: str = None
 ) -> XOAPI:
     """Get an authenticated XOAPI instance."""
+    pool = get_session_pool()
+    if pool is not None:
+        return await pool.get(
+            _session_key("api", config_path, username, password),
+            lambda: _authenticate_api(config_path, username, password),
+        )
+    return await _authenticate_api(config_path, username, password)
+
+
+async def _authenticate_api(
+    config_path: str = None, username: str = None, password: str = None
+) -> XOAPI:
     config = load_xo_config(config_path)
     api = XOAPI(
         rest_base_url=config.xoa.rest_api,
         ws_url=config.xoa.websocket,
         verify_ssl=config.xoa.verify_ssl,
+        governor=build_governor(config),
+        adaptive=config.xoa.adaptive_concurrency,
     )
+    api.set_recorder(capture_recorder())
     await api.authenticate_with_websocket(
         username if username else config.xoa.username,
         password if password else config.xoa.password.get_secret_value(),
@@ -36,13 +68,28 @@ async def get_authenticated_manager(
     config_path: str = None, username: str = None, password: str = None
 ) -> XOAManager:
     """Get an authenticated XOAPI instance."""
+    pool = get_session_pool()
+    if pool is not None:
+        return await pool.get(
+            _session_key("manager", config_path, username, password),
+            lambda: _authenticate_manager(config_path, username, password),
+        )
+    return await _authenticate_manager(config_path, username, password)
+
+
+async def _authenticate_manager(
+    config_path: str = None, username: str = None, password: str = None
+) -> XOAManager:
     config = load_xo_config(config_path)
     manager = XOAManager(
         host=config.xoa.host,
         rest_base_url=config.xoa.rest_api,
         ws_url=config.xoa.websocket,
         verify_ssl=config.xoa.verify_ssl,
+        governor=build_governor(config),
+        adaptive=config.xoa.adaptive_concurrency,
     )
+    manager.api.set_recorder(capture_recorder())
     await manager.authenticate(
         username if username else config.xoa.username,
         password if password else config.xoa.password.get_secret_value(),
@@ -50,6 +97,48 @@ async def get_authenticated_manager(
     return manager
 
 
+def build_governor(config: XOAConfig) -> Optional[Governor]:
+    """The governor enforcing the config's load limits, None if there are none."""
+    governor = Governor(config.xoa.limits.model_dump())
+    return governor if governor.active else None
+
+
+def capture_recorder() -> Optional[TrafficRecorder]:
+    """
+    The recorder capturing traffic to the file named by XOADMIN_CAPTURE,
+    None when the variable isn't set. Commands run with it set are never
+    forwarded to the daemon, see xoadmin.cli.client.forward().
+    """
+    path = os.getenv("XOADMIN_CAPTURE")
+    if not path:
+        return None
+    recorder = _recorders.get(path)
+    if recorder is None:
+        recorder = _recorders[path] = TrafficRecorder(path)
+    return recorder
+
+
+def describe_concurrency(api: XOAPI) -> Optional[str]:
+    """A summary of the adaptive concurrency limits, None when not adaptive."""
+    limits = api.concurrency_limits()
+    if not limits:
+        return None
+    return ", ".join(
+        f"{name} limit {stats['limit']} ({stats['decreases']} backoffs)"
+        for name, stats in limits.items()
+    )
+
+
+async def release_api(api: Union[XOAPI, XOAManager]) -> None:
+    """
+    Close an API session, or a manager's, unless it belongs to the daemon's
+    session pool.
+    """
+    pool = get_session_pool()
+    if pool is None or not pool.owns(api):
+        await api.close()
+
+
 def load_xo_config(config_path=None) -> XOAConfig:
     """Load XO configuration using Pydantic, handling nested structure."""
     if not config_path:
@@ -105,6 +194,15 @@ def convert_value(value: str, target_type: Union[type, str]):
     return conversion_function(value)
 
 
+def parse_size(value: str) -> int:
+    """Parse a size such as 512K, 100M or 2G (powers of 1024) into bytes."""
+    units = {"K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
 def get_field_type(model: BaseModel, field_name: str):
     """
     Get the Python type of a model field in Pydantic V2.
@@ -137,13 +235,45 @@ def mask_sensitive(data, show_sensitive=False):
 
 
 def render(data: Any, format_: str = "yaml") -> str:
-    """Render data in YAML or JSON format."""
+    """Render data in YAML, JSON or table format."""
     if format_.lower() == "json":
         return json.dumps(data, indent=2)
     elif format_.lower() == "yaml":
         return yaml.dump(data, default_flow_style=False)
+    elif format_.lower() == "table":
+        return render_table(data)
     else:
-        raise ValueError("Invalid format. Choose 'yaml' or 'json'.")
+        raise ValueError("Invalid format. Choose 'yaml', 'json' or 'table'.")
+
+
+def render_table(rows: List[Dict[str, Any]], columns: List[str] = None) -> str:
+    """Render a list of dicts as an aligned text table."""
+    if not rows:
+        return ""
+    if columns is None:
+        # Union of all keys, in order of first appearance
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+    cells = [[str(col).upper() for col in columns]]
+    cells.extend(
+        ["" if row.get(col) is None else str(row.get(col)) for col in columns]
+        for row in rows
+    )
+    widths = [max(len(line[i]) for line in cells) for i in range(len(columns))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip()
+        for line in cells
+    )
+
+
+def human_bytes(value: float, suffix: str = "") -> str:
+    """Format a byte count with a binary unit, e.g. 1.5 GiB."""
+    if value != value:  # NaN
+        return "-"
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(value) < 1024:
+            return f"{value:.1f} {unit}{suffix}"
+        value /= 1024
+    return f"{value:.1f} TiB{suffix}"
 
 
 def update_config(config_model: XOAConfig, key_path: str, value: str) -> BaseModel:
@@ -158,7 +288,10 @@ def update_config(config_model: XOAConfig, key_path: str, value: str) -> BaseMod
     current_model = config_model.xoa
     for key in keys[:-1]:
         # For nested models, this will navigate into the nested models
-        current_model = getattr(current_model, key)
+        nested_model = getattr(current_model, key)
+        # Re-assign it so it is saved even if it still had its default value
+        setattr(current_model, key, nested_model)
+        current_model = nested_model
 
     final_key = keys[-1]
     field_type = get_field_type(current_model, final_key)
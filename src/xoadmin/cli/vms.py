@@ -1,8 +1,21 @@
+import json
+import os
+
 import click
+import yaml
 
+from xoadmin.api.transfer import COMPRESSIONS
 from xoadmin.api.vm import VMManagement
-from xoadmin.cli.options import output_format
-from xoadmin.cli.utils import get_authenticated_api, render
+from xoadmin.api.watch import ObjectWatcher
+from xoadmin.cli.complete import complete_resource
+from xoadmin.cli.options import filter_option, output_format
+from xoadmin.cli.utils import (
+    describe_concurrency,
+    get_authenticated_api,
+    parse_size,
+    release_api,
+    render,
+)
 
 
 @click.group(name="vm")
@@ -13,18 +26,19 @@ def vm_commands():
 
 @vm_commands.command(name="list")
 @output_format
-async def list_vms(format_: str):
+@filter_option
+async def list_vms(format_: str, filter_: str):
     """List all VMs."""
     api = await get_authenticated_api()
     vm_management = VMManagement(api)
-    vms = await vm_management.list_vms()
+    vms = await vm_management.list_vms(filter=filter_)
 
     for vm in vms:
         click.echo(render(vm, format_))
 
 
 @vm_commands.command(name="start")
-@click.argument("vm_id")
+@click.argument("vm_id", shell_complete=complete_resource("vms"))
 async def start_vm(vm_id):
     """Start a VM."""
     api = await get_authenticated_api()
@@ -34,7 +48,7 @@ async def start_vm(vm_id):
 
 
 @vm_commands.command(name="stop")
-@click.argument("vm_id")
+@click.argument("vm_id", shell_complete=complete_resource("vms"))
 async def stop_vm(vm_id):
     """Stop a VM."""
     api = await get_authenticated_api()
@@ -44,7 +58,7 @@ async def stop_vm(vm_id):
 
 
 @vm_commands.command(name="delete")
-@click.argument("vm_id")
+@click.argument("vm_id", shell_complete=complete_resource("vms"))
 async def delete_vm(vm_id):
     """Delete a VM."""
     api = await get_authenticated_api()
@@ -64,3 +78,170 @@ async def create_vm_from_template(template_id, name, description):
     vm_management = VMManagement(api)
     await vm_management.create_vm_from_template(template_id, name, description)
     click.echo(f"VM {name} created from template {template_id}.")
+
+
+@vm_commands.command(name="deploy")
+@click.argument("template")
+@click.option("-n", "--count", type=int, required=True, help="Number of VMs to create.")
+@click.option(
+    "--name-pattern",
+    default="{template}-{index:03}",
+    show_default=True,
+    help="Name of each VM, formatted with {index} and {template}.",
+)
+@click.option("--start-index", type=int, default=1, help="Index of the first VM.")
+@click.option("--description", default="", help="Description of the new VMs.")
+@click.option(
+    "--overrides",
+    "overrides_file",
+    type=click.File("r"),
+    default=None,
+    help='YAML/JSON file mapping VM names (or "*" for all) to creation parameters.',
+)
+@click.option("--concurrency", type=int, default=8, help="Creations running at once.")
+@click.option(
+    "--rate", type=float, default=None, help="Maximum creations started per second."
+)
+@output_format
+async def deploy_vms(
+    template,
+    count,
+    name_pattern,
+    start_index,
+    description,
+    overrides_file,
+    concurrency,
+    rate,
+    format_,
+):
+    """Create many VMs from one template, given by id or name."""
+    overrides = yaml.safe_load(overrides_file) if overrides_file else None
+    api = await get_authenticated_api()
+    vm_management = VMManagement(api)
+    try:
+        results = await vm_management.create_vms_from_template(
+            template,
+            count,
+            name_pattern=name_pattern,
+            description=description,
+            overrides=overrides,
+            start_index=start_index,
+            concurrency=concurrency,
+            rate=rate,
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        await release_api(api)
+    concurrency_summary = describe_concurrency(api)
+    if concurrency_summary:
+        click.echo(f"Adaptive concurrency: {concurrency_summary}", err=True)
+    click.echo(render(results, format_))
+    if any("error" in result for result in results):
+        raise click.ClickException("Some VMs could not be created.")
+
+
+def format_change(change: dict) -> str:
+    """Render a watch event as a single human readable line."""
+    marker = {"add": "+", "remove": "-", "change": "~"}[change["event"]]
+    line = f"{marker} {change['name_label']} ({change['id']})"
+    if change["event"] == "change":
+        fields = ", ".join(
+            f"{key}: {json.dumps(old)} -> {json.dumps(new)}"
+            for key, (old, new) in sorted(change["changes"].items())
+        )
+        return f"{line} {fields}"
+    if change.get("power_state"):
+        line += f" [{change['power_state']}]"
+    return line
+
+
+def update_checksums(path: str, checksums: dict) -> None:
+    """
+    Write checksums, keyed by file name, to a sha256sum-format file, replacing
+    the entries of the same files and keeping the others.
+    """
+    lines = []
+    if os.path.exists(path):
+        with open(path) as f:
+            # Each line is the 64 hex digits, a space, a mode character, the name
+            lines = [line for line in f if line.rstrip("\n")[66:] not in checksums]
+    lines += [f"{digest}  {name}\n" for name, digest in checksums.items()]
+    with open(path, "w") as f:
+        f.writelines(lines)
+
+
+@vm_commands.command(name="watch")
+@click.option("--tag", default=None, help="Only watch VMs with this tag.")
+@click.option("--pool", default=None, help="Only watch VMs in this pool (id or name).")
+@click.option(
+    "--host", default=None, help="Only watch VMs running on this host (id or name)."
+)
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(["human", "ndjson"], case_sensitive=False),
+    default="human",
+    help="Output format.",
+)
+async def watch_vms(tag, pool, host, format_):
+    """Stream VM additions, removals and state changes as they happen."""
+    api = await get_authenticated_api()
+    watcher = ObjectWatcher(api, object_type="VM", tag=tag, pool=pool, host=host)
+    try:
+        async for change in watcher.watch():
+            if format_ == "ndjson":
+                click.echo(json.dumps(change, default=str))
+            else:
+                click.echo(format_change(change))
+    finally:
+        await release_api(api)
+
+
+@vm_commands.command(name="export")
+@click.argument(
+    "vm_ids", nargs=-1, required=True, shell_complete=complete_resource("vms")
+)
+@click.option(
+    "-o",
+    "--output-dir",
+    type=click.Path(file_okay=False),
+    default=".",
+    help="Directory receiving the exports.",
+)
+@click.option(
+    "--compress",
+    type=click.Choice(COMPRESSIONS),
+    default="gzip",
+    help="Compression applied locally while writing.",
+)
+@click.option("--concurrency", type=int, default=4, help="Exports running at once.")
+@click.option(
+    "--bandwidth",
+    default=None,
+    help="Total bandwidth cap across exports, e.g. 200M (bytes per second).",
+)
+@output_format
+async def export_vms(vm_ids, output_dir, compress, concurrency, bandwidth, format_):
+    """Export VMs as XVA files, streaming them straight to disk."""
+    api = await get_authenticated_api()
+    vm_management = VMManagement(api)
+    results = await vm_management.export_vms(
+        list(vm_ids),
+        output_dir,
+        compression=compress,
+        concurrency=concurrency,
+        bandwidth=parse_size(bandwidth) if bandwidth else None,
+    )
+    # Checksums in sha256sum format, so `sha256sum -c SHA256SUMS` verifies them
+    update_checksums(
+        os.path.join(output_dir, "SHA256SUMS"),
+        {
+            os.path.basename(result["path"]): result["sha256"]
+            for result in results
+            if "sha256" in result
+        },
+    )
+    click.echo(render(results, format_))
+    if any("error" in result for result in results):
+        raise click.ClickException("Some exports failed.")
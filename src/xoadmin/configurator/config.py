@@ -27,7 +27,14 @@ class UserConfig(BaseModel):
     permission: Optional[str] = "none"
 
 
+class ACLConfig(BaseModel):
+    subjects: List[str]
+    objects: List[str]
+    action: Optional[str] = "viewer"
+
+
 class ApplyConfig(BaseModel):
     # xoa: XOAInstance
     hypervisors: List[HypervisorConfig]
     users: List[UserConfig]
+    acls: List[ACLConfig] = []
@@ -1,8 +1,13 @@
-from typing import Optional
+import asyncio
+import threading
+from typing import Any, Dict, Optional
 
 from xoadmin.api.manager import XOAManager
 from xoadmin.configurator.config import ApplyConfig
-from xoadmin.configurator.loader import load_config
+from xoadmin.configurator.loader import Paths, iter_config_entries, load_config
+
+# Sentinel marking the end of the parsed entries
+_DONE = object()
 
 
 class XOAConfigurator:
@@ -12,8 +17,8 @@ class XOAConfigurator:
         self.apply_config: ApplyConfig = apply_config
         self.xoa_manager: Optional[XOAManager] = xoa_manager
 
-    def load(self, config_path: str):
-        self.apply_config = load_config(config_path)
+    def load(self, config_path: Paths, variables: Optional[Dict[str, Any]] = None):
+        self.apply_config = load_config(config_path, variables)
 
     async def apply(
         self, apply_config: ApplyConfig = None, xoa_manager: XOAManager = None
@@ -32,14 +37,113 @@ class XOAConfigurator:
                 email=user.username, password=user.password, permission=user.permission
             )
 
-        # Add hypervisors
-        for hypervisor in self.apply_config.hypervisors:
-            await xoa_manager.add_host(
-                host=hypervisor.host,
-                username=hypervisor.username,
-                password=hypervisor.password,
-                autoConnect=hypervisor.autoConnect,
-                allowUnauthorized=hypervisor.allowUnauthorized,
+        # Add hypervisors, probed and added concurrently
+        if self.apply_config.hypervisors:
+            await xoa_manager.add_hosts(
+                [
+                    hypervisor.model_dump()
+                    for hypervisor in self.apply_config.hypervisors
+                ]
+            )
+
+        # Grant ACLs last, once the users they may name exist
+        if self.apply_config.acls:
+            await xoa_manager.grant_acls(
+                [acl.model_dump() for acl in self.apply_config.acls]
             )
 
-        await xoa_manager.close()
+    async def apply_stream(
+        self,
+        config_path: Paths,
+        xoa_manager: XOAManager = None,
+        concurrency: int = 16,
+        buffer: int = 1000,
+        variables: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Apply configuration files while they are being parsed.
+
+        Parsing and validation run on a worker thread feeding a bounded queue,
+        so users are created (up to `concurrency` at a time) as soon as their
+        entries are read, and parsing pauses when the API falls behind.
+        Hypervisors are added together once parsing is complete, then ACLs
+        are granted in one batch.
+
+        :param config_path: A file, a directory or a list of them.
+        :param concurrency: Maximum number of users created at once.
+        :param buffer: Maximum number of parsed entries waiting to be applied.
+        :param variables: Variables for the files that are Jinja templates.
+        """
+        xoa_manager = xoa_manager or self.xoa_manager
+        if not xoa_manager:
+            raise ValueError("No XOAPI instance provided.")
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=buffer)
+        stop = threading.Event()
+
+        def produce() -> None:
+            result = _DONE
+            try:
+                for entry in iter_config_entries(config_path, variables=variables):
+                    if stop.is_set():
+                        return
+                    asyncio.run_coroutine_threadsafe(queue.put(entry), loop).result()
+            except Exception as e:
+                result = e
+            asyncio.run_coroutine_threadsafe(queue.put(result), loop).result()
+
+        producer = loop.run_in_executor(None, produce)
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = set()
+        errors = []
+        hypervisors = []
+        acls = []
+
+        async def create_user(user) -> None:
+            try:
+                await xoa_manager.create_user(
+                    email=user.username,
+                    password=user.password,
+                    permission=user.permission,
+                )
+            except Exception as e:
+                errors.append(e)
+            finally:
+                semaphore.release()
+
+        try:
+            while True:
+                entry = await queue.get()
+                if entry is _DONE:
+                    break
+                if isinstance(entry, Exception):
+                    raise entry
+                if errors:
+                    raise errors[0]
+                section, model = entry
+                if section == "users":
+                    # Waiting here, rather than in the task, bounds the backlog
+                    await semaphore.acquire()
+                    task = asyncio.ensure_future(create_user(model))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                elif section == "hypervisors":
+                    hypervisors.append(model.model_dump())
+                elif section == "acls":
+                    acls.append(model.model_dump())
+            await asyncio.gather(*tasks)
+            if errors:
+                raise errors[0]
+            if hypervisors:
+                await xoa_manager.add_hosts(hypervisors)
+            if acls:
+                await xoa_manager.grant_acls(acls)
+        finally:
+            # Unblock the parser if we stopped early, then wait for it
+            stop.set()
+            while not producer.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.sleep(0.01)
+            for task in tasks:
+                task.cancel()
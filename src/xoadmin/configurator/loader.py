@@ -1,12 +1,197 @@
 # src/xoa_container/configurator/config_loader.py
+import os
+from functools import lru_cache
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+
+import jinja2
 import yaml
+from pydantic import BaseModel, TypeAdapter
+from yaml.composer import Composer
+
+from xoadmin.configurator.config import (
+    ACLConfig,
+    ApplyConfig,
+    HypervisorConfig,
+    UserConfig,
+)
+from xoadmin.configurator.template import TEMPLATE_SUFFIX, render_stream
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+# libyaml is several times faster than the pure-Python loader when available
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+CONFIG_EXTENSIONS = (".yaml", ".yml", ".json")
+# Jinja templates rendering to one of the above, e.g. users.yaml.j2
+TEMPLATE_EXTENSIONS = tuple(ext + TEMPLATE_SUFFIX for ext in CONFIG_EXTENSIONS)
+
+# Model of the entries of each list section of an apply file
+SECTION_MODELS: Dict[str, Type[BaseModel]] = {
+    "users": UserConfig,
+    "hypervisors": HypervisorConfig,
+    "acls": ACLConfig,
+}
+
+Paths = Union[str, Iterable[str]]
+
+
+class StreamingLoader(SafeLoader, Composer):
+    """
+    A safe loader that can compose one node at a time. The C parser doesn't
+    expose node composition, so the pure-Python composer is layered on its
+    events; scanning and parsing still run in libyaml.
+    """
+
+    def __init__(self, stream) -> None:
+        super().__init__(stream)
+        self.anchors = {}
+
+    def next_object(self) -> Any:
+        """Compose and construct the next node of the event stream."""
+        data = self.construct_object(self.compose_node(None, None), deep=True)
+        # Only anchors need to outlive the node; let constructed objects go
+        self.constructed_objects = {}
+        self.recursive_objects = {}
+        return data
+
+
+@lru_cache(maxsize=None)
+def type_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """A TypeAdapter per model, built once and reused for every entry."""
+    return TypeAdapter(model)
+
+
+def config_files(paths: Paths) -> List[str]:
+    """
+    Expand files and directories into the list of apply files, in order.
+    Directories contribute their .yaml, .yml and .json files, and templates
+    of them (.yaml.j2, ...), sorted by name. Templates whose name starts
+    with an underscore are only included by others.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if name.endswith(CONFIG_EXTENSIONS)
+                or (name.endswith(TEMPLATE_EXTENSIONS) and not name.startswith("_"))
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def iter_sections(stream) -> Iterator[Tuple[str, Any]]:
+    """
+    Parse a YAML document with a top-level mapping incrementally, yielding
+    (section, item) for every item of list sections, (section, None) for
+    empty ones and (section, value) for other sections. Only one item is
+    held in memory at a time.
+    """
+    loader = StreamingLoader(stream)
+    try:
+        loader.get_event()  # StreamStart
+        if loader.check_event(yaml.StreamEndEvent):
+            return
+        loader.get_event()  # DocumentStart
+        if loader.check_event(yaml.ScalarEvent) and loader.peek_event().value == "":
+            return  # empty document
+        if not loader.check_event(yaml.MappingStartEvent):
+            raise ValueError("An apply file must contain a mapping of sections.")
+        loader.get_event()
+        while not loader.check_event(yaml.MappingEndEvent):
+            section = loader.next_object()
+            if loader.check_event(yaml.SequenceStartEvent):
+                loader.get_event()
+                if loader.check_event(yaml.SequenceEndEvent):
+                    yield section, None  # an empty list
+                while not loader.check_event(yaml.SequenceEndEvent):
+                    yield section, loader.next_object()
+                loader.get_event()
+            else:
+                yield section, loader.next_object()
+    finally:
+        loader.dispose()
+
+
+def open_config(path: str, variables: Optional[Dict[str, Any]] = None):
+    """Open an apply file for the loader, rendering it if it is a template."""
+    if path.endswith(TEMPLATE_SUFFIX):
+        return render_stream(path, variables)
+    return open(path, "rb")
+
+
+def iter_config_entries(
+    paths: Paths,
+    seen: Optional[Set[str]] = None,
+    variables: Optional[Dict[str, Any]] = None,
+) -> Iterator[Tuple[str, BaseModel]]:
+    """
+    Stream validated entries from one or more apply files or directories.
+
+    :param paths: Files and/or directories of apply files.
+    :param seen: If given, receives the names of the sections found, even empty ones.
+    :param variables: Variables for the files that are Jinja templates (*.j2).
+    :return: (section, model) pairs, e.g. ("users", UserConfig(...)), in
+             file order. Unknown sections are skipped.
+    :raises ValueError: If an entry fails validation or a template fails
+                        to render, naming its file.
+    """
+    for path in config_files(paths):
+        try:
+            yield from _file_entries(path, seen, variables)
+        except jinja2.TemplateError as e:
+            raise ValueError(f"Could not render {path}: {e}")
+
+
+def _file_entries(
+    path: str, seen: Optional[Set[str]], variables: Optional[Dict[str, Any]]
+) -> Iterator[Tuple[str, BaseModel]]:
+    with open_config(path, variables) as f:
+        for section, item in iter_sections(f):
+            if seen is not None:
+                seen.add(section)
+            model = SECTION_MODELS.get(section)
+            if model is None:
+                logger.debug(f"Skipping unknown section '{section}' in {path}")
+                continue
+            if item is None:
+                continue  # an empty section
+            try:
+                yield section, type_adapter(model).validate_python(item)
+            except ValueError as e:
+                raise ValueError(f"Invalid {section} entry in {path}: {e}")
 
-from xoadmin.configurator.config import ApplyConfig
 
+def load_config(
+    config_path: Paths, variables: Optional[Dict[str, Any]] = None
+) -> ApplyConfig:
+    """
+    Load and validate apply files into one ApplyConfig.
 
-def load_config(config_path: str) -> ApplyConfig:
-    with open(config_path, "r") as f:
-        config_data = yaml.safe_load(f)
-    if not config_data:
+    :param config_path: A file, a directory or a list of them; the list
+                        sections of all files are concatenated.
+    :param variables: Variables for the files that are Jinja templates.
+    """
+    sections: Dict[str, List[BaseModel]] = {name: [] for name in SECTION_MODELS}
+    seen: Set[str] = set()
+    for section, entry in iter_config_entries(config_path, seen, variables):
+        sections[section].append(entry)
+    if not seen:
         raise ValueError(f"Empty ApplyConfig {config_path}")
-    return ApplyConfig(**config_data)
+    return ApplyConfig.model_construct(**sections)
@@ -0,0 +1,407 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+from xoadmin.api.manager import XOAManager
+from xoadmin.configurator.config import ACLConfig
+from xoadmin.configurator.loader import Paths, config_files, iter_config_entries
+from xoadmin.configurator.template import (
+    TEMPLATE_SUFFIX,
+    load_variables_file,
+    template_dependencies,
+)
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+# An apply entry is identified by its section and natural key, e.g.
+# ("users", "alice@example.com"), ("hypervisors", "10.0.0.1") or
+# ("acls", ("ops", "<VM id>", "viewer"))
+Key = Tuple[str, Hashable]
+
+_KEY_FIELDS = {"users": "username", "hypervisors": "host"}
+RECONCILED_SECTIONS = ("users", "hypervisors", "acls")
+
+
+def entry_key(section: str, model: BaseModel) -> Key:
+    if section == "acls":
+        return section, (model.subjects[0], model.objects[0], model.action)
+    return section, getattr(model, _KEY_FIELDS[section])
+
+
+def _split(section: str, model: BaseModel) -> Iterator[BaseModel]:
+    """ACL entries are applied one (subject, object, action) at a time."""
+    if section != "acls":
+        yield model
+        return
+    for subject in model.subjects:
+        for obj in model.objects:
+            yield ACLConfig(subjects=[subject], objects=[obj], action=model.action)
+
+
+def entry_hash(model: BaseModel) -> str:
+    """A digest of an entry's content, to tell whether it changed."""
+    data = json.dumps(model.model_dump(), sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def load_desired(
+    paths: Paths, variables: Optional[Dict[str, Any]] = None
+) -> Dict[Key, Tuple[str, BaseModel]]:
+    """The entries of the apply files by key, with their hashes. Later entries win."""
+    return {
+        entry_key(section, part): (entry_hash(part), part)
+        for section, model in iter_config_entries(paths, variables=variables)
+        if section in RECONCILED_SECTIONS
+        for part in _split(section, model)
+    }
+
+
+def watched_files(paths: Paths, extra: Tuple[str, ...] = ()) -> List[str]:
+    """The apply files, the files their templates include, and extra files."""
+    files = []
+    for path in config_files(paths):
+        files.append(path)
+        if path.endswith(TEMPLATE_SUFFIX):
+            try:
+                files.extend(template_dependencies(path))
+            except OSError:
+                pass  # reported when the file is loaded
+    return list(dict.fromkeys(files + list(extra)))
+
+
+def files_signature(paths: Paths, extra: Tuple[str, ...] = ()) -> Tuple:
+    """
+    Names, sizes and modification times of the apply files, of the files
+    their templates include and of extra files; changes on any edit.
+    """
+    signature = []
+    for path in watched_files(paths, extra):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signature.append((path, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+class Reconciler:
+    """
+    Keeps XO converged on a set of apply files.
+
+    Entries are hashed, so after the first pass only added, changed or
+    removed entries are acted on. What XO holds (users by email, servers by
+    host, ACLs) is listed once and then kept up to date from the reconciler's own
+    changes; a drift check re-lists it on a slow interval and re-applies
+    the entries XO no longer matches.
+    """
+
+    def __init__(
+        self,
+        xoa_manager: XOAManager,
+        paths: Paths,
+        prune: bool = False,
+        concurrency: int = 16,
+        variables: Optional[Dict[str, Any]] = None,
+        vars_file: Optional[str] = None,
+    ) -> None:
+        """
+        :param paths: Apply files and/or directories.
+        :param prune: Delete users, servers and ACLs whose entries are removed
+                      from the files; otherwise they are only reported.
+        :param concurrency: Maximum number of entries applied at once.
+        :param variables: Variables for the files that are Jinja templates.
+        :param vars_file: YAML file of variables, overridden by variables. It
+                          is re-read, like the apply files, when it changes.
+        """
+        self.manager = xoa_manager
+        self.paths = paths
+        self.prune = prune
+        self.concurrency = concurrency
+        self.variables = variables
+        self.vars_file = vars_file
+        self.desired: Dict[Key, Tuple[str, BaseModel]] = {}
+        # Hash of every entry last applied successfully
+        self.applied: Dict[Key, str] = {}
+        # Cached XO state: users by email and servers by host
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.servers: Dict[str, Dict[str, Any]] = {}
+        # ACLs as (subject id, object id, action), and the ids of the
+        # subjects named in the ACL entries
+        self.acls: Set[Tuple[str, str, str]] = set()
+        self.subject_ids: Dict[str, str] = {}
+
+    async def refresh_state(self) -> None:
+        """List the users, servers and ACLs XO holds, with only the fields compared."""
+        api = self.manager.api
+        self.users = {
+            user["email"]: user
+            async for user in api.iter_collection(
+                "users", fields=["id", "email", "permission"]
+            )
+        }
+        servers = await self.manager.host_management.list_hosts()
+        self.servers = {server["host"]: server for server in servers["result"]}
+        self.acls = {
+            (acl["subject"], acl["object"], acl["action"])
+            for acl in await self.manager.acl_management.list_acls()
+        }
+
+    async def resolve_subjects(self, keys: List[Key]) -> None:
+        """Look up the ids of the subjects of ACL entries; unknown ones are left out."""
+        subjects = {key[1][0] for key in keys if key[0] == "acls"}
+        if subjects:
+            self.subject_ids = await self.manager.acl_management.resolve_subjects(
+                subjects, strict=False
+            )
+
+    def _acl(self, key: Key) -> Optional[Tuple[str, str, str]]:
+        subject, obj, action = key[1]
+        subject_id = self.subject_ids.get(subject)
+        return None if subject_id is None else (subject_id, obj, action)
+
+    async def check_drift(self) -> List[Key]:
+        """
+        Re-list XO state and forget the entries it no longer matches, so
+        the next reconcile() applies them again.
+
+        :return: The drifted entries.
+        """
+        await self.refresh_state()
+        await self.resolve_subjects(list(self.desired))
+        drifted = []
+        for key, (_, model) in self.desired.items():
+            section, name = key
+            if section == "users":
+                user = self.users.get(name)
+                matches = (
+                    user is not None and user.get("permission") == model.permission
+                )
+            elif section == "acls":
+                matches = self._acl(key) in self.acls
+            else:
+                matches = name in self.servers
+            if not matches and key in self.applied:
+                del self.applied[key]
+                drifted.append(key)
+        if drifted:
+            logger.warning(f"{len(drifted)} entries drifted from XO: {drifted[:10]}")
+        return drifted
+
+    def load(self) -> bool:
+        """
+        Re-read the apply files. Invalid files are reported and the previous
+        entries kept, so a half-written edit changes nothing.
+
+        :return: Whether the files could be loaded.
+        """
+        try:
+            variables = dict(self.variables or {})
+            if self.vars_file:
+                variables = {**load_variables_file(self.vars_file), **variables}
+            self.desired = load_desired(self.paths, variables)
+        except (OSError, ValueError) as e:
+            logger.error(f"Not reconciling, could not load {self.paths}: {e}")
+            return False
+        return True
+
+    def pending(self) -> List[Key]:
+        """Entries added or changed since they were last applied."""
+        return [
+            key
+            for key, (digest, _) in self.desired.items()
+            if self.applied.get(key) != digest
+        ]
+
+    async def reconcile(self) -> Dict[str, int]:
+        """
+        Apply the entries added or changed since the last pass, and handle
+        removed ones.
+
+        :return: Counts of applied, removed and failed entries.
+        """
+        pending = [(key, *self.desired[key]) for key in self.pending()]
+        removed = [key for key in self.applied if key not in self.desired]
+        counts = {"applied": 0, "removed": 0, "failed": 0}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def apply(key: Key, digest: str, model: BaseModel) -> None:
+            async with semaphore:
+                try:
+                    if key[0] == "users":
+                        await self._apply_user(model)
+                    else:
+                        await self._apply_acl(key)
+                except Exception as e:
+                    logger.error(f"Failed to apply {key[0]} entry {key[1]}: {e}")
+                    counts["failed"] += 1
+                    return
+            self.applied[key] = digest
+            counts["applied"] += 1
+
+        async def remove(key: Key) -> None:
+            async with semaphore:
+                try:
+                    if self.prune:
+                        await self._remove(key)
+                    else:
+                        logger.warning(
+                            f"{key[0]} entry {key[1]} was removed from the "
+                            "apply files; not deleting it without --prune"
+                        )
+                except Exception as e:
+                    logger.error(f"Failed to remove {key[0]} {key[1]}: {e}")
+                    counts["failed"] += 1
+                    return
+            del self.applied[key]
+            if self.prune:
+                counts["removed"] += 1
+
+        socket = self.manager.api.get_socket()
+        await socket.open()
+        try:
+            await asyncio.gather(
+                *(apply(*entry) for entry in pending if entry[0][0] == "users"),
+                *(remove(key) for key in removed if key[0] != "acls"),
+            )
+            hypervisors = [entry for entry in pending if entry[0][0] == "hypervisors"]
+            if hypervisors:
+                await self._apply_hypervisors(hypervisors, counts)
+            # ACLs last, so that they may name the users just created
+            acls = [entry for entry in pending if entry[0][0] == "acls"]
+            removed_acls = [key for key in removed if key[0] == "acls"]
+            if acls or removed_acls:
+                await self.resolve_subjects([entry[0] for entry in acls] + removed_acls)
+                await asyncio.gather(
+                    *(apply(*entry) for entry in acls),
+                    *(remove(key) for key in removed_acls),
+                )
+        finally:
+            await socket.close()
+        if any(counts.values()):
+            logger.info(
+                f"Reconciled: {counts['applied']} applied, "
+                f"{counts['removed']} removed, {counts['failed']} failed"
+            )
+        return counts
+
+    async def _apply_user(self, model: BaseModel) -> None:
+        user = self.users.get(model.username)
+        if user is None:
+            user_id = await self.manager.user_management.create_user(
+                model.username, model.password, model.permission
+            )
+            self.users[model.username] = {
+                "id": user_id,
+                "email": model.username,
+                "permission": model.permission,
+            }
+        else:
+            await self.manager.user_management.update_user(
+                user["id"], password=model.password, permission=model.permission
+            )
+            user["permission"] = model.permission
+
+    async def _apply_acl(self, key: Key) -> None:
+        acl = self._acl(key)
+        if acl is None:
+            raise ValueError(f"No user or group matches {key[1][0]}")
+        if acl not in self.acls:
+            await self.manager.acl_management.add(*acl)
+            self.acls.add(acl)
+
+    async def _apply_hypervisors(
+        self, entries: List[Tuple[Key, str, BaseModel]], counts: Dict[str, int]
+    ) -> None:
+        new = [entry for entry in entries if entry[2].host not in self.servers]
+        for key, digest, model in entries:
+            server = self.servers.get(model.host)
+            if server is None:
+                continue
+            try:
+                await self.manager.host_management.update_host(
+                    server["id"],
+                    username=model.username,
+                    password=model.password,
+                    allowUnauthorized=model.allowUnauthorized,
+                )
+            except Exception as e:
+                logger.error(f"Failed to update server {model.host}: {e}")
+                counts["failed"] += 1
+                continue
+            self.applied[key] = digest
+            counts["applied"] += 1
+        if not new:
+            return
+        results = await self.manager.host_management.add_hosts(
+            [model.model_dump() for _, _, model in new]
+        )
+        for (key, digest, model), result in zip(new, results):
+            if result["status"] in ("added", "exists"):
+                self.applied[key] = digest
+                counts["applied"] += 1
+                if result.get("id"):
+                    self.servers[model.host] = {"id": result["id"], "host": model.host}
+            else:
+                logger.error(
+                    f"Failed to add server {model.host}: {result.get('error')}"
+                )
+                counts["failed"] += 1
+
+    async def _remove(self, key: Key) -> None:
+        section, name = key
+        if section == "users":
+            user = self.users.pop(name, None)
+            if user is not None:
+                await self.manager.user_management.delete_user(user["id"])
+        elif section == "acls":
+            acl = self._acl(key)
+            if acl in self.acls:
+                await self.manager.acl_management.remove(*acl)
+                self.acls.discard(acl)
+        else:
+            server = self.servers.pop(name, None)
+            if server is not None:
+                await self.manager.host_management.delete_host(server["id"])
+
+    async def run(
+        self,
+        interval: float = 2.0,
+        drift_interval: float = 300.0,
+        stop: Optional[asyncio.Event] = None,
+    ) -> None:
+        """
+        Reconcile whenever the apply files change, checked every interval
+        seconds, and check for drift every drift_interval seconds, until
+        stop is set.
+        """
+        stop = stop or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        await self.refresh_state()
+        signature = None
+        last_drift = loop.time()
+        while not stop.is_set():
+            current = await loop.run_in_executor(
+                None,
+                files_signature,
+                self.paths,
+                (self.vars_file,) if self.vars_file else (),
+            )
+            if current != signature:
+                signature = current
+                if await loop.run_in_executor(None, self.load):
+                    await self.reconcile()
+            elif loop.time() - last_drift >= drift_interval:
+                last_drift = loop.time()
+                drifted = await self.check_drift()
+                # Also retries the entries that failed to apply
+                if drifted or self.pending():
+                    await self.reconcile()
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
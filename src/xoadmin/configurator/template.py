@@ -0,0 +1,143 @@
+import ipaddress
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import jinja2
+import jinja2.meta
+import yaml
+
+TEMPLATE_SUFFIX = ".j2"
+DEFAULT_TEMPLATE_CACHE = os.path.join(Path.home(), ".xoadmin/templates")
+
+
+def load_variables_file(path: str) -> Dict[str, Any]:
+    """
+    Template variables from a YAML file.
+
+    :raises ValueError: If the file is not YAML or not a mapping.
+    """
+    with open(path) as f:
+        try:
+            loaded = yaml.safe_load(f) or {}
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid variables file {path}: {e}") from None
+    if not isinstance(loaded, dict):
+        raise ValueError(f"{path} must contain a mapping of variables")
+    return loaded
+
+
+def ipv4_range(start: str, count: int) -> List[str]:
+    """count consecutive addresses from start, e.g. ipv4_range("10.0.0.10", 3)."""
+    first = ipaddress.IPv4Address(start)
+    return [str(first + offset) for offset in range(count)]
+
+
+def template_cache_dir() -> str:
+    return os.getenv("XOADMIN_TEMPLATE_CACHE", DEFAULT_TEMPLATE_CACHE)
+
+
+@lru_cache(maxsize=None)
+def template_environment(directory: str, cache_dir: str) -> jinja2.Environment:
+    """
+    The environment rendering the templates of a directory, which is also
+    where includes are looked up. Compiled templates are kept in cache_dir
+    and reused until the source changes.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    environment = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(directory),
+        bytecode_cache=jinja2.FileSystemBytecodeCache(cache_dir),
+        undefined=jinja2.StrictUndefined,
+        keep_trailing_newline=True,
+    )
+    environment.globals["ipv4_range"] = ipv4_range
+    environment.globals["env"] = os.environ
+    return environment
+
+
+def template_dependencies(path: str) -> List[str]:
+    """
+    The files a template includes, imports or extends, recursively. Where
+    a name is only known when rendering, every template of the directory
+    may be used, so all of them are returned.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    environment = template_environment(directory, template_cache_dir())
+    found: List[str] = []
+    queue = [path]
+    while queue:
+        with open(queue.pop()) as f:
+            source = f.read()
+        try:
+            names = jinja2.meta.find_referenced_templates(environment.parse(source))
+        except jinja2.TemplateSyntaxError:
+            continue  # reported when the template is rendered
+        for name in names:
+            if name is None:
+                return sorted(
+                    os.path.join(directory, entry)
+                    for entry in os.listdir(directory)
+                    if entry.endswith(TEMPLATE_SUFFIX)
+                )
+            dependency = os.path.join(directory, name)
+            if dependency not in found and os.path.isfile(dependency):
+                found.append(dependency)
+                queue.append(dependency)
+    return found
+
+
+class RenderedStream:
+    """
+    A read-only file over a template being rendered, for the YAML loader.
+    Text is produced as the loader reads it, so the rendered document is
+    never held in memory as a whole.
+    """
+
+    def __init__(self, chunks: Iterator[str]) -> None:
+        self._chunks = chunks
+        self._buffer = ""
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, ""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def close(self) -> None:
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+
+    def __enter__(self) -> "RenderedStream":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def render_stream(
+    path: str,
+    variables: Optional[Dict[str, Any]] = None,
+    cache_dir: Optional[str] = None,
+) -> RenderedStream:
+    """
+    Render a Jinja template incrementally.
+
+    :param path: The template, e.g. users.yaml.j2; includes are resolved
+                 relative to its directory.
+    :param variables: Variables available to the template, besides the
+                      `env` mapping and the `ipv4_range` function.
+    :param cache_dir: Where compiled templates are cached.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    environment = template_environment(directory, cache_dir or template_cache_dir())
+    template = environment.get_template(name)
+    return RenderedStream(template.generate(**(variables or {})))
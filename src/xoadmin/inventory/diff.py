@@ -0,0 +1,174 @@
+import json
+import os
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Union
+
+from xoadmin.api.jsonstream import ItemParser
+from xoadmin.api.watch import NOISY_FIELDS
+from xoadmin.inventory.store import InventoryStore, content_hash
+
+DUMP_EXTENSIONS = (".json", ".ndjson", ".jsonl")
+
+
+class DumpSnapshot:
+    """
+    The objects of a JSON dump, held in memory by id. A dump is a JSON array
+    of objects, an object of objects keyed by id (as xo.getAllObjects
+    returns) or NDJSON, e.g. the output of `inventory query --format json`.
+    """
+
+    def __init__(self, objects: Iterable[Dict[str, Any]]) -> None:
+        self.objects: Dict[str, Dict[str, Any]] = {obj["id"]: obj for obj in objects}
+
+    @classmethod
+    def load(cls, path: str, chunk_size: int = 1 << 20) -> "DumpSnapshot":
+        return cls(iter_dump(path, chunk_size))
+
+    def select(self, object_type: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        if object_type is None:
+            return self.objects
+        return {
+            obj_id: obj
+            for obj_id, obj in self.objects.items()
+            if obj.get("type") == object_type
+        }
+
+    def hashes(self, object_type: Optional[str] = None) -> Dict[str, str]:
+        return {
+            obj_id: content_hash(obj)
+            for obj_id, obj in self.select(object_type).items()
+        }
+
+    def get_objects(self, ids: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        return (self.objects[obj_id] for obj_id in ids if obj_id in self.objects)
+
+    def close(self) -> None:
+        pass
+
+
+Snapshot = Union[InventoryStore, DumpSnapshot]
+
+
+def iter_dump(path: str, chunk_size: int = 1 << 20) -> Iterator[Dict[str, Any]]:
+    """Stream the objects of a JSON or NDJSON dump without reading it whole."""
+    with open(path) as f:
+        if path.endswith((".ndjson", ".jsonl")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        parser = ItemParser()
+        for chunk in iter(lambda: f.read(chunk_size), ""):
+            parser.feed(chunk)
+            yield from parser.items()
+        parser.end()
+        yield from parser.items()
+
+
+def open_snapshot(path: str) -> Snapshot:
+    """
+    Open an inventory snapshot: a database written by `inventory sync`, or
+    a JSON dump.
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"No inventory snapshot at {path}")
+    if path.endswith(DUMP_EXTENSIONS):
+        return DumpSnapshot.load(path)
+    return InventoryStore(path)
+
+
+def diff_objects(
+    old: Dict[str, Any],
+    new: Dict[str, Any],
+    ignore: Collection[str] = (),
+    prefix: str = "",
+) -> Dict[str, List[Any]]:
+    """
+    The fields that differ between two objects as {dotted.field: [old, new]},
+    descending into nested objects. Lists are compared as a whole.
+    """
+    changes = {}
+    for key in old.keys() | new.keys():
+        field = f"{prefix}{key}"
+        if key in ignore or field in ignore:
+            continue
+        before, after = old.get(key), new.get(key)
+        if before == after:
+            continue
+        if isinstance(before, dict) and isinstance(after, dict):
+            changes.update(diff_objects(before, after, ignore, f"{field}."))
+        else:
+            changes[field] = [before, after]
+    return dict(sorted(changes.items()))
+
+
+def _changed_ids(old: Snapshot, new: Snapshot, object_type: Optional[str]):
+    """Ids only in old, only in new, and in both with a different content."""
+    if isinstance(old, DumpSnapshot) and isinstance(new, DumpSnapshot):
+        # Both in memory: comparing objects is cheaper than hashing them
+        before, after = old.select(object_type), new.select(object_type)
+    else:
+        # Stores keep a content hash per object, so only ids and hashes are
+        # read here and the objects whose hashes differ are loaded afterwards
+        before, after = old.hashes(object_type), new.hashes(object_type)
+    common = before.keys() & after.keys()
+    changed = [obj_id for obj_id in common if before[obj_id] != after[obj_id]]
+    return (
+        sorted(before.keys() - after.keys()),
+        sorted(after.keys() - before.keys()),
+        sorted(changed),
+    )
+
+
+def _summary(change: str, obj: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "change": change,
+        "type": obj.get("type"),
+        "id": obj.get("id"),
+        "name_label": obj.get("name_label") or obj.get("email") or obj.get("host"),
+    }
+
+
+def diff_snapshots(
+    old: Snapshot,
+    new: Snapshot,
+    object_type: Optional[str] = None,
+    ignore: Collection[str] = NOISY_FIELDS,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Compare two inventory snapshots, joining objects on their id.
+
+    Only objects whose content differs are compared field by field, and
+    results are yielded as they are found.
+
+    :param object_type: Restrict to one XO type, e.g. "VM".
+    :param ignore: Fields (top-level names or dotted paths) whose changes
+                   are not reported; objects differing only in them are
+                   skipped.
+    :return: Changes such as {"change": "changed", "type": "VM", "id": ...,
+             "name_label": ..., "fields": {"memory.size": [old, new]}}, for
+             removed, then added, then changed objects, each sorted by id.
+    """
+    removed, added, changed = _changed_ids(old, new, object_type)
+    for obj in old.get_objects(removed):
+        yield _summary("removed", obj)
+    for obj in new.get_objects(added):
+        yield _summary("added", obj)
+    # Both sides are read in the same order, in batches
+    for before, after in zip(old.get_objects(changed), new.get_objects(changed)):
+        fields = diff_objects(before, after, ignore)
+        if fields:
+            yield {**_summary("changed", after), "fields": fields}
+
+
+def format_change(change: Dict[str, Any]) -> str:
+    """One line describing a change, e.g. "~ VM db-1 (1): power_state Running -> Halted"."""
+    sign = {"added": "+", "removed": "-", "changed": "~"}[change["change"]]
+    line = f"{sign} {change['type']} {change['name_label']} ({change['id']})"
+    fields = change.get("fields")
+    if not fields:
+        return line
+    described = ", ".join(
+        f"{field} {json.dumps(before, default=str)} -> {json.dumps(after, default=str)}"
+        for field, (before, after) in fields.items()
+    )
+    return f"{line}: {described}"
@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_INVENTORY_PATH = os.path.join(Path.home(), ".xoadmin/inventory.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    pool TEXT,
+    name_label TEXT,
+    hash TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS objects_type ON objects (type, pool);
+CREATE INDEX IF NOT EXISTS objects_generation ON objects (generation);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS capacity_samples (
+    sr_id TEXT NOT NULL,
+    taken_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    physical_usage INTEGER NOT NULL,
+    usage INTEGER NOT NULL,
+    PRIMARY KEY (sr_id, taken_at)
+);
+"""
+
+# Comparison operators accepted in where clauses, longest first for parsing
+OPERATORS = ["!=", ">=", "<=", "=", ">", "<", "~"]
+AGGREGATES = {"count", "sum", "avg", "min", "max"}
+
+
+def content_hash(obj: Dict[str, Any]) -> str:
+    """Stable hash of an object's content, independent of key order."""
+    encoded = json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+
+def json_path(field: str) -> str:
+    """Convert a dotted field name (e.g. memory.size) to a SQLite JSON path."""
+    return "$" + "".join(f'."{part}"' for part in field.split("."))
+
+
+def parse_where(expression: str) -> Tuple[str, str, Any]:
+    """
+    Parse a 'field<op>value' expression, e.g. power_state=Running or
+    memory.size>=4294967296. Values are decoded as JSON when possible.
+
+    :raises ValueError: If the expression is malformed or its value is a
+                        JSON list or object, which can't be compared.
+    """
+    match = re.match(r"^([^!<>=~]+)(!=|>=|<=|=|>|<|~)(.*)$", expression)
+    if not match:
+        raise ValueError(
+            f"Invalid filter '{expression}', expected field<op>value with op in {OPERATORS}."
+        )
+    field, op, raw = match.groups()
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = raw
+    if isinstance(value, (list, dict)):
+        raise ValueError(
+            f"Invalid filter '{expression}', the value must be a string, number, "
+            "boolean or null."
+        )
+    return field.strip(), op, value
+
+
+class InventoryStore:
+    """
+    A local SQLite snapshot of XO objects.
+
+    Each object is stored as JSON alongside a content hash and the sync
+    generation in which it last changed, so a refresh only rewrites changed
+    rows and readers can ask for everything changed since a given marker.
+    """
+
+    def __init__(self, path: str = None) -> None:
+        self.path = path or DEFAULT_INVENTORY_PATH
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    @property
+    def generation(self) -> int:
+        return int(self.get_meta("generation", "0"))
+
+    def hashes(self, object_type: Optional[str] = None) -> Dict[str, str]:
+        """Return the stored content hash of every object, keyed by id."""
+        if object_type is None:
+            return dict(self.db.execute("SELECT id, hash FROM objects"))
+        return dict(
+            self.db.execute(
+                "SELECT id, hash FROM objects WHERE type = ?", (object_type,)
+            )
+        )
+
+    def get_objects(self, ids: Iterable[str], batch: int = 500) -> Iterator[Dict]:
+        """Yield the objects with the given ids, in that order, skipping unknown ones."""
+        ids = list(ids)
+        for start in range(0, len(ids), batch):
+            chunk = ids[start : start + batch]
+            placeholders = ",".join("?" * len(chunk))
+            rows = dict(
+                self.db.execute(
+                    f"SELECT id, data FROM objects WHERE id IN ({placeholders})",
+                    chunk,
+                )
+            )
+            for obj_id in chunk:
+                if obj_id in rows:
+                    yield json.loads(rows[obj_id])
+
+    def sync(self, objects: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Replace the snapshot with the given objects, writing only the rows
+        whose content changed and deleting objects no longer present.
+
+        :param objects: XO objects, each with at least an 'id' and 'type'.
+        :return: Counts of added, changed, removed and unchanged objects.
+        """
+        known = self.hashes()
+        generation = self.generation + 1
+        seen = set()
+        rows = []
+        stats = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        for obj in objects:
+            obj_id = obj["id"]
+            seen.add(obj_id)
+            digest = content_hash(obj)
+            previous = known.get(obj_id)
+            if previous == digest:
+                stats["unchanged"] += 1
+                continue
+            stats["added" if previous is None else "changed"] += 1
+            rows.append(
+                (
+                    obj_id,
+                    obj.get("type"),
+                    obj.get("$pool"),
+                    obj.get("name_label"),
+                    digest,
+                    generation,
+                    json.dumps(obj, default=str),
+                )
+            )
+        removed = [(obj_id,) for obj_id in known.keys() - seen]
+        stats["removed"] = len(removed)
+
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self.db.executemany("DELETE FROM objects WHERE id = ?", removed)
+            self.db.executemany(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                [("generation", str(generation)), ("synced_at", str(time.time()))],
+            )
+        return stats
+
+    def record_capacity(
+        self, srs: Iterable[Dict[str, Any]], taken_at: Optional[float] = None
+    ) -> int:
+        """
+        Store one capacity sample per SR, for forecasting.
+
+        :param srs: SR objects with size, physical_usage and usage.
+        :param taken_at: Sample timestamp, defaults to now.
+        :return: The number of samples written.
+        """
+        taken_at = time.time() if taken_at is None else taken_at
+        rows = [
+            (
+                sr["id"],
+                taken_at,
+                int(sr.get("size") or 0),
+                int(sr.get("physical_usage") or 0),
+                int(sr.get("usage") or 0),
+            )
+            for sr in srs
+        ]
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO capacity_samples VALUES (?, ?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def capacity_samples(
+        self, since: Optional[float] = None
+    ) -> List[Tuple[str, float, int, int, int]]:
+        """Capacity samples taken after `since`, oldest first."""
+        return self.db.execute(
+            "SELECT sr_id, taken_at, size, physical_usage, usage FROM capacity_samples"
+            " WHERE taken_at >= ? ORDER BY taken_at",
+            (since or 0,),
+        ).fetchall()
+
+    def query(
+        self,
+        object_type: Optional[str] = None,
+        where: Sequence[Tuple[str, str, Any]] = (),
+        fields: Optional[List[str]] = None,
+        group_by: Optional[str] = None,
+        aggregate: str = "count",
+        since: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Run a filter, projection or aggregation against the snapshot.
+
+        :param object_type: Restrict to one XO type, e.g. "VM" or "SR".
+        :param where: (field, op, value) conditions, all of which must match.
+        :param fields: Dotted field names to project; whole objects if omitted.
+        :param group_by: Field to group on; yields one row per group.
+        :param aggregate: count, or sum/avg/min/max followed by :field.
+        :param since: Only objects changed after this sync generation.
+        :param limit: Maximum number of rows to return.
+        """
+        clauses, params = [], []
+        if object_type:
+            clauses.append("type = ?")
+            params.append(object_type)
+        if since is not None:
+            clauses.append("generation > ?")
+            params.append(since)
+        for field, op, value in where:
+            if op not in OPERATORS:
+                raise ValueError(f"Unsupported operator '{op}'.")
+            if op == "~":
+                clauses.append("json_extract(data, ?) GLOB ?")
+            else:
+                clauses.append(f"json_extract(data, ?) {op} ?")
+            params.extend([json_path(field), value])
+        sql_where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        if group_by:
+            func, _, agg_field = aggregate.partition(":")
+            if func not in AGGREGATES or (func != "count" and not agg_field):
+                raise ValueError(f"Invalid aggregate '{aggregate}'.")
+            agg_sql = (
+                "COUNT(*)"
+                if func == "count"
+                else f"{func.upper()}(json_extract(data, ?))"
+            )
+            agg_params = [] if func == "count" else [json_path(agg_field)]
+            sql = (
+                f"SELECT json_extract(data, ?) AS key, {agg_sql} FROM objects"
+                f"{sql_where} GROUP BY key ORDER BY 2 DESC"
+            )
+            params = [json_path(group_by)] + agg_params + params
+        else:
+            sql = f"SELECT data FROM objects{sql_where} ORDER BY type, name_label"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        cursor = self.db.execute(sql, params)
+        for row in cursor:
+            if group_by:
+                yield {group_by: row[0], aggregate: row[1]}
+                continue
+            obj = json.loads(row[0])
+            if fields:
+                yield {field: _get_field(obj, field) for field in fields}
+            else:
+                yield obj
+
+
+def _get_field(obj: Dict[str, Any], field: str) -> Any:
+    for part in field.split("."):
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(part)
+    return obj
@@ -0,0 +1,36 @@
+from typing import Any, Dict, List
+
+from xoadmin.api.api import XOAPI
+from xoadmin.inventory.store import InventoryStore
+from xoadmin.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+async def fetch_inventory(api: XOAPI) -> List[Dict[str, Any]]:
+    """
+    Fetch every XO object, user and registered server over one websocket
+    session. Users and servers are tagged with type "user" and "server".
+    """
+    socket = api.get_socket()
+    await socket.open()
+    try:
+        # Objects are decoded one by one rather than as one huge mapping
+        inventory = [obj async for obj in socket.call_stream("xo.getAllObjects")]
+        users = (await socket.call("user.getAll", {})).get("result") or []
+        servers = (await socket.call("server.getAll", {})).get("result") or []
+    finally:
+        await socket.close()
+
+    inventory.extend({**user, "type": "user"} for user in users)
+    inventory.extend({**server, "type": "server"} for server in servers)
+    return inventory
+
+
+async def sync_inventory(api: XOAPI, store: InventoryStore) -> Dict[str, int]:
+    """Refresh the local snapshot from XO, returning the sync statistics."""
+    inventory = await fetch_inventory(api)
+    stats = store.sync(inventory)
+    stats["generation"] = store.generation
+    logger.debug(f"Inventory synced: {stats}")
+    return stats
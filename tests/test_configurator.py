@@ -0,0 +1,297 @@
+import asyncio
+
+import pytest
+
+from xoadmin.configurator.configurator import XOAConfigurator
+from xoadmin.configurator.loader import iter_config_entries, load_config
+from xoadmin.configurator.reconcile import Reconciler, files_signature, watched_files
+
+
+@pytest.fixture
+def config_dir(tmp_path):
+    (tmp_path / "conf.d").mkdir()
+    (tmp_path / "base.yaml").write_text(
+        "users:\n"
+        "  - &user {username: a@example.com, password: pw}\n"
+        "  - <<: *user\n"
+        "    username: b@example.com\n"
+        "hypervisors: []\n"
+    )
+    (tmp_path / "conf.d" / "10-hosts.yaml").write_text(
+        "hypervisors:\n  - {host: 10.0.0.1, username: root, password: pw}\n"
+    )
+    (tmp_path / "conf.d" / "20-users.json").write_text(
+        '{"users": [{"username": "c@example.com", "password": "pw",'
+        ' "permission": "admin"}]}'
+    )
+    (tmp_path / "conf.d" / "README.txt").write_text("ignored")
+    return tmp_path
+
+
+def test_load_config_merges_files_and_directories(config_dir):
+    config = load_config([str(config_dir / "base.yaml"), str(config_dir / "conf.d")])
+
+    assert [user.username for user in config.users] == [
+        "a@example.com",
+        "b@example.com",
+        "c@example.com",
+    ]
+    assert config.users[1].password == "pw"
+    assert config.users[2].permission == "admin"
+    assert [hypervisor.host for hypervisor in config.hypervisors] == ["10.0.0.1"]
+
+
+def test_load_config_rejects_empty_and_invalid_files(tmp_path):
+    empty = tmp_path / "empty.yaml"
+    empty.write_text("# nothing here\n")
+    with pytest.raises(ValueError, match="Empty ApplyConfig"):
+        load_config(str(empty))
+
+    invalid = tmp_path / "invalid.yaml"
+    invalid.write_text("users:\n  - {username: a}\n")
+    with pytest.raises(ValueError, match="invalid.yaml"):
+        list(iter_config_entries(str(invalid)))
+
+
+def test_load_config_renders_templates(tmp_path, monkeypatch):
+    cache = tmp_path / "cache"
+    monkeypatch.setenv("XOADMIN_TEMPLATE_CACHE", str(cache))
+    (tmp_path / "_credentials.j2").write_text(
+        "username: root\npassword: {{ password }}\n"
+    )
+    (tmp_path / "hosts.yaml.j2").write_text(
+        "hypervisors:\n"
+        '{% for address in ipv4_range("10.0.0.254", count) %}\n'
+        "  - host: {{ address }}\n"
+        "    {% filter indent(4) %}{% include '_credentials.j2' %}{% endfilter %}\n"
+        "{% endfor %}\n"
+    )
+
+    config = load_config(str(tmp_path), {"count": 3, "password": "pw"})
+
+    assert [host.host for host in config.hypervisors] == [
+        "10.0.0.254",
+        "10.0.0.255",
+        "10.0.1.0",
+    ]
+    assert {host.password for host in config.hypervisors} == {"pw"}
+    # Compiled templates are cached on disk
+    assert list(cache.iterdir())
+
+    with pytest.raises(ValueError, match="hosts.yaml.j2"):
+        load_config(str(tmp_path), {"count": 1})  # password is undefined
+
+
+def test_reconciler_watches_includes_and_vars_file(
+    tmp_path, monkeypatch, reconcile_manager
+):
+    monkeypatch.setenv("XOADMIN_TEMPLATE_CACHE", str(tmp_path / "cache"))
+    (tmp_path / "_password.j2").write_text("{{ password }}")
+    (tmp_path / "users.yaml.j2").write_text(
+        "users:\n  - {username: {{ user }}, password: {% include '_password.j2' %}}\n"
+    )
+    vars_file = tmp_path / "vars.yaml"
+    vars_file.write_text("user: a@example.com\npassword: pw\n")
+    reconciler = Reconciler(
+        reconcile_manager,
+        str(tmp_path),
+        variables={"password": "override"},
+        vars_file=str(vars_file),
+    )
+
+    watched = watched_files(str(tmp_path), (str(vars_file),))
+    assert watched == [
+        str(tmp_path / "users.yaml.j2"),
+        str(tmp_path / "_password.j2"),
+        str(vars_file),
+    ]
+    before = files_signature(str(tmp_path), (str(vars_file),))
+    (tmp_path / "_password.j2").write_text("{{ password }}-2")
+    assert files_signature(str(tmp_path), (str(vars_file),)) != before
+
+    assert reconciler.load()
+    [(_, user)] = reconciler.desired.values()
+    assert (user.username, user.password) == ("a@example.com", "override-2")
+    vars_file.write_text("user: b@example.com\n")
+    assert reconciler.load()
+    assert list(reconciler.desired) == [("users", "b@example.com")]
+
+
+@pytest.mark.asyncio
+async def test_apply_stream_creates_users_and_adds_hosts(config_dir, mocker):
+    manager = mocker.AsyncMock()
+
+    await XOAConfigurator(xoa_manager=manager).apply_stream(
+        str(config_dir / "conf.d"), concurrency=2
+    )
+    await XOAConfigurator(xoa_manager=manager).apply_stream(
+        str(config_dir / "base.yaml")
+    )
+
+    created = [call.kwargs["email"] for call in manager.create_user.call_args_list]
+    assert created == ["c@example.com", "a@example.com", "b@example.com"]
+    (hosts,), _ = manager.add_hosts.call_args
+    assert hosts[0]["host"] == "10.0.0.1"
+    assert manager.add_hosts.call_count == 1
+    # The caller owns the manager, e.g. the daemon's pooled one
+    manager.close.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_apply_stream_stops_on_failure(config_dir, mocker):
+    manager = mocker.AsyncMock()
+    manager.create_user.side_effect = RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        await XOAConfigurator(xoa_manager=manager).apply_stream(
+            [str(config_dir / "base.yaml"), str(config_dir / "conf.d")]
+        )
+    manager.add_hosts.assert_not_called()
+    manager.close.assert_not_called()
+
+
+@pytest.fixture
+def reconcile_manager(mocker):
+    manager = mocker.MagicMock()
+    manager.api.get_socket.return_value = mocker.AsyncMock()
+    xo_users = [{"id": "ua", "email": "a@example.com", "permission": "none"}]
+
+    async def iter_collection(collection, fields=None):
+        for user in xo_users:
+            yield user
+
+    manager.api.iter_collection = iter_collection
+    manager.xo_users = xo_users
+    manager.host_management = mocker.AsyncMock()
+    manager.host_management.list_hosts.return_value = {"result": []}
+    manager.host_management.add_hosts.side_effect = lambda hosts: [
+        {"host": host["host"], "status": "added", "id": "s1"} for host in hosts
+    ]
+    manager.user_management = mocker.AsyncMock()
+    manager.user_management.create_user.return_value = "ub"
+    manager.acl_management = mocker.AsyncMock()
+    manager.acl_management.list_acls.return_value = []
+    manager.acl_management.resolve_subjects.side_effect = (
+        lambda subjects, strict=True: {
+            subject: {"ops": "g1", "b@example.com": "ub"}[subject]
+            for subject in subjects
+            if subject in ("ops", "b@example.com")
+        }
+    )
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_reconciler_applies_only_changes(tmp_path, reconcile_manager):
+    manager = reconcile_manager
+    path = tmp_path / "apply.yaml"
+    path.write_text(
+        "users:\n"
+        "  - {username: a@example.com, password: pw, permission: admin}\n"
+        "  - {username: b@example.com, password: pw}\n"
+        "hypervisors:\n  - {host: 10.0.0.1, username: root, password: pw}\n"
+    )
+    reconciler = Reconciler(manager, str(path), prune=True)
+    await reconciler.refresh_state()
+    assert reconciler.load()
+
+    assert await reconciler.reconcile() == {"applied": 3, "removed": 0, "failed": 0}
+    manager.user_management.update_user.assert_awaited_once_with(
+        "ua", password="pw", permission="admin"
+    )
+    manager.user_management.create_user.assert_awaited_once_with(
+        "b@example.com", "pw", "none"
+    )
+    manager.host_management.add_hosts.assert_awaited_once()
+    assert await reconciler.reconcile() == {"applied": 0, "removed": 0, "failed": 0}
+
+    path.write_text(
+        "users:\n  - {username: b@example.com, password: pw, permission: admin}\n"
+        "hypervisors:\n  - {host: 10.0.0.1, username: root, password: pw}\n"
+    )
+    reconciler.load()
+    assert await reconciler.reconcile() == {"applied": 1, "removed": 1, "failed": 0}
+    manager.user_management.delete_user.assert_awaited_once_with("ua")
+    manager.user_management.update_user.assert_awaited_with(
+        "ub", password="pw", permission="admin"
+    )
+
+    # b's permission is changed behind our back, and the server removed
+    manager.xo_users[:] = [{"id": "ub", "email": "b@example.com", "permission": "none"}]
+    drifted = await reconciler.check_drift()
+    assert sorted(drifted) == [("hypervisors", "10.0.0.1"), ("users", "b@example.com")]
+
+    path.write_text("users: [{username: broken}]\n")
+    assert not reconciler.load()
+    assert ("users", "b@example.com") in reconciler.desired
+
+
+@pytest.mark.asyncio
+async def test_reconciler_applies_acls_per_subject_and_object(
+    tmp_path, reconcile_manager
+):
+    manager = reconcile_manager
+    manager.acl_management.list_acls.return_value = [
+        {"subject": "g1", "object": "vm1", "action": "viewer"}
+    ]
+    path = tmp_path / "apply.yaml"
+    path.write_text(
+        "users:\n  - {username: b@example.com, password: pw}\n"
+        "acls:\n  - {subjects: [ops, b@example.com], objects: [vm1, vm2]}\n"
+        "  - {subjects: [nobody], objects: [vm1]}\n"
+    )
+    reconciler = Reconciler(manager, str(path), prune=True)
+    await reconciler.refresh_state()
+    assert reconciler.load()
+
+    # b is created first so that its ACLs resolve; g1 already sees vm1
+    assert await reconciler.reconcile() == {"applied": 5, "removed": 0, "failed": 1}
+    added = sorted(call.args for call in manager.acl_management.add.await_args_list)
+    assert added == [
+        ("g1", "vm2", "viewer"),
+        ("ub", "vm1", "viewer"),
+        ("ub", "vm2", "viewer"),
+    ]
+
+    path.write_text(
+        "users:\n  - {username: b@example.com, password: pw}\n"
+        "acls:\n  - {subjects: [ops], objects: [vm1, vm2]}\n"
+    )
+    reconciler.load()
+    assert await reconciler.reconcile() == {"applied": 0, "removed": 2, "failed": 0}
+    removed = sorted(
+        call.args for call in manager.acl_management.remove.await_args_list
+    )
+    assert removed == [("ub", "vm1", "viewer"), ("ub", "vm2", "viewer")]
+
+    # An ACL removed behind our back is applied again
+    manager.xo_users[:] = [{"id": "ub", "email": "b@example.com", "permission": "none"}]
+    manager.acl_management.list_acls.return_value = [
+        {"subject": "g1", "object": "vm1", "action": "viewer"}
+    ]
+    assert await reconciler.check_drift() == [("acls", ("ops", "vm2", "viewer"))]
+
+
+@pytest.mark.asyncio
+async def test_reconciler_run_picks_up_edits(tmp_path, reconcile_manager):
+    manager = reconcile_manager
+    path = tmp_path / "apply.yaml"
+    path.write_text("users:\n  - {username: b@example.com, password: pw}\n")
+    reconciler = Reconciler(manager, str(tmp_path))
+    stop = asyncio.Event()
+    task = asyncio.ensure_future(reconciler.run(interval=0.01, stop=stop))
+
+    await asyncio.sleep(0.1)
+    path.write_text(
+        "users:\n  - {username: b@example.com, password: changed}\n"
+        "  - {username: c@example.com, password: pw}\n"
+    )
+    await asyncio.sleep(0.1)
+    stop.set()
+    await task
+
+    # b created once then updated, c created, nothing touched twice
+    assert manager.user_management.create_user.await_count == 2
+    manager.user_management.update_user.assert_awaited_once_with(
+        "ub", password="changed", permission="none"
+    )
@@ -0,0 +1,144 @@
+import json
+
+import pytest
+
+from xoadmin.api.capacity import forecast, summarize
+from xoadmin.inventory.diff import diff_snapshots, open_snapshot
+from xoadmin.inventory.store import InventoryStore, parse_where
+
+
+@pytest.fixture
+def store(tmpdir):
+    store = InventoryStore(str(tmpdir.join("inventory.db")))
+    yield store
+    store.close()
+
+
+VMS = [
+    {
+        "id": "1",
+        "type": "VM",
+        "name_label": "db-1",
+        "power_state": "Running",
+        "memory": {"size": 4096},
+        "$pool": "p1",
+    },
+    {
+        "id": "2",
+        "type": "VM",
+        "name_label": "db-2",
+        "power_state": "Halted",
+        "memory": {"size": 2048},
+        "$pool": "p1",
+    },
+    {"id": "3", "type": "SR", "name_label": "local", "$pool": "p1"},
+]
+
+
+def test_sync_only_rewrites_changed_objects(store):
+    assert store.sync(VMS) == {"added": 3, "changed": 0, "removed": 0, "unchanged": 0}
+
+    updated = [{**VMS[0], "power_state": "Halted"}, VMS[1]]
+    assert store.sync(updated) == {
+        "added": 0,
+        "changed": 1,
+        "removed": 1,
+        "unchanged": 1,
+    }
+    assert store.generation == 2
+    changed = list(store.query(since=1, fields=["id"]))
+    assert changed == [{"id": "1"}]
+
+
+def test_query_filters_projects_and_aggregates(store):
+    store.sync(VMS)
+    rows = list(
+        store.query(
+            object_type="VM",
+            where=[parse_where("memory.size>=4000")],
+            fields=["name_label", "memory.size"],
+        )
+    )
+    assert rows == [{"name_label": "db-1", "memory.size": 4096}]
+
+    groups = list(
+        store.query(object_type="VM", group_by="$pool", aggregate="sum:memory.size")
+    )
+    assert groups == [{"$pool": "p1", "sum:memory.size": 6144}]
+
+    assert [r["id"] for r in store.query(where=[parse_where("name_label~db-*")])] == [
+        "1",
+        "2",
+    ]
+
+
+def test_parse_where_rejects_invalid_expression():
+    with pytest.raises(ValueError):
+        parse_where("power_state")
+    with pytest.raises(ValueError, match="must be a string"):
+        parse_where('tags=["prod"]')
+    assert parse_where("tags~[prod") == ("tags", "~", "[prod")
+
+
+def test_capacity_summary_and_forecast(store):
+    pytest.importorskip("numpy")
+    gib = 2**30
+    srs = [
+        {"id": "sr1", "size": 100 * gib, "physical_usage": 50 * gib, "$pool": "p1"},
+        {
+            "id": "sr2",
+            "size": 100 * gib,
+            "physical_usage": 10 * gib,
+            "usage": 300 * gib,
+            "$pool": "p1",
+        },
+        {"id": "sr3", "size": 0, "physical_usage": 0, "$pool": "p2"},
+    ]
+    report = summarize(srs, {"p1": "prod"})
+    assert report["pools"][0]["pool"] == "prod"
+    assert report["pools"][0]["free"] == 140 * gib
+    assert report["pools"][1]["used_percent"] is None
+    assert report["srs"][0]["id"] == "sr1"
+    assert report["total"][0]["overcommit"] == 1.5
+
+    day = 86400
+    for i in range(5):
+        store.record_capacity(
+            [{**srs[0], "physical_usage": (50 + 5 * i) * gib}, srs[1]], taken_at=i * day
+        )
+    trends = forecast(store.capacity_samples(), now=4 * day)
+    assert trends["sr1"]["growth_per_day"] == pytest.approx(5 * gib)
+    assert trends["sr1"]["days_to_full"] == pytest.approx(6.0)
+    assert trends["sr2"]["days_to_full"] is None
+
+
+def test_diff_snapshots_reports_changed_fields(store, tmpdir):
+    store.sync(VMS)
+    after = [
+        {**VMS[0], "memory": {"size": 8192}, "current_operations": {"1": "start"}},
+        {**VMS[1], "current_operations": {"2": "clean_reboot"}},  # volatile only
+        {"id": "4", "type": "VM", "name_label": "web-1"},
+    ]
+    dump = tmpdir.join("after.json")
+    dump.write(json.dumps({obj["id"]: obj for obj in after}))
+    new_store = InventoryStore(str(tmpdir.join("after.db")))
+    new_store.sync(after)
+
+    expected = [
+        {"change": "removed", "type": "SR", "id": "3", "name_label": "local"},
+        {"change": "added", "type": "VM", "id": "4", "name_label": "web-1"},
+        {
+            "change": "changed",
+            "type": "VM",
+            "id": "1",
+            "name_label": "db-1",
+            "fields": {"memory.size": [4096, 8192]},
+        },
+    ]
+    # Store against store (stored hashes) and store against a JSON dump
+    assert list(diff_snapshots(store, new_store)) == expected
+    assert list(diff_snapshots(store, open_snapshot(str(dump)))) == expected
+    assert [c["id"] for c in diff_snapshots(store, new_store, object_type="SR")] == [
+        "3"
+    ]
+    new_store.close()
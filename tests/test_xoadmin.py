@@ -1,10 +1,45 @@
+import asyncio
+import concurrent.futures
+import os
+import subprocess
+import sys
+import threading
+
+import httpx
 import pytest
 import yaml
+from click.shell_completion import ShellComplete
 from click.testing import CliRunner
 
+from xoadmin.api.api import XOAPI
+from xoadmin.api.websocket import XOSocket
 from xoadmin.cli.cli import cli
+from xoadmin.cli.client import forward, is_local_command
+from xoadmin.cli.complete import (
+    COMMAND_ARGUMENTS,
+    COMPLETION_TTL,
+    argument_kind,
+    cache_age,
+    fast_complete,
+    mark_updated,
+    read_cache,
+    refresh_in_background,
+    write_cache,
+)
 from xoadmin.cli.config import config_set  # Import your Click group or command
-from xoadmin.cli.utils import DEFAULT_CONFIG_PATH, convert_value
+from xoadmin.cli.daemon import CommandServer
+from xoadmin.cli.model import XOAConfig
+from xoadmin.cli.session import SessionPool, run_coroutine, set_session_pool
+from xoadmin.cli.utils import (
+    DEFAULT_CONFIG_PATH,
+    build_governor,
+    convert_value,
+    load_xo_config,
+    save_xo_config,
+    update_config,
+)
+from xoadmin.cli.vms import update_checksums
+from xoadmin.inventory.store import InventoryStore
 
 
 @pytest.fixture
@@ -77,3 +112,325 @@ def test_config_set_success(runner, tmpdir):
     assert "Updated configuration 'verify_ssl' with new value." in result.output
 
     # Optionally, load the config file and assert the updated value
+
+
+@pytest.fixture
+def daemon_server(tmp_path):
+    """Run a CommandServer on a background event loop."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server = CommandServer(str(tmp_path / "daemon.sock"))
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result(timeout=5)
+    yield server
+    asyncio.run_coroutine_threadsafe(server.stop(), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+    loop.close()
+
+
+def test_daemon_forwards_commands(daemon_server, tmp_path, capsys):
+    store = InventoryStore(str(tmp_path / "inventory.db"))
+    store.sync([{"id": "1", "type": "VM", "name_label": "db"}])
+    store.close()
+
+    exit_code = forward(
+        ["inventory", "query", "--db", str(tmp_path / "inventory.db"), "--fields", "id"],
+        socket_path=daemon_server.path,
+    )
+
+    assert exit_code == 0
+    assert "id: '1'" in capsys.readouterr().out
+
+
+def daemon_request(path, argv, cwd):
+    import json
+    import socket
+
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps({"argv": argv, "cwd": str(cwd)}).encode() + b"\n")
+        return json.loads(sock.makefile().readline())
+
+
+def test_daemon_runs_commands_concurrently(daemon_server, tmp_path, mocker):
+    import click
+
+    release = threading.Event()
+
+    @click.group()
+    def fake_cli():
+        pass
+
+    @fake_cli.command()
+    def slow():
+        click.echo(f"slow in {os.getcwd()}")
+        assert release.wait(5)
+        click.echo("slow done")
+
+    @fake_cli.command()
+    def fast():
+        async def echo():
+            click.echo(f"fast in {os.getcwd()}")
+
+        # Echoed from the daemon's loop thread, still into this command's output
+        run_coroutine(echo())
+
+    mocker.patch("xoadmin.cli.cli.cli", fake_cli)
+    other = tmp_path / "other"
+    other.mkdir()
+    assert os.stat(daemon_server.path).st_mode & 0o777 == 0o600
+
+    results = {}
+    slow_thread = threading.Thread(
+        target=lambda: results.update(
+            slow=daemon_request(daemon_server.path, ["slow"], tmp_path)
+        )
+    )
+    slow_thread.start()
+    # Same directory: runs while the slow command is still going
+    fast = daemon_request(daemon_server.path, ["fast"], tmp_path)
+    assert fast["stdout"] == f"fast in {tmp_path}\n"
+    # Another directory waits for the slow command to finish
+    other_thread = threading.Thread(
+        target=lambda: results.update(
+            other=daemon_request(daemon_server.path, ["fast"], other)
+        )
+    )
+    other_thread.start()
+    other_thread.join(0.2)
+    assert "other" not in results
+    release.set()
+    slow_thread.join(5)
+    other_thread.join(5)
+
+    assert results["slow"]["stdout"] == f"slow in {tmp_path}\nslow done\n"
+    assert results["other"]["stdout"] == f"fast in {other}\n"
+
+
+def test_forward_falls_back_without_daemon(tmp_path):
+    assert forward(["vm", "list"], socket_path=str(tmp_path / "missing.sock")) is None
+    assert is_local_command(["config", "info"])
+    assert is_local_command(["vm", "watch", "--tag", "prod"])
+
+
+def test_forward_runs_captured_commands_in_process(daemon_server, monkeypatch):
+    monkeypatch.setenv("XOADMIN_CAPTURE", "capture.ndjson")
+    assert forward(["vm", "list"], socket_path=daemon_server.path) is None
+
+
+def test_forward_fails_when_the_daemon_drops_the_command(tmp_path, capsys):
+    import socket
+
+    path = str(tmp_path / "daemon.sock")
+    with socket.socket(socket.AF_UNIX) as server:
+        server.bind(path)
+        # Bound but not listening yet: a stale socket, run in-process
+        assert forward(["vm", "list"], socket_path=path) is None
+
+        server.listen()
+
+        def drop():
+            conn = server.accept()[0]
+            conn.makefile().readline()
+            conn.close()
+
+        dropped = threading.Thread(target=drop)
+        dropped.start()
+        # Sent but unanswered: the command may have run, so it is not retried
+        assert forward(["vm", "list"], socket_path=path) == 1
+        dropped.join(5)
+
+    assert "daemon closed the connection" in capsys.readouterr().err
+
+
+@pytest.mark.asyncio
+async def test_session_pool_reuses_authenticated_api(mocker):
+    mocker.patch.object(XOSocket, "open", return_value=True)
+    mocker.patch.object(XOSocket, "close", return_value=None)
+    pool = SessionPool(asyncio.get_running_loop(), cache_ttl=5)
+    factory = mocker.AsyncMock(side_effect=lambda: XOAPI("http://test"))
+
+    first = await pool.get("key", factory)
+    second = await pool.get("key", factory)
+
+    assert first is second
+    assert factory.await_count == 1
+    assert first.cache_ttl == 5 and pool.owns(first)
+    await pool.close()
+
+
+@pytest.mark.parametrize("pooled", [True, False])
+def test_apply_releases_the_manager(runner, tmp_path, mocker, pooled):
+    (tmp_path / "users.yaml").write_text("users: []\n")
+    manager = mocker.AsyncMock()
+    mocker.patch("xoadmin.cli.apply.get_authenticated_manager", return_value=manager)
+    pool = mocker.MagicMock()
+    pool.owns.return_value = True
+    mocker.patch(
+        "xoadmin.cli.utils.get_session_pool", return_value=pool if pooled else None
+    )
+
+    result = runner.invoke(cli, ["apply", "-f", str(tmp_path / "users.yaml")])
+
+    assert result.exit_code == 0, result.output
+    # A manager from the daemon's pool stays open for the next command
+    assert manager.close.await_count == (0 if pooled else 1)
+
+
+def test_update_checksums_replaces_entries_of_reexported_files(tmp_path):
+    path = str(tmp_path / "SHA256SUMS")
+    update_checksums(path, {"a.xva.gz": "1" * 64, "b.xva.gz": "2" * 64})
+    update_checksums(path, {"b.xva.gz": "3" * 64, "c.xva.gz": "4" * 64})
+
+    with open(path) as f:
+        assert f.read() == (
+            f"{'1' * 64}  a.xva.gz\n{'3' * 64}  b.xva.gz\n{'4' * 64}  c.xva.gz\n"
+        )
+
+
+def test_update_config_sets_nested_limits(tmpdir):
+    config = XOAConfig(
+        xoa={"host": "localhost", "username": "admin", "password": "secret"}
+    )
+    updated = update_config(config, "xoa.limits.write.rate", "20")
+    path = str(tmpdir.join("config"))
+    save_xo_config(updated, path)
+
+    reloaded = load_xo_config(path)
+    assert reloaded.xoa.limits.write.rate == 20.0
+    assert build_governor(reloaded).limits["write"]["rate"] == 20.0
+
+
+def test_build_governor_without_limits():
+    config = XOAConfig(
+        xoa={"host": "localhost", "username": "admin", "password": "secret"}
+    )
+    assert build_governor(config) is None
+
+
+@pytest.fixture
+def completion_cache(tmp_path, monkeypatch):
+    directory = str(tmp_path / "completion")
+    monkeypatch.setenv("XOADMIN_COMPLETION_CACHE", directory)
+    write_cache("vms", [("ab12", "web-1"), ("cd34", "db-1"), ("ab56", "web-2")])
+    write_cache("users", [("u1", "alice@example.com"), ("u2", "bob@example.com")])
+    return directory
+
+
+def test_completion_answers_from_cache_without_loading_the_cli(completion_cache):
+    env = dict(
+        os.environ,
+        _XOADMIN_COMPLETE="bash_complete",
+        COMP_WORDS="xoadmin vm start ab",
+        COMP_CWORD="3",
+    )
+    script = (
+        "import sys\n"
+        "from xoadmin.cli.client import main\n"
+        "main()\n"
+        "print('|' + ','.join(m for m in ('httpx', 'websockets') if m in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True
+    ).stdout
+
+    assert output.splitlines() == ["plain,ab12", "plain,ab56|"]
+
+
+def test_completion_table_matches_click_arguments(completion_cache):
+    completer = ShellComplete(cli, {}, "xoadmin", "_XOADMIN_COMPLETE")
+    for (group, command), kinds in COMMAND_ARGUMENTS.items():
+        assert cli.commands[group].commands[command] is not None
+        args = [group, command]
+        expected = read_cache(argument_kind(args), "")
+        items = completer.get_completions(args, "")
+        assert [(item.value, item.help or "") for item in items] == expected
+
+    # Names match too, so typing an email completes the user's id
+    assert fast_complete(
+        "zsh_complete", {"COMP_WORDS": "xoadmin user delete bo", "COMP_CWORD": "3"}
+    ) == "plain\nu2\nbob@example.com"
+    assert fast_complete(
+        "bash_complete", {"COMP_WORDS": "xoadmin vm ", "COMP_CWORD": "2"}
+    ) is None
+
+
+def test_refresh_in_background_once_per_ttl(completion_cache, mocker):
+    popen = mocker.patch("subprocess.Popen")
+
+    assert refresh_in_background(["vm", "list"])
+    assert not refresh_in_background(["vm", "list"])  # already running
+    assert popen.call_count == 1
+    assert popen.call_args.args[0][-2:] == ["completion", "refresh"]
+
+    mark_updated()
+    assert cache_age() < COMPLETION_TTL
+    assert not refresh_in_background(["vm", "list"])
+    assert not refresh_in_background(["completion", "refresh"])
+
+
+def test_shell_reuses_one_session_and_cache(runner, mocker):
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.path)
+        if request.url.path == "/rest/v0/users":
+            return httpx.Response(200, json=["/rest/v0/users/u1"])
+        return httpx.Response(200, json={"id": "u1", "email": "a@example.com"})
+
+    def authenticate(*args):
+        api = XOAPI("http://test")
+        api.auth_token = "token"
+        api.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return api
+
+    mocker.patch.object(XOSocket, "open", return_value=True)
+    mocker.patch.object(XOSocket, "close", return_value=None)
+    factory = mocker.patch(
+        "xoadmin.cli.utils._authenticate_api", mocker.AsyncMock(side_effect=authenticate)
+    )
+
+    result = runner.invoke(
+        cli,
+        ["shell"],
+        input="user list\nuser list\nrefresh\nuser list --format json\nnope\nexit\n",
+    )
+
+    assert result.exit_code == 0, result.output
+    assert factory.await_count == 1
+    # The second listing is served from the cache, the third follows a refresh
+    assert requests == ["/rest/v0/users", "/rest/v0/users/u1"] * 2
+    assert "a@example.com" in result.output
+    assert "No such command 'nope'" in result.output
+
+
+def test_interrupted_command_is_cancelled_on_the_pool_loop(mocker):
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    started, cancelled = threading.Event(), threading.Event()
+
+    async def command():
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    def interrupt(self, timeout=None):
+        started.wait(5)
+        raise KeyboardInterrupt
+
+    mocker.patch.object(concurrent.futures.Future, "result", interrupt)
+    set_session_pool(SessionPool(loop))
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            run_coroutine(command())
+        assert cancelled.wait(5)
+    finally:
+        set_session_pool(None)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
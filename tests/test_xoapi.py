@@ -1,14 +1,38 @@
+import asyncio
+import gzip
+import hashlib
+import json
 import time
 from unittest.mock import patch
 
+import httpx
 import pytest
 from httpx import Response
 
+from xoadmin.api.acl import ACLManagement
 from xoadmin.api.api import XOAPI
-from xoadmin.api.error import AuthenticationError, ServerError, XOSocketError
+from xoadmin.api.bench import Benchmark
+from xoadmin.api.capture import TrafficRecorder, load_capture
+from xoadmin.api.error import (
+    AuthenticationError,
+    ServerError,
+    TaskError,
+    XOSocketError,
+)
+from xoadmin.api.exporter import Exporter
+from xoadmin.api.filter import FilterSyntaxError, compile_filter
+from xoadmin.api.governor import Governor, classify_rest, classify_rpc
+from xoadmin.api.jsonstream import ItemParser
 from xoadmin.api.host import HostManagement
+from xoadmin.api.limits import AdaptiveLimiter, TokenBucket
 from xoadmin.api.manager import XOAManager
+from xoadmin.api.replay import latency_summary, replay
+from xoadmin.api.stats import StatsFrame
+from xoadmin.api.storage import StorageManagement
+from xoadmin.api.sync import SyncXOAManager
 from xoadmin.api.user import UserManagement
+from xoadmin.api.vm import VMManagement
+from xoadmin.api.watch import ObjectWatcher
 from xoadmin.api.websocket import XOSocket
 
 
@@ -126,3 +150,941 @@ async def test_add_host_handles_xo_socket_error(mocker):
 
         # Assert that the error method was called at least once
         mock_logger_error.assert_called()
+
+
+def mock_api(handler, **kwargs) -> XOAPI:
+    """An authenticated XOAPI whose REST requests are answered by handler."""
+    api = XOAPI(rest_base_url="http://test", **kwargs)
+    api.auth_token = "token"
+    api.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return api
+
+
+class FakeWebSocket:
+    """In-memory websocket answering JSON-RPC calls through a handler."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.incoming = asyncio.Queue()
+        self.sent = []
+
+    async def send(self, message):
+        request = json.loads(message)
+        self.sent.append(request)
+        for reply in self.handler(request):
+            self.incoming.put_nowait(json.dumps(reply))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.incoming.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    async def close(self):
+        self.incoming.put_nowait(None)
+
+
+@pytest.mark.asyncio
+async def test_socket_routes_responses_and_notifications(mocker):
+    def handler(request):
+        # Emit an event before answering to check it isn't taken as the reply
+        yield {"jsonrpc": "2.0", "method": "all", "params": {"type": "enter"}}
+        yield {"jsonrpc": "2.0", "id": request["id"], "result": request["method"]}
+
+    fake = FakeWebSocket(handler)
+    mocker.patch("websockets.connect", mocker.AsyncMock(return_value=fake))
+    socket = XOSocket(url="ws://test")
+    await socket.open()
+    await socket.open()  # second opener shares the connection
+    queue = socket.subscribe()
+
+    results = await asyncio.gather(socket.call("a.b"), socket.call("c.d"))
+    assert [r["result"] for r in results] == ["a.b", "c.d"]
+    assert (await queue.get())["method"] == "all"
+
+    await socket.close()
+    assert socket.is_open()
+    await socket.close()
+    assert not socket.is_open()
+
+
+@pytest.mark.asyncio
+async def test_add_hosts_probes_then_adds_concurrently(mocker):
+    server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    # A closed port on the same host, for a fast unreachable result
+    closed = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+    closed_port = closed.sockets[0].getsockname()[1]
+    closed.close()
+    await closed.wait_closed()
+
+    def handler(request):
+        if (
+            request["params"]["host"].endswith(f":{port}")
+            and request["params"]["username"] == "root"
+        ):
+            yield {"jsonrpc": "2.0", "id": request["id"], "result": "srv1"}
+        else:
+            yield {
+                "jsonrpc": "2.0",
+                "id": request["id"],
+                "error": {"message": "server already exists"},
+            }
+
+    fake = FakeWebSocket(handler)
+    mocker.patch("websockets.connect", mocker.AsyncMock(return_value=fake))
+    host_management = HostManagement(XOAPI("http://test", ws_url="ws://test"))
+
+    async with server:
+        results = await host_management.add_hosts(
+            [
+                {
+                    "host": f"http://127.0.0.1:{port}",
+                    "username": "root",
+                    "password": "x",
+                },
+                {
+                    "host": f"http://127.0.0.1:{port}",
+                    "username": "admin",
+                    "password": "x",
+                },
+                {
+                    "host": f"http://127.0.0.1:{closed_port}",
+                    "username": "root",
+                    "password": "x",
+                },
+            ]
+        )
+
+    assert [r["status"] for r in results] == ["added", "exists", "unreachable"]
+    assert results[0]["id"] == "srv1"
+    # The unreachable host never reaches server.add
+    assert len(fake.sent) == 2
+
+
+def test_object_watcher_apply_event():
+    watcher = ObjectWatcher(api=None, object_type="VM", tag="prod")
+    predicate = watcher._build_predicate(pool_id=None, host_id=None)
+    vm = {"type": "VM", "name_label": "db", "tags": ["prod"], "power_state": "Halted"}
+
+    assert watcher.apply_event("enter", {"1": vm}, predicate)[0]["event"] == "add"
+    changes = watcher.apply_event(
+        "enter", {"1": {**vm, "power_state": "Running"}}, predicate
+    )
+    assert changes[0]["changes"] == {"power_state": ["Halted", "Running"]}
+    # Losing the tag moves the VM out of the watched set
+    changes = watcher.apply_event("enter", {"1": {**vm, "tags": []}}, predicate)
+    assert changes[0]["event"] == "remove"
+    assert watcher.apply_event("exit", {"1": vm}, predicate) == []
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("tags:prod-db", ["1"]),
+        ("power_state:running", ["1", "3"]),
+        ("!power_state:Running", ["2"]),
+        ("|(name_label:web-2 tags:prod-db)", ["1", "2"]),
+        ("name_label:web-*", ["2", "3"]),
+        ("name_label:/^web-\\d$/", ["2", "3"]),
+        ("memory:(size:>=4096)", ["1"]),
+        ("tags? power_state:Running", ["1"]),
+    ],
+)
+def test_compile_filter(expression, expected):
+    vms = [
+        {
+            "id": "1",
+            "name_label": "db",
+            "power_state": "Running",
+            "tags": ["prod-db"],
+            "memory": {"size": 8192},
+        },
+        {
+            "id": "2",
+            "name_label": "web-2",
+            "power_state": "Halted",
+            "tags": [],
+            "memory": {"size": 1024},
+        },
+        {
+            "id": "3",
+            "name_label": "web-3",
+            "power_state": "Running",
+            "tags": [],
+            "memory": {"size": 2048},
+        },
+    ]
+    predicate = compile_filter(expression)
+    assert [vm["id"] for vm in vms if predicate(vm)] == expected
+
+
+def test_compile_filter_rejects_invalid_expression():
+    with pytest.raises(FilterSyntaxError):
+        compile_filter("|(tags:a")
+
+
+@pytest.mark.asyncio
+async def test_iter_collection_checks_pushed_down_filter(mocker):
+    api = XOAPI(rest_base_url="http://test")
+    # A server ignoring the filter parameter returns the whole collection
+    get = mocker.patch.object(
+        XOAPI,
+        "get",
+        return_value=[
+            {"id": "1", "tags": ["prod-db"]},
+            {"id": "2", "tags": []},
+        ],
+    )
+
+    vms = [
+        vm
+        async for vm in api.iter_collection("vms", fields=["id"], filter="tags:prod-db")
+    ]
+
+    assert vms == [{"id": "1"}]
+    assert get.call_args.kwargs["params"] == {
+        "fields": "id,tags",
+        "filter": "tags:prod-db",
+    }
+    assert api.supports_filter is True
+
+
+@pytest.mark.asyncio
+async def test_list_vms_filter_falls_back_to_local_predicate(mocker):
+    api = XOAPI(rest_base_url="http://test")
+    request = httpx.Request("GET", "http://test/rest/v0/vms")
+    rejected = httpx.HTTPStatusError(
+        "bad filter", request=request, response=httpx.Response(400, request=request)
+    )
+    get = mocker.patch.object(
+        XOAPI,
+        "get",
+        side_effect=[
+            rejected,
+            [
+                {"id": "1", "name_label": "db", "tags": ["prod-db"]},
+                {"id": "2", "name_label": "web", "tags": []},
+            ],
+        ],
+    )
+
+    vms = await VMManagement(api).list_vms(filter="tags:prod-db")
+
+    assert vms == [{"id": "1", "name_label": "db"}]
+    assert get.call_args_list[0].kwargs["params"]["filter"] == "tags:prod-db"
+    assert get.call_args_list[1].kwargs["params"] == {"fields": "id,name_label,tags"}
+    assert api.supports_filter is False
+
+
+@pytest.mark.asyncio
+async def test_export_vdi_resumes_with_range_request(tmp_path):
+    content = b"0123456789" * 1000
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/rest/v0/vdis/vdi1.raw"
+        start = int(request.headers["Range"].split("=")[1].rstrip("-"))
+        return httpx.Response(206, content=content[start:])
+
+    api = mock_api(handler)
+    destination = tmp_path / "disk.raw"
+    destination.write_bytes(content[:4000])
+
+    progress = await StorageManagement(api).export_vdi(
+        "vdi1", str(destination), format="raw", resume=True
+    )
+
+    assert destination.read_bytes() == content
+    assert progress.offset == 4000 and progress.transferred == 6000
+
+
+@pytest.mark.asyncio
+async def test_export_vdi_resume_of_complete_file(tmp_path):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(416, headers={"Content-Range": "bytes */10"})
+
+    api = mock_api(handler)
+    destination = tmp_path / "disk.raw"
+    destination.write_bytes(b"0123456789")
+    storage_management = StorageManagement(api)
+
+    progress = await storage_management.export_vdi(
+        "vdi1", str(destination), format="raw", resume=True
+    )
+    assert destination.read_bytes() == b"0123456789"
+    assert progress.position == progress.total == 10
+
+    # A 416 for a larger VDI means the local file is not what it seems
+    destination.write_bytes(b"01234567890")
+    with pytest.raises(httpx.HTTPStatusError):
+        await storage_management.export_vdi(
+            "vdi1", str(destination), format="raw", resume=True
+        )
+
+
+@pytest.mark.asyncio
+async def test_import_vdi_streams_whole_file(tmp_path):
+    received = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        received["body"] = await request.aread()
+        received["headers"] = request.headers
+        return httpx.Response(200, json={})
+
+    api = mock_api(handler)
+    source = tmp_path / "disk.raw"
+    source.write_bytes(b"x" * 100 + b"y" * 50)
+
+    progress = await StorageManagement(api).import_vdi(
+        "vdi1", str(source), format="raw"
+    )
+
+    assert received["body"] == b"x" * 100 + b"y" * 50
+    assert received["headers"]["Content-Length"] == "150"
+    assert "Content-Range" not in received["headers"]
+    assert progress.position == progress.total == 150
+
+
+@pytest.mark.asyncio
+async def test_export_vms_compresses_and_checksums(tmp_path):
+    payloads = {"vm1": b"a" * 300_000, "vm2": b"b" * 10}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        vm_id = request.url.path.split("/")[-1].removesuffix(".xva")
+        if vm_id not in payloads:
+            return httpx.Response(404)
+        return httpx.Response(200, content=payloads[vm_id])
+
+    api = mock_api(handler)
+
+    results = await VMManagement(api).export_vms(
+        ["vm1", "vm2", "missing"], str(tmp_path), compression="gzip"
+    )
+
+    for result in results[:2]:
+        data = (tmp_path / f"{result['vm_id']}.xva.gz").read_bytes()
+        assert gzip.decompress(data) == payloads[result["vm_id"]]
+        assert result["sha256"] == hashlib.sha256(data).hexdigest()
+    assert "error" in results[2]
+    assert not list(tmp_path.glob("*.part"))
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_acquisitions():
+    bucket = TokenBucket(rate=1000, capacity=100)
+    started = time.monotonic()
+    for _ in range(3):
+        await bucket.acquire(100)
+    # The first 100 come from the burst, the next 200 take ~0.2s at 1000/s
+    assert 0.15 < time.monotonic() - started < 0.5
+
+
+def test_stats_frame_ranks_and_aggregates():
+    pytest.importorskip("numpy")
+    payloads = {
+        "idle": {"stats": {"cpus": {"0": [1, 2, 3]}, "memory": [10, 10, 10]}},
+        "busy": {"stats": {"cpus": {"0": [90, 95], "1": [70, 75]}}},
+        "medium": {"stats": {"cpus": {"0": [40, 50, None]}}},
+        "halted": {"stats": {}},
+    }
+
+    frame = StatsFrame.from_payloads(payloads, window=3)
+
+    assert frame.top("cpu", n=2) == ["busy", "medium"]
+    assert frame.top("cpu", n=10)[-1] == "halted"
+    rows = {row["id"]: row for row in frame.summary()}
+    assert rows["busy"]["cpu_mean"] == pytest.approx(82.5)
+    assert rows["idle"]["cpu_p95"] == pytest.approx(2.9)
+    assert rows["idle"]["memory_mean"] == 10
+
+
+@pytest.mark.asyncio
+async def test_create_vms_from_template_waits_for_tasks():
+    created = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path == "/rest/v0/vm-templates":
+            return httpx.Response(
+                200,
+                json=[
+                    {"id": "t1", "name_label": "debian"},
+                    {"id": "t2", "name_label": "ubuntu"},
+                ],
+            )
+        if path == "/rest/v0/vms":
+            body = json.loads(await request.aread())
+            created.append(body)
+            if body["name_label"] == "web-003":
+                return httpx.Response(500)
+            return httpx.Response(200, json=f"/rest/v0/tasks/{body['name_label']}")
+        if path.startswith("/rest/v0/tasks/"):
+            assert request.url.params["wait"] == "result"
+            name = path.split("/")[-1]
+            return httpx.Response(
+                200, json={"id": name, "status": "success", "result": {"id": name}}
+            )
+        return httpx.Response(404)
+
+    api = mock_api(handler)
+
+    results = await VMManagement(api).create_vms_from_template(
+        "debian",
+        3,
+        name_pattern="web-{index:03}",
+        overrides={"*": {"CPUs": 2}, "web-002": {"CPUs": 4}},
+        concurrency=2,
+    )
+
+    assert [r["name_label"] for r in results] == ["web-001", "web-002", "web-003"]
+    assert results[0]["vm_id"] == "web-001"
+    assert "error" in results[2]
+    cpus = {body["name_label"]: body["CPUs"] for body in created}
+    assert cpus == {"web-001": 2, "web-002": 4, "web-003": 2}
+    assert all(body["template"] == "t1" for body in created)
+
+
+@pytest.mark.asyncio
+async def test_wait_task_raises_on_failure():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            json={
+                "id": "task1",
+                "status": "failure",
+                "result": {"message": "no space"},
+            },
+        )
+
+    api = mock_api(handler)
+
+    with pytest.raises(TaskError, match="no space"):
+        await api.wait_task("/rest/v0/tasks/task1")
+
+
+def test_governor_classifies_operations():
+    assert classify_rest("GET", "rest/v0/vms") == "read"
+    assert classify_rest("POST", "rest/v0/vms/1/actions/start") == "vm_lifecycle"
+    assert classify_rest("DELETE", "rest/v0/vdis/1") == "write"
+    assert classify_rpc("server.add") == "server_add"
+    assert classify_rpc("vm.start") == "vm_lifecycle"
+    assert classify_rpc("xo.getAllObjects") == "read"
+    assert classify_rpc("user.create") == "write"
+    with pytest.raises(ValueError):
+        Governor({"reads": {"rate": 1}})
+
+
+@pytest.mark.asyncio
+async def test_governor_caps_rest_concurrency_per_class():
+    in_flight = {"read": 0, "write": 0}
+    peak = {"read": 0, "write": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        kind = "read" if request.method == "GET" else "write"
+        in_flight[kind] += 1
+        peak[kind] = max(peak[kind], in_flight[kind])
+        await asyncio.sleep(0.01)
+        in_flight[kind] -= 1
+        return httpx.Response(200, json={})
+
+    governor = Governor({"read": {"concurrency": 2}, "write": {"concurrency": 1}})
+    api = mock_api(handler, governor=governor)
+    assert api.get_socket().governor is governor
+
+    await asyncio.gather(
+        *(api.get(f"rest/v0/srs/{i}") for i in range(6)),
+        *(api.post("rest/v0/vdis", json_data={}) for _ in range(3)),
+    )
+    assert peak == {"read": 2, "write": 1}
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_grows_then_backs_off():
+    limiter = AdaptiveLimiter(initial=2, max_limit=16)
+    over_limit = []
+
+    async def operation(delay):
+        async with limiter.track("GET vms"):
+            if limiter.in_flight > limiter.current_limit:
+                over_limit.append(limiter.in_flight)
+            await asyncio.sleep(delay)
+
+    # Steady latency: the limit grows while it is the bottleneck
+    await asyncio.gather(*(operation(0.002) for _ in range(60)))
+    grown = limiter.current_limit
+    assert grown > 2 and not over_limit
+
+    # Overload responses shrink it, once per cooldown
+    async def overloaded():
+        async with limiter.track("GET vms"):
+            request = httpx.Request("GET", "http://test")
+            raise httpx.HTTPStatusError(
+                "busy", request=request, response=httpx.Response(503, request=request)
+            )
+
+    for _ in range(3):
+        with pytest.raises(httpx.HTTPStatusError):
+            await overloaded()
+    assert limiter.current_limit < grown
+    assert limiter.stats()["decreases"] == 1
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_xoapi_reports_adaptive_limits():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=[])
+
+    api = mock_api(handler, adaptive=True)
+    await api.get("rest/v0/vms")
+
+    limits = api.concurrency_limits()
+    assert set(limits) == {"rest", "rpc"}
+    assert limits["rest"]["in_flight"] == 0
+    assert XOAPI(rest_base_url="http://test").concurrency_limits() == {}
+
+
+def test_sync_manager_reuses_one_loop(mocker):
+    def rpc(request):
+        results = {
+            "session.signIn": {"email": "admin"},
+            "token.create": "token",
+        }
+        yield {
+            "jsonrpc": "2.0",
+            "id": request["id"],
+            "result": results.get(request["method"], []),
+        }
+
+    connect = mocker.AsyncMock(side_effect=lambda *a, **k: FakeWebSocket(rpc))
+    mocker.patch("websockets.connect", connect)
+    loops = set()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        loops.add(id(asyncio.get_running_loop()))
+        return httpx.Response(200, json=[{"id": "vm1", "name_label": "web"}])
+
+    with SyncXOAManager("test", "http://test", ws_url="ws://test") as manager:
+        manager.authenticate("admin", "secret")
+        manager.api.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        assert manager.vm_management.list_vms() == [{"id": "vm1", "name_label": "web"}]
+        assert [vm["id"] for vm in manager.api.iter_collection("vms")] == ["vm1"]
+        assert manager.host_management.list_hosts()["result"] == []
+        assert manager.api.get_socket().is_open()
+
+    assert len(loops) == 1
+    # Authentication's connection is replaced once by the held one, then reused
+    assert connect.await_count == 2
+    assert not manager.api.get_socket().is_open()
+
+
+@pytest.mark.asyncio
+async def test_capture_then_replay(tmp_path, mocker):
+    def rpc(request):
+        results = {"session.signIn": {"email": "admin"}, "token.create": "token"}
+        yield {
+            "jsonrpc": "2.0",
+            "id": request["id"],
+            "result": results.get(request["method"], []),
+        }
+
+    mocker.patch(
+        "websockets.connect",
+        mocker.AsyncMock(side_effect=lambda *a, **k: FakeWebSocket(rpc)),
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/missing"):
+            return httpx.Response(404)
+        return httpx.Response(200, json=[{"id": "vm1"}])
+
+    path = tmp_path / "capture.ndjson"
+    recorder = TrafficRecorder(str(path))
+    api = mock_api(handler, ws_url="ws://test")
+    api.set_recorder(recorder)
+    await api.authenticate_with_websocket("admin", "secret")
+    await api.get("rest/v0/vms/0f3d5e1c-8a7b-4c2d-9e6f-1a2b3c4d5e6f")
+    await api.post("rest/v0/users", {"email": "a@b.c", "password": "pw"})
+    with pytest.raises(httpx.HTTPStatusError):
+        await api.get("rest/v0/missing")
+    await api.get_socket().open()
+    await api.get_socket().call("vm.getAll")
+    await api.get_socket().close()
+    recorder.close()
+
+    assert "secret" not in path.read_text() and '"pw"' not in path.read_text()
+    records = load_capture(str(path))
+    assert [r["method"] for r in records] == [
+        "session.signIn",
+        "token.create",
+        "GET",
+        "POST",
+        "GET",
+        "session.signIn",
+        "vm.getAll",
+    ]
+    assert records[4]["status"] == 404 and records[4]["error"] == "404"
+    assert records[2]["response_bytes"] == len(json.dumps([{"id": "vm1"}]))
+    assert records[6]["request_bytes"] > 0 and records[6]["response_bytes"] > 0
+
+    api.set_recorder(None)
+    report = await replay(api, records, speed=100)
+
+    assert report["calls"] == 3 and report["skipped"] == 4
+    assert report["errors_by_kind"] == {"HTTP 404": 1}
+    # The user creation is a write, and its password was redacted
+    assert report["redacted"] == 0
+    writes = await replay(api, records, speed=100, allow_writes=True)
+    assert writes["calls"] == 3 and writes["redacted"] == 1
+    operations = {row["operation"]: row for row in report["operations"]}
+    assert set(operations) == {"GET vms/{id}", "GET missing", "vm.getAll"}
+    assert operations["GET missing"]["errors"] == 1
+    assert latency_summary([5, 1, 3, 2, 4])["p50"] == 3
+
+
+@pytest.mark.asyncio
+async def test_capture_records_streamed_transfers(tmp_path):
+    requests = []
+
+    async def disk():
+        yield b"x" * 1000
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((request.method, request.read()))
+        return httpx.Response(200, content=disk())
+
+    path = tmp_path / "capture.ndjson"
+    recorder = TrafficRecorder(str(path))
+    api = mock_api(handler)
+    api.set_recorder(recorder)
+    async with api.stream("GET", "rest/v0/vdis/1.raw") as response:
+        assert len(await response.aread()) == 1000
+    async with api.stream("PUT", "rest/v0/vdis/1.raw", content=b"disk"):
+        pass
+    recorder.close()
+
+    export, upload = load_capture(str(path))
+    assert export["stream"] and export["response_bytes"] == 1000
+    assert upload["method"] == "PUT" and upload["request_bytes"] == 4
+
+    api.set_recorder(None)
+    requests.clear()
+    report = await replay(api, [export, upload], speed=100, allow_writes=True)
+    # The upload's body wasn't captured, so only the export is replayed
+    assert report["calls"] == 1 and report["errors"] == 0
+    assert requests == [("GET", b"")]
+
+
+@pytest.mark.asyncio
+async def test_benchmark_reports_each_phase(mocker):
+    deleted = []
+
+    def rpc(request):
+        if request["method"] == "token.delete":
+            deleted.append(request["params"]["token"])
+        results = {"session.signIn": {"authenticationToken": "t"}, "token.create": "tk"}
+        yield {
+            "jsonrpc": "2.0",
+            "id": request["id"],
+            "result": results.get(request["method"], "5.0"),
+        }
+
+    connect = mocker.AsyncMock(side_effect=lambda *a, **k: FakeWebSocket(rpc))
+    mocker.patch("websockets.connect", connect)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if len(requests) == 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json=[{"id": "h1"}])
+
+    api = mock_api(handler, ws_url="ws://test", cache_ttl=60)
+    await api.authenticate_with_websocket("admin", "secret")
+
+    rows = await Benchmark(api).run(
+        ["rpc", "connect", "token", "rest"], concurrency=2, duration=0.05
+    )
+
+    assert [row["phase"] for row in rows] == [
+        "connect",
+        "sign_in",
+        "token",
+        "rest",
+        "rpc",
+    ]
+    assert all(row["count"] > 0 for row in rows)
+    rest = rows[3]
+    assert rest["errors"] == 1
+    assert rest["count"] == len(requests) - 1  # nothing served from the cache
+    assert requests[0].url.params["fields"] == "id"
+    assert len(deleted) == rows[2]["count"]
+    assert not api.get_socket().is_open()
+    with pytest.raises(ValueError):
+        await Benchmark(api).run(["nope"])
+
+
+@pytest.mark.asyncio
+async def test_stream_items_decodes_elements_as_chunks_arrive():
+    vms = [{"id": str(i), "memory": 1.5e9 + i, "tags": ["a]", "b"]} for i in range(50)]
+    body = json.dumps(vms).encode()
+
+    async def chunks():
+        # Small chunks cut through strings and numbers
+        for offset in range(0, len(body), 7):
+            yield body[offset : offset + 7]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.params["fields"] == "id,memory,tags"
+        return httpx.Response(200, content=chunks())
+
+    api = mock_api(handler)
+
+    streamed = [
+        vm
+        async for vm in api.iter_collection(
+            "vms", fields=["id", "memory", "tags"], stream=True
+        )
+    ]
+    assert streamed == vms
+
+    parser = ItemParser()
+    parser.feed("[1, 2")
+    assert list(parser.items()) == [1]
+    parser.end()
+    with pytest.raises(ValueError):
+        list(parser.items())
+
+
+@pytest.mark.asyncio
+async def test_socket_call_stream_yields_result_values(mocker):
+    objects = {str(i): {"id": str(i), "type": "VM"} for i in range(3)}
+
+    def handler(request):
+        if request["method"] == "xo.getAllObjects":
+            yield {"jsonrpc": "2.0", "id": request["id"], "result": objects}
+        else:
+            yield {"jsonrpc": "2.0", "id": request["id"], "error": {"message": "no"}}
+
+    fake = FakeWebSocket(handler)
+    mocker.patch("websockets.connect", mocker.AsyncMock(return_value=fake))
+    socket = XOSocket(url="ws://test")
+    await socket.open()
+
+    streamed = [obj async for obj in socket.call_stream("xo.getAllObjects")]
+    assert streamed == list(objects.values())
+    with pytest.raises(XOSocketError, match="no"):
+        [obj async for obj in socket.call_stream("vm.getAll")]
+    assert not socket._raw and not socket._pending
+    await socket.close()
+
+
+@pytest.mark.asyncio
+async def test_exporter_serves_metrics_from_event_feed(mocker):
+    objects = {
+        "pool": {"p1": {"id": "p1", "type": "pool", "name_label": "prod"}},
+        "host": {
+            "h1": {
+                "id": "h1",
+                "type": "host",
+                "name_label": "xcp1",
+                "$pool": "p1",
+                "power_state": "Running",
+                "enabled": True,
+            }
+        },
+        "SR": {
+            "s1": {
+                "id": "s1",
+                "type": "SR",
+                "name_label": "nfs",
+                "$pool": "p1",
+                "size": 100,
+                "physical_usage": 40,
+                "usage": 60,
+            }
+        },
+        "VM": {
+            str(i): {
+                "id": str(i),
+                "type": "VM",
+                "$pool": "p1",
+                "power_state": "Running",
+            }
+            for i in range(3)
+        },
+    }
+
+    def handler(request):
+        object_type = request["params"]["filter"]["type"]
+        yield {"jsonrpc": "2.0", "id": request["id"], "result": objects[object_type]}
+
+    fake = FakeWebSocket(handler)
+    mocker.patch("websockets.connect", mocker.AsyncMock(return_value=fake))
+    api = mock_api(
+        lambda request: httpx.Response(
+            200, json=[{"permission": "admin"}, {"permission": "none"}]
+        ),
+        ws_url="ws://test",
+    )
+    exporter = Exporter(api, host="127.0.0.1", port=0)
+    stop = asyncio.Event()
+    task = asyncio.ensure_future(exporter.run(stop))
+    while not exporter.model.connected:
+        await asyncio.sleep(0.01)
+
+    # A VM stops: only the event is needed to update the counts
+    fake.incoming.put_nowait(
+        json.dumps(
+            {
+                "jsonrpc": "2.0",
+                "method": "all",
+                "params": {
+                    "type": "enter",
+                    "items": {"0": {**objects["VM"]["0"], "power_state": "Halted"}},
+                },
+            }
+        )
+    )
+    while exporter.model.events == 0:
+        await asyncio.sleep(0.01)
+
+    port = exporter.server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: test\r\n\r\n")
+    response = (await reader.read()).decode()
+    writer.close()
+    stop.set()
+    await task
+
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert 'xo_vms{pool_id="p1",pool="prod",power_state="Halted"} 1' in response
+    assert 'xo_vms{pool_id="p1",pool="prod",power_state="Running"} 2' in response
+    assert 'xo_host_up{host_id="h1",host="xcp1",pool_id="p1",pool="prod"} 1' in response
+    assert (
+        'xo_sr_physical_usage_bytes{sr_id="s1",sr="nfs",pool_id="p1",pool="prod"} 40'
+        in response
+    )
+    assert 'xo_users{permission="admin"} 1' in response
+    assert "xo_exporter_connected 1" in response
+    # Only the initial load went to XO
+    assert len(fake.sent) == 4
+
+
+@pytest.mark.asyncio
+async def test_exporter_keeps_following_after_unexpected_errors(mocker):
+    exporter = Exporter(XOAPI("http://test"), retry_interval=0)
+    stop = asyncio.Event()
+    attempts = []
+
+    async def follow_once():
+        attempts.append(exporter.model.connected)
+        exporter.model.set_connected(True)
+        if len(attempts) == 2:
+            stop.set()
+        raise ValueError("bad event payload")
+
+    mocker.patch.object(exporter, "_follow_once", follow_once)
+    await asyncio.wait_for(exporter.follow(stop), 5)
+
+    # Reconnected after the failure, which marked the feed down each time
+    assert attempts == [False, False]
+    assert not exporter.model.connected
+
+
+@pytest.mark.asyncio
+async def test_host_health_checks_servers_concurrently(mocker):
+    servers = [
+        {"id": "1", "host": "10.0.0.1", "status": "connected", "enabled": True},
+        {"id": "2", "host": "10.0.0.2", "status": "connected", "enabled": True},
+        {
+            "id": "3",
+            "host": "10.0.0.3",
+            "status": "disconnected",
+            "enabled": True,
+            "error": {"message": "SESSION_AUTHENTICATION_FAILED"},
+        },
+        {"id": "4", "host": None, "status": "disconnected", "enabled": True},
+    ]
+    mocker.patch.object(HostManagement, "list_hosts", return_value={"result": servers})
+
+    async def fake_probe(target, timeout):
+        if target == "10.0.0.2":
+            await asyncio.sleep(60)  # a host that hangs
+        return {"host": target, "reachable": True, "latency_ms": 1.5}
+
+    mocker.patch("xoadmin.api.host.probe", side_effect=fake_probe)
+
+    started = time.monotonic()
+    results = await HostManagement(XOAPI(rest_base_url="http://test")).check_health(
+        timeout=0.1
+    )
+
+    assert time.monotonic() - started < 1
+    # Sorted by health then host, a missing host first
+    assert [(r["id"], r["health"]) for r in results] == [
+        ("4", "unreachable"),
+        ("2", "unreachable"),
+        ("3", "disconnected"),
+        ("1", "ok"),
+    ]
+    assert results[0]["error"] == "no host address"
+    assert results[2]["error"] == "SESSION_AUTHENTICATION_FAILED"
+    assert results[3]["latency_ms"] == 1.5
+
+
+@pytest.mark.asyncio
+async def test_grant_sends_only_missing_acls(mocker):
+    existing = [{"subject": "u1", "object": "vm1", "action": "viewer"}]
+
+    def handler(request):
+        method, params = request["method"], request.get("params")
+        if method == "user.getAll":
+            result = [{"id": "u1", "email": "ann@example.com"}]
+        elif method == "group.getAll":
+            result = [
+                {"id": "g1", "name": "ops"},
+                {"id": "g2", "name": "ann@example.com"},
+            ]
+        elif method == "acl.getAll":
+            result = existing
+        elif params["object"] == "vm3":
+            yield {"jsonrpc": "2.0", "id": request["id"], "error": {"message": "no"}}
+            return
+        else:
+            result = True
+        yield {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    fake = FakeWebSocket(handler)
+    connect = mocker.patch("websockets.connect", mocker.AsyncMock(return_value=fake))
+    acl_management = ACLManagement(XOAPI("http://test", ws_url="ws://test"))
+
+    # Ids map to themselves, a user's email to the user's id
+    result = await acl_management.grant(["u1", "ops"], ["vm1", "vm2", "vm3"])
+
+    adds = sorted(
+        (r["params"]["subject"], r["params"]["object"])
+        for r in fake.sent
+        if r["method"] == "acl.add"
+    )
+    assert adds == [("g1", "vm1"), ("g1", "vm2"), ("g1", "vm3")] + [
+        ("u1", "vm2"),
+        ("u1", "vm3"),
+    ]
+    assert result["requested"] == 6
+    assert result["changed"] == 3 and result["unchanged"] == 1
+    assert {f["subject"] for f in result["failed"]} == {"u1", "g1"}
+    assert sum(r["method"] == "acl.getAll" for r in fake.sent) == 1
+    connect.assert_awaited_once()
+
+    for subject in ("nobody", "ann@example.com"):  # unknown, then ambiguous
+        # The fake connection ends when closed, so each session needs its own
+        connect.return_value = FakeWebSocket(handler)
+        with pytest.raises(ValueError):
+            await acl_management.grant([subject], ["vm1"])
+    with pytest.raises(ValueError):
+        await acl_management.grant(["ops"], ["vm1"], action="owner")